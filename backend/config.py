@@ -1,5 +1,6 @@
 """MediVan AI configuration."""
 import os
+import socket
 import logging
 
 # Load .env file if present
@@ -24,10 +25,64 @@ HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/tmp/medivanai_uploads")
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
+# Resumable chunked uploads: suggested chunk size, largest chunk accepted, and how long an upload is kept
+# after its last activity (chunk or finalize)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(512 * 1024)))
+UPLOAD_MAX_CHUNK = int(os.getenv("UPLOAD_MAX_CHUNK", str(2 * 1024 * 1024)))
+UPLOAD_TTL_S = float(os.getenv("UPLOAD_TTL_S", "86400"))
+# Capture profile (/api/capture-profile): JPEG quality clients re-encode at after resizing to the advertised size
+CAPTURE_JPEG_QUALITY = float(os.getenv("CAPTURE_JPEG_QUALITY", "0.9"))
+# Decode oversized JPEGs at 1/2-1/8 scale (DCT-domain) when that still covers the capture profile
+DRAFT_DECODE = os.getenv("DRAFT_DECODE", "true").lower() in ("true", "1", "yes")
+# Reject blurry/badly exposed/tiny captures before inference (thresholds in services/quality.py)
+QUALITY_GATE = os.getenv("QUALITY_GATE", "true").lower() in ("true", "1", "yes")
+# Most frames accepted by the burst endpoints (only the best one is classified)
+BURST_MAX_FRAMES = int(os.getenv("BURST_MAX_FRAMES", "8"))
+# Live camera preview (/api/preview WebSocket): routed frames per second per connection, and preview
+# routings in flight across all connections. Preview frames are routed only while the router has no backlog
+PREVIEW_MAX_FPS = float(os.getenv("PREVIEW_MAX_FPS", "4"))
+PREVIEW_CONCURRENCY = int(os.getenv("PREVIEW_CONCURRENCY", "1"))
+# Multi-lesion mode (/analyze/lesions): most candidate regions classified per wide-field skin photo
+LESION_MAX_REGIONS = int(os.getenv("LESION_MAX_REGIONS", "12"))
+# Duplicate uploads: same SHA-256, or dHash within DEDUP_MAX_DISTANCE bits (of 64) confirmed by CLIP embedding
+# cosine >= DEDUP_MIN_SIMILARITY. Same-session re-uploads reuse the finding; other sessions only get a hint
+DEDUP = os.getenv("DEDUP", "false").lower() in ("true", "1", "yes")
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "2"))
+DEDUP_MIN_SIMILARITY = float(os.getenv("DEDUP_MIN_SIMILARITY", "0.99"))
+# Content-addressed archive of uploaded originals + thumbnails under UPLOAD_DIR/archive, written in the background.
+# Retention: entries older than ARCHIVE_RETENTION_DAYS (0 = forever), then least recently used beyond ARCHIVE_MAX_GB (0 = no cap)
+ARCHIVE = os.getenv("ARCHIVE", "true").lower() in ("true", "1", "yes")
+ARCHIVE_THUMB_SIZE = int(os.getenv("ARCHIVE_THUMB_SIZE", "384"))
+ARCHIVE_RETENTION_DAYS = float(os.getenv("ARCHIVE_RETENTION_DAYS", "0"))
+ARCHIVE_MAX_GB = float(os.getenv("ARCHIVE_MAX_GB", "50"))
+ARCHIVE_QUEUE_SIZE = int(os.getenv("ARCHIVE_QUEUE_SIZE", "256"))
+# Cap on the original bytes waiting in the queue; uploads beyond it are dropped like a full queue
+ARCHIVE_QUEUE_MB = float(os.getenv("ARCHIVE_QUEUE_MB", "256"))
 
 # ── LLM (OpenAI-compatible API: NIM, Ollama, vLLM, etc.) ─
 NIM_ENDPOINT = os.getenv("NIM_ENDPOINT", "http://localhost:8080/v1")
 NIM_MODEL = os.getenv("NIM_MODEL", "meta/llama-3.1-8b-instruct")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))  # ceiling, seconds per LLM request
+# Adaptive timeout: observed p99 latency x multiplier, clamped to [LLM_TIMEOUT_MIN, LLM_TIMEOUT]
+LLM_TIMEOUT_MIN = float(os.getenv("LLM_TIMEOUT_MIN", "5"))
+LLM_TIMEOUT_MULTIPLIER = float(os.getenv("LLM_TIMEOUT_MULTIPLIER", "3"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+# Circuit breaker: serve template output after N consecutive failures, re-probe every cooldown seconds
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+# Scheduler: concurrent LLM requests over the pooled connection; full reports may use at most
+# LLM_REPORT_SLOTS of them so interactive explanations always have capacity
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_REPORT_SLOTS = int(os.getenv("LLM_REPORT_SLOTS", str(max(1, LLM_MAX_CONCURRENCY - 1))))
+
+# ── Scheduling ────────────────────────────────────────────
+# Weighted fair share per priority class (interactive capture, session report, batch jobs)
+# across the model stages and the LLM queue; aging: seconds of waiting worth one batch turn
+PRIORITY_WEIGHTS = {
+    k.strip(): float(v)
+    for k, v in (item.split(":") for item in os.getenv("PRIORITY_WEIGHTS", "interactive:8,report:3,batch:1").split(",") if item.strip())
+}
+PRIORITY_AGING_S = float(os.getenv("PRIORITY_AGING_S", "10"))
 
 # ── CV Models (HuggingFace model IDs) ────────────────────
 # Image Router — CLIP zero-shot classifier
@@ -42,6 +97,40 @@ CHEST_MODEL = os.getenv("CHEST_MODEL", "codewithdark/vit-chest-xray")
 # Diabetic Retinopathy Classifier — ViT fine-tuned on APTOS/EyePACS
 EYE_MODEL = os.getenv("EYE_MODEL", "rafalosa/diabetic-retinopathy-224-procnorm-vit")
 
+# Local safetensors store written by `python -m backend.services.model_store prefetch`;
+# models found here load from local files with no hub lookups
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "models"))
+
+# Synthetic warm-up passes after model load, at the batch sizes requests use
+# (1 = single image, 5 = the frontend's camera burst)
+WARMUP = os.getenv("WARMUP", "true").lower() in ("true", "1", "yes")
+WARMUP_BATCH_SIZES = [int(b) for b in os.getenv("WARMUP_BATCH_SIZES", "1,5").split(",") if b.strip()]
+WARMUP_ITERATIONS = int(os.getenv("WARMUP_ITERATIONS", "2"))
+
+# Batches in flight per model stage: one computing while the next is staged (2 = double buffering).
+# On CUDA, uploads go through pinned buffers on a separate copy stream
+PIPELINE_DEPTH = int(os.getenv("PIPELINE_DEPTH", "2"))
+
+# Optional test-time augmentation (off by default; it changes low-confidence scores): images whose top-class
+# confidence is below TTA_THRESHOLD get a second, batched forward over flipped/zoomed views, and the averaged
+# probabilities replace the first result
+TTA = os.getenv("TTA", "false").lower() in ("true", "1", "yes")
+TTA_THRESHOLD = float(os.getenv("TTA_THRESHOLD", "0.6"))
+
+# ── Similar cases ─────────────────────────────────────────
+# Session findings' CLIP embeddings are kept in per-modality on-disk indexes for prior-case search
+CASE_INDEX = os.getenv("CASE_INDEX", "true").lower() in ("true", "1", "yes")
+CASE_INDEX_DIR = os.getenv("CASE_INDEX_DIR", os.path.join(UPLOAD_DIR, "case_index"))
+# Appends between HNSW graph snapshots (faiss only); a restart re-adds at most this many
+CASE_INDEX_SNAPSHOT_EVERY = int(os.getenv("CASE_INDEX_SNAPSHOT_EVERY", "1000"))
+
+# ── Analytics ─────────────────────────────────────────────
+# Session findings are appended (in the background) to an indexed SQLite table for /api/analytics
+ANALYTICS = os.getenv("ANALYTICS", "true").lower() in ("true", "1", "yes")
+ANALYTICS_DB = os.getenv("ANALYTICS_DB", os.path.join(UPLOAD_DIR, "analytics.db"))
+# Identifies this van in aggregated statistics
+VAN_ID = os.getenv("VAN_ID", socket.gethostname())
+
 # ── RAG ───────────────────────────────────────────────────
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 KNOWLEDGE_DIR = os.path.join(os.path.dirname(__file__), "knowledge")
@@ -1,15 +1,21 @@
 """MediVan AI — FastAPI backend."""
 import io
 import os
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import time
+import asyncio
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Header, Request, WebSocket
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from PIL import Image
 
-from backend.config import MOCK_MODE, HOST, PORT, UPLOAD_DIR
+from backend.config import MOCK_MODE, HOST, PORT, UPLOAD_DIR, BURST_MAX_FRAMES, DEDUP, ARCHIVE, DRAFT_DECODE, LESION_MAX_REGIONS
+from backend.config import UPLOAD_MAX_CHUNK
+from backend.config import WARMUP, WARMUP_BATCH_SIZES, WARMUP_ITERATIONS
 from backend.services import router, skin_classifier, chest_classifier, eye_classifier
-from backend.services import report_generator, session_manager, rag
+from backend.services import report_generator, session_manager, rag, tracing, quality, metrics, device, warmup, scheduler
+from backend.services import case_index, dedup, archive, uploads, capture, sync, analytics, preview, lesions, tta
 
 app = FastAPI(title="MediVan AI", version="1.0.0")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
@@ -20,6 +26,7 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 @app.on_event("startup")
 async def load_models():
     """Eagerly load all models on startup (skipped in mock mode)."""
+    case_index.load()
     if MOCK_MODE:
         print("[MediVan AI] Running in MOCK MODE — no models loaded, using simulated results")
         return
@@ -44,46 +51,154 @@ async def load_models():
         print("  ✓ DR Classifier loaded")
     except Exception as e:
         print(f"  ✗ DR Classifier failed: {e}")
-    print("[MediVan AI] Model loading complete")
+    print(f"[MediVan AI] Model loading complete ({device.snapshot()['device']})")
+    if WARMUP:
+        _warm_up_models()
+
+
+@app.on_event("shutdown")
+async def save_indexes():
+    case_index.close()
+
+
+def _warm_up_models():
+    """Synthetic passes so the first patient doesn't pay for kernel selection and allocator growth."""
+    print(f"[MediVan AI] Warming up (batch sizes {WARMUP_BATCH_SIZES}, {WARMUP_ITERATIONS} iterations each)...")
+    for label, module in [
+        ("CLIP Router", router),
+        ("Skin Classifier", skin_classifier),
+        ("Chest X-ray Classifier", chest_classifier),
+        ("DR Classifier", eye_classifier),
+    ]:
+        if module.get_status()["status"] != "loaded":
+            continue  # failed to load above
+        try:
+            result = module.warm_up(WARMUP_BATCH_SIZES, WARMUP_ITERATIONS)
+            timings = ", ".join(f"batch {bs}: {b['first_ms']:.0f} → {b['last_ms']:.0f} ms" for bs, b in result["batches"].items())
+            print(f"  ✓ {label} warmed up ({timings})")
+        except Exception as e:
+            print(f"  ✗ {label} warm-up failed: {e}")
 
 CLASSIFIERS = {
     "skin_lesion": skin_classifier.classify,
     "chest_xray": chest_classifier.classify,
     "fundus": eye_classifier.classify,
 }
+CLASSIFIER_MODULES = {"skin_lesion": skin_classifier, "chest_xray": chest_classifier, "fundus": eye_classifier}
 
 
-async def _read_image(file: UploadFile) -> Image.Image:
+async def _read_upload(file: UploadFile, full_size: bool = False) -> tuple[bytes, Image.Image]:
+    """Raw bytes and decoded RGB image; ``full_size`` skips the draft-mode downscale."""
     data = await file.read()
     if len(data) > 10 * 1024 * 1024:
         raise HTTPException(413, "Image too large (max 10MB)")
-    return Image.open(io.BytesIO(data)).convert("RGB")
+    with tracing.span("decode"):
+        raw = Image.open(io.BytesIO(data))
+        if DRAFT_DECODE and not full_size and raw.format == "JPEG":
+            # Full-resolution JPEGs decode straight to the capture profile size; pre-sized ones are unaffected
+            side = capture.decode_side()
+            if min(raw.size) >= 2 * side:
+                raw.draft("RGB", (side, side))
+                metrics.incr("decode.draft")
+            else:
+                metrics.incr("decode.presized")
+        image = raw.convert("RGB")
+    image.info["format"] = raw.format
+    if DEDUP:
+        with tracing.span("dhash"):
+            image.info["dhash"] = dedup.dhash(image)
+    if ARCHIVE or DEDUP:
+        with tracing.span("sha256"):
+            image.info["sha256"] = archive.digest(data)
+    return data, image
+
+
+def _archive(data: bytes, image: Image.Image):
+    """Hand the original to the background archive writer."""
+    if ARCHIVE:
+        archive.submit(image.info["sha256"], data, image.info["format"])
+
+
+async def _read_image(file: UploadFile, full_size: bool = False) -> Image.Image:
+    data, image = await _read_upload(file, full_size)
+    _archive(data, image)
+    return image
+
+
+def _assess(image: Image.Image) -> dict:
+    with tracing.span("quality"):
+        return quality.assess(image)
+
+
+# Model stages run in the threadpool, so one request's routing overlaps another's
+# classification (each model's pipeline.Stage bounds how many are in flight)
+async def _route(image: Image.Image, filename: str) -> dict:
+    start = time.perf_counter()
+    route = await run_in_threadpool(router.route_image, image, filename)
+    metrics.observe("route", time.perf_counter() - start)
+    return route
+
+
+async def _classify(image_type: str, image: Image.Image) -> dict:
+    start = time.perf_counter()
+    result = await run_in_threadpool(CLASSIFIERS[image_type], image)
+    metrics.observe(f"classify.{image_type}", time.perf_counter() - start)
+    return result
+
+
+def _trace_requested(trace: bool, header: str | None) -> bool:
+    """Tracing is opt-in via ?trace=true or an X-MediVan-Trace header."""
+    return trace or (header or "").lower() in ("1", "true", "yes")
+
+
+def _priority_class(header: str | None, default: str) -> str:
+    """Requests queue as ``default`` unless the client sets X-MediVan-Priority (e.g. batch jobs)."""
+    cls = (header or default).lower()
+    if cls not in scheduler.CLASSES:
+        raise HTTPException(400, f"Unknown priority '{cls}' (expected one of {', '.join(scheduler.CLASSES)})")
+    return cls
 
 
 @app.get("/api/health")
 async def health():
-    import platform
-    gpu = "N/A"
-    try:
-        import torch
-        if torch.cuda.is_available():
-            gpu = torch.cuda.get_device_name(0)
-    except:
-        pass
+    hw = device.snapshot()
     return {
         "status": "healthy",
         "mock_mode": MOCK_MODE,
-        "platform": platform.machine(),
-        "gpu": gpu,
+        "platform": hw["platform"],
+        "gpu": hw["gpu"],
+        "device": hw["device"],
         "models": [
             router.get_status(),
             skin_classifier.get_status(),
             chest_classifier.get_status(),
             eye_classifier.get_status(),
         ],
+        "llm": report_generator.get_status(),
+        "warmup": warmup.get_status(),
+        "case_index": case_index.get_status(),
+        "dedup": dedup.get_status(),
+        "archive": archive.get_status(),
+        "uploads": uploads.get_status(),
+        "analytics": analytics.get_status(),
+        "preview": preview.get_status(),
+        "tta": tta.get_status(),
     }
 
 
+@app.get("/api/capture-profile")
+async def capture_profile():
+    """Largest useful image size and preferred encoding per modality; clients resize captures to it."""
+    return capture.profile()
+
+
+@app.websocket("/api/preview")
+async def preview_socket(ws: WebSocket):
+    """Live camera preview: binary JPEG frames in, modality + quality verdicts out (newest frame wins)."""
+    await ws.accept()
+    await preview.serve(ws)
+
+
 @app.get("/api/models")
 async def models():
     return [
@@ -95,17 +210,152 @@ async def models():
 
 
 @app.post("/api/analyze")
-async def analyze(file: UploadFile = File(...)):
+async def analyze(
+    file: UploadFile = File(...),
+    trace: bool = Query(False),
+    x_medivan_trace: str | None = Header(None),
+    x_medivan_priority: str | None = Header(None),
+):
+    want_trace = _trace_requested(trace, x_medivan_trace)
+    cls = _priority_class(x_medivan_priority, "interactive")
+    with scheduler.priority(cls), tracing.request("analyze", enabled=want_trace) as t:
+        response = await _analyze(file)
+    if want_trace:
+        response["trace"] = t.breakdown()
+    return response
+
+
+async def _analyze(file: UploadFile) -> dict:
     image = await _read_image(file)
-    route = router.route_image(image, file.filename or "")
+    image_quality = _assess(image)
+    rejected = quality.gate(image_quality)
+    if rejected:
+        return {"image_type": "unknown", "route": None, "result": None, "quality": rejected, "explanation": rejected["hint"]}
+
+    route = await _route(image, file.filename or "")
+    route.pop("embedding", None)
     image_type = route["type"]
 
     if image_type == "unknown":
         return {"image_type": "unknown", "route": route, "result": None, "explanation": "Could not identify image type. Please upload a skin lesion, chest X-ray, or fundus photo."}
 
-    classifier = CLASSIFIERS.get(image_type)
-    result = classifier(image)
-    explanation = report_generator.generate_explanation(image_type, result)
+    rejected = quality.gate(image_quality, image_type)
+    if rejected:
+        return {"image_type": image_type, "route": route, "result": None, "quality": rejected, "explanation": rejected["hint"]}
+
+    result = await _classify(image_type, image)
+    # LLM calls run off the event loop so concurrent requests share the LLM scheduler
+    explanation = await run_in_threadpool(report_generator.generate_explanation, image_type, result)
+    guidelines = rag.retrieve(f"{image_type} {result['classification']}")
+
+    return {
+        "image_type": image_type,
+        "route": route,
+        "result": result,
+        "explanation": explanation,
+        "guidelines": guidelines,
+        "image_id": image.info.get("sha256"),
+    }
+
+
+@app.post("/api/analyze/burst")
+async def analyze_burst(
+    files: list[UploadFile] = File(...),
+    trace: bool = Query(False),
+    x_medivan_trace: str | None = Header(None),
+    x_medivan_priority: str | None = Header(None),
+):
+    """Analyze the best frame of a camera burst; the other frames only get the cheap quality score."""
+    want_trace = _trace_requested(trace, x_medivan_trace)
+    cls = _priority_class(x_medivan_priority, "interactive")
+    with scheduler.priority(cls), tracing.request("analyze_burst", enabled=want_trace) as t:
+        response = await _analyze_burst(files)
+    if want_trace:
+        response["trace"] = t.breakdown()
+    return response
+
+
+async def _select_frame(files: list[UploadFile]) -> dict:
+    """Score every frame of a burst and pick the one to classify.
+
+    Frames failing the pre-route gate are dropped, the rest are routed in one
+    batched CLIP pass, and the sharpest, best-exposed frame that passes the
+    modality thresholds wins. ``selected`` is None if no frame is usable.
+    """
+    if not files:
+        raise HTTPException(400, "No frames uploaded")
+    if len(files) > BURST_MAX_FRAMES:
+        raise HTTPException(413, f"Too many frames (max {BURST_MAX_FRAMES})")
+
+    # Only the selected frame is archived
+    uploads = [await _read_upload(f) for f in files]
+    images = [image for _, image in uploads]
+    qualities = [_assess(im) for im in images]
+    frames = [
+        {"index": i, "filename": f.filename, "score": quality.frame_score(q), "metrics": q}
+        for i, (f, q) in enumerate(zip(files, qualities))
+    ]
+    metrics.incr("burst.frames", len(frames))
+
+    rejections = {i: quality.gate(q) for i, q in enumerate(qualities)}
+    candidates = [i for i, r in rejections.items() if r is None]
+    selection = {"selected": None, "image": None, "embedding": None, "route": None, "rejected": None, "frames": frames}
+    if not candidates:
+        return _reject_burst(selection, rejections)
+
+    start = time.perf_counter()
+    route = await run_in_threadpool(router.route_burst, [images[i] for i in candidates], files[candidates[0]].filename or "")
+    metrics.observe("route.burst", time.perf_counter() - start)
+    for i, scores in zip(candidates, route.pop("frame_scores")):
+        frames[i]["route_scores"] = scores
+    embeddings = dict(zip(candidates, route.pop("frame_embeddings")))
+    selection["route"] = route
+    image_type = route["type"]
+
+    if image_type != "unknown":
+        for i in candidates:
+            rejections[i] = quality.gate(qualities[i], image_type)
+        candidates = [i for i in candidates if rejections[i] is None]
+        if not candidates:
+            return _reject_burst(selection, rejections)
+
+    for fr in frames:
+        fr["passed"] = rejections[fr["index"]] is None
+    chosen = max(candidates, key=lambda i: frames[i]["score"])
+    selection.update(selected=chosen, image=images[chosen], embedding=embeddings[chosen])
+    _archive(*uploads[chosen])
+    # Every other usable frame would have cost a full classification
+    metrics.incr("burst.saved.classify", len(candidates) - 1)
+    return selection
+
+
+def _reject_burst(selection: dict, rejections: dict) -> dict:
+    """No usable frame: report the retake hint of the best-scoring one."""
+    for fr in selection["frames"]:
+        fr["passed"] = False
+    best = max(selection["frames"], key=lambda fr: fr["score"])["index"]
+    selection["rejected"] = rejections[best]
+    return selection
+
+
+def _burst_summary(selection: dict) -> dict:
+    return {"selected": selection["selected"], "frames": selection["frames"]}
+
+
+async def _analyze_burst(files: list[UploadFile]) -> dict:
+    selection = await _select_frame(files)
+    route, burst = selection["route"], _burst_summary(selection)
+    if selection["rejected"]:
+        rejected = selection["rejected"]
+        image_type = route["type"] if route else "unknown"
+        return {"image_type": image_type, "route": route, "result": None, "quality": rejected, "explanation": rejected["hint"], "burst": burst}
+
+    image_type = route["type"]
+    if image_type == "unknown":
+        return {"image_type": "unknown", "route": route, "result": None, "explanation": "Could not identify image type. Please upload a skin lesion, chest X-ray, or fundus photo.", "burst": burst}
+
+    result = await _classify(image_type, selection["image"])
+    explanation = await run_in_threadpool(report_generator.generate_explanation, image_type, result)
     guidelines = rag.retrieve(f"{image_type} {result['classification']}")
 
     return {
@@ -114,6 +364,57 @@ async def analyze(file: UploadFile = File(...)):
         "result": result,
         "explanation": explanation,
         "guidelines": guidelines,
+        "burst": burst,
+    }
+
+
+@app.post("/api/analyze/lesions")
+async def analyze_lesions(
+    file: UploadFile = File(...),
+    trace: bool = Query(False),
+    x_medivan_trace: str | None = Header(None),
+    x_medivan_priority: str | None = Header(None),
+):
+    """Wide-field skin photo: classify every candidate lesion in one batch, with bounding boxes."""
+    want_trace = _trace_requested(trace, x_medivan_trace)
+    cls = _priority_class(x_medivan_priority, "interactive")
+    with scheduler.priority(cls), tracing.request("analyze_lesions", enabled=want_trace) as t:
+        response = await _analyze_lesions(file)
+    if want_trace:
+        response["trace"] = t.breakdown()
+    return response
+
+
+NO_LESIONS = "No distinct lesions found. Photograph the area closer, or capture each lesion separately."
+
+
+async def _lesion_regions(image: Image.Image) -> list[dict]:
+    """Propose lesion regions and classify their full-resolution crops in one skin-classifier batch."""
+    with tracing.span("lesion_proposals"):
+        regions = await run_in_threadpool(lesions.propose, image, LESION_MAX_REGIONS)
+    if not regions:
+        return []
+    crops = [image.crop(tuple(r["box"])) for r in regions]
+    start = time.perf_counter()
+    results = await run_in_threadpool(skin_classifier.classify_batch, crops)
+    metrics.observe("classify.skin_lesion.regions", time.perf_counter() - start)
+    metrics.incr("lesions.regions", len(regions))
+    return [{**result, "region": {"index": i, "box": r["box"], "score": r["score"]}}
+            for i, (r, result) in enumerate(zip(regions, results))]
+
+
+async def _analyze_lesions(file: UploadFile) -> dict:
+    image = await _read_image(file, full_size=True)
+    rejected = quality.gate(_assess(image), "skin_lesion")
+    if rejected:
+        return {"image_type": "skin_lesion", "regions": [], "quality": rejected, "explanation": rejected["hint"]}
+    regions = await _lesion_regions(image)
+    return {
+        "image_type": "skin_lesion",
+        "regions": regions,
+        "explanation": None if regions else NO_LESIONS,
+        "image_id": image.info.get("sha256"),
+        "size": list(image.size),
     }
 
 
@@ -131,38 +432,428 @@ async def get_session(sid: str):
 
 
 @app.post("/api/session/{sid}/analyze")
-async def session_analyze(sid: str, file: UploadFile = File(...)):
+async def session_analyze(
+    sid: str,
+    file: UploadFile = File(...),
+    trace: bool = Query(False),
+    x_medivan_trace: str | None = Header(None),
+    x_medivan_priority: str | None = Header(None),
+):
     s = session_manager.get_session(sid)
     if not s:
         raise HTTPException(404, "Session not found")
 
+    want_trace = _trace_requested(trace, x_medivan_trace)
+    cls = _priority_class(x_medivan_priority, "interactive")
+    with scheduler.priority(cls), tracing.request("session_analyze", enabled=want_trace) as t:
+        finding = await _session_analyze(sid, file)
+    if want_trace:
+        return {**finding, "trace": t.breakdown()}
+    return finding
+
+
+def _retake_finding(rejected: dict, route: dict | None) -> dict:
+    """Finding-shaped response for a capture the quality gate rejected; not added to the session."""
+    return {
+        "image_type": route["type"] if route else "unknown",
+        "classification": "retake required",
+        "confidence": 0,
+        "risk_level": "low",
+        "recommendation": rejected["hint"],
+        "quality": rejected,
+        "rejected": True,
+        "route": route,
+    }
+
+
+def _add_finding(sid: str, finding: dict) -> dict:
+    """Add a finding to its session and queue it for the statistics store."""
+    finding = session_manager.add_finding(sid, finding)
+    analytics.record(sid, finding)
+    return finding
+
+
+def _duplicate_check(sid: str, image: Image.Image, image_type: str, embedding) -> tuple[dict | None, dict | None]:
+    """``(reused finding, possible-duplicate hint)`` for a routed image; at most one is set.
+
+    Only a re-upload within the same session, classified by the model
+    version still active, reuses the prior finding. A match from another
+    session is a different patient's record: the image is classified
+    afresh and the match is only reported as a hint.
+    """
+    dup = dedup.lookup(image.info.get("dhash"), image.info.get("sha256"), embedding, image_type, sid)
+    if dup is None:
+        return None, None
+    match = {"session": dup["sid"], "finding": dup["index"], "exact": dup["exact"],
+             "distance": dup["distance"], "similarity": dup["similarity"]}
+    prior = dup["finding"]
+    if dup["sid"] != sid:
+        metrics.incr("dedup.flagged")
+        return None, match
+    if prior.get("model_version") != CLASSIFIER_MODULES[image_type].model_version():
+        return None, match  # classified by a swapped-out model: run it again
+    finding = {k: v for k, v in prior.items() if k not in ("index", "timestamp", "burst", "duplicate_of", "possible_duplicate", "image_id", "route")}
+    finding["duplicate_of"] = match
+    metrics.incr("dedup.saved.classify")
+    return finding, None
+
+
+async def _session_analyze(sid: str, file: UploadFile) -> dict:
     image = await _read_image(file)
-    route = router.route_image(image, file.filename or "")
+    image_quality = _assess(image)
+    rejected = quality.gate(image_quality)
+    if rejected:
+        return _retake_finding(rejected, None)
+
+    route = await _route(image, file.filename or "")
+    embedding = route.pop("embedding", None)
     image_type = route["type"]
 
+    hint = None
     if image_type == "unknown":
         finding = {"image_type": "unknown", "classification": "unidentified", "confidence": 0, "risk_level": "low", "recommendation": "Re-upload a clearer image."}
     else:
-        result = CLASSIFIERS[image_type](image)
+        rejected = quality.gate(image_quality, image_type)
+        if rejected:
+            return _retake_finding(rejected, route)
+        reused, hint = _duplicate_check(sid, image, image_type, embedding)
+        if reused:
+            return _add_finding(sid, {**reused, "route": route, "image_id": image.info.get("sha256")})
+        result = await _classify(image_type, image)
         finding = {"image_type": image_type, **result}
 
     finding["route"] = route
-    session_manager.add_finding(sid, finding)
+    if hint:
+        finding["possible_duplicate"] = hint
+    finding["image_id"] = image.info.get("sha256")
+    _add_finding(sid, finding)
+    if image_type != "unknown":
+        dedup.add(image.info.get("dhash"), image.info.get("sha256"), embedding, sid, finding)
+        await run_in_threadpool(case_index.add_case, image_type, embedding, finding, sid)
     return finding
 
 
+@app.post("/api/session/{sid}/analyze/burst")
+async def session_analyze_burst(
+    sid: str,
+    files: list[UploadFile] = File(...),
+    trace: bool = Query(False),
+    x_medivan_trace: str | None = Header(None),
+    x_medivan_priority: str | None = Header(None),
+):
+    s = session_manager.get_session(sid)
+    if not s:
+        raise HTTPException(404, "Session not found")
+
+    want_trace = _trace_requested(trace, x_medivan_trace)
+    cls = _priority_class(x_medivan_priority, "interactive")
+    with scheduler.priority(cls), tracing.request("session_analyze_burst", enabled=want_trace) as t:
+        finding = await _session_analyze_burst(sid, files)
+    if want_trace:
+        return {**finding, "trace": t.breakdown()}
+    return finding
+
+
+async def _session_analyze_burst(sid: str, files: list[UploadFile]) -> dict:
+    selection = await _select_frame(files)
+    route, burst = selection["route"], _burst_summary(selection)
+    if selection["rejected"]:
+        return {**_retake_finding(selection["rejected"], route), "burst": burst}
+
+    image_type = route["type"]
+    hint = None
+    if image_type != "unknown":
+        reused, hint = _duplicate_check(sid, selection["image"], image_type, selection["embedding"])
+        if reused:
+            return _add_finding(sid, {**reused, "route": route, "burst": burst, "image_id": selection["image"].info.get("sha256")})
+
+    if image_type == "unknown":
+        finding = {"image_type": "unknown", "classification": "unidentified", "confidence": 0, "risk_level": "low", "recommendation": "Re-upload a clearer image."}
+    else:
+        finding = {"image_type": image_type, **(await _classify(image_type, selection["image"]))}
+
+    finding["route"] = route
+    finding["burst"] = burst
+    if hint:
+        finding["possible_duplicate"] = hint
+    finding["image_id"] = selection["image"].info.get("sha256")
+    _add_finding(sid, finding)
+    if image_type != "unknown":
+        image = selection["image"]
+        dedup.add(image.info.get("dhash"), image.info.get("sha256"), selection["embedding"], sid, finding)
+        await run_in_threadpool(case_index.add_case, image_type, selection["embedding"], finding, sid)
+    return finding
+
+
+# ── Resumable uploads ─────────────────────────────────────
+
+
+def _upload_view(upload: dict) -> dict:
+    return {k: upload[k] for k in ("upload_id", "size", "offset", "chunk_size")} | {"finalized": upload["result"] is not None}
+
+
+def _get_upload(upload_id: str) -> dict:
+    upload = uploads.get(upload_id)
+    if upload is None:
+        raise HTTPException(404, "Upload not found")
+    return upload
+
+
+@app.post("/api/session/{sid}/uploads", status_code=201)
+async def start_upload(
+    sid: str,
+    size: int = Query(...),
+    filename: str = Query(""),
+    idempotency_key: str | None = Header(None),
+):
+    """Start a chunked upload of ``size`` bytes; a retry with the same Idempotency-Key returns the same upload."""
+    if not session_manager.get_session(sid):
+        raise HTTPException(404, "Session not found")
+    try:
+        upload = uploads.create(sid, size, filename, idempotency_key)
+    except ValueError as e:
+        raise HTTPException(413 if size > 0 else 400, str(e))
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+    return _upload_view(upload)
+
+
+@app.get("/api/uploads/{upload_id}")
+async def upload_status(upload_id: str):
+    """Where to resume after a dropped connection."""
+    return _upload_view(_get_upload(upload_id))
+
+
+@app.patch("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, upload_offset: int = Header(...)):
+    """Append the request body at Upload-Offset; 409 with the current offset if that isn't where the upload stands."""
+    upload = _get_upload(upload_id)
+    too_large = f"Chunk too large (max {UPLOAD_MAX_CHUNK} bytes)"
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > UPLOAD_MAX_CHUNK:
+        raise HTTPException(413, too_large)
+    # Content-Length can be absent (chunked transfer encoding): enforce the cap while reading too
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > UPLOAD_MAX_CHUNK:
+            raise HTTPException(413, too_large)
+    try:
+        offset = await run_in_threadpool(uploads.append, upload_id, upload_offset, bytes(data))
+    except RuntimeError as e:
+        return JSONResponse({"detail": str(e), "offset": upload["offset"]}, status_code=409)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+    return {"upload_id": upload_id, "offset": offset, "size": upload["size"]}
+
+
+# One finalize per upload at a time, so a retry that races the original waits for its finding.
+# upload id -> {"lock", "users"}; dropped when the last request using it is done, however it ended
+_finalize_locks: dict = {}
+
+
+@app.post("/api/uploads/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    trace: bool = Query(False),
+    x_medivan_trace: str | None = Header(None),
+    x_medivan_priority: str | None = Header(None),
+):
+    """Analyze a complete upload into its session; retries return the same finding."""
+    upload = _get_upload(upload_id)
+    if not session_manager.get_session(upload["sid"]):
+        raise HTTPException(404, "Session not found")
+
+    want_trace = _trace_requested(trace, x_medivan_trace)
+    cls = _priority_class(x_medivan_priority, "interactive")
+    entry = _finalize_locks.setdefault(upload_id, {"lock": asyncio.Lock(), "users": 0})
+    entry["users"] += 1
+    try:
+        async with entry["lock"]:
+            if upload["result"] is not None:
+                uploads.replayed()
+                return upload["result"]
+            try:
+                path = uploads.path(upload_id)
+            except ValueError as e:
+                raise HTTPException(409, str(e))
+            except LookupError as e:
+                raise HTTPException(404, str(e))
+            with open(path, "rb") as fh, scheduler.priority(cls), \
+                    tracing.request("session_upload_finalize", enabled=want_trace) as t:
+                finding = await _session_analyze(upload["sid"], UploadFile(file=fh, filename=upload["filename"]))
+            try:
+                uploads.complete(upload_id, finding)
+            except LookupError:
+                # Expired while being analyzed: the finding is stored, only replays are lost
+                pass
+    finally:
+        entry["users"] -= 1
+        if entry["users"] == 0:
+            _finalize_locks.pop(upload_id, None)
+    if want_trace:
+        return {**finding, "trace": t.breakdown()}
+    return finding
+
+
+@app.post("/api/session/{sid}/analyze/lesions")
+async def session_analyze_lesions(
+    sid: str,
+    file: UploadFile = File(...),
+    trace: bool = Query(False),
+    x_medivan_trace: str | None = Header(None),
+    x_medivan_priority: str | None = Header(None),
+):
+    """Add one finding per candidate lesion of a wide-field skin photo."""
+    s = session_manager.get_session(sid)
+    if not s:
+        raise HTTPException(404, "Session not found")
+
+    want_trace = _trace_requested(trace, x_medivan_trace)
+    cls = _priority_class(x_medivan_priority, "interactive")
+    with scheduler.priority(cls), tracing.request("session_analyze_lesions", enabled=want_trace) as t:
+        response = await _session_analyze_lesions(sid, file)
+    if want_trace:
+        response["trace"] = t.breakdown()
+    return response
+
+
+async def _session_analyze_lesions(sid: str, file: UploadFile) -> dict:
+    image = await _read_image(file, full_size=True)
+    rejected = quality.gate(_assess(image), "skin_lesion")
+    if rejected:
+        return {"findings": [], "retake": {**_retake_finding(rejected, None), "image_type": "skin_lesion"}}
+    findings = []
+    for region in await _lesion_regions(image):
+        finding = {"image_type": "skin_lesion", **region, "image_id": image.info.get("sha256")}
+        findings.append(_add_finding(sid, finding))
+    return {"findings": findings, "explanation": None if findings else NO_LESIONS}
+
+
 @app.post("/api/session/{sid}/report")
-async def session_report(sid: str):
+async def session_report(sid: str, x_medivan_priority: str | None = Header(None)):
     s = session_manager.get_session(sid)
     if not s:
         raise HTTPException(404, "Session not found")
     if not s["findings"]:
         raise HTTPException(400, "No findings to report")
-    report = report_generator.generate_report(s)
+    with scheduler.priority(_priority_class(x_medivan_priority, "report")):
+        report = await run_in_threadpool(report_generator.generate_report, s)
     session_manager.set_report(sid, report)
     return {"report": report}
 
 
+@app.get("/api/sync")
+async def sync_feed(
+    request: Request,
+    cursor: str | None = Query(None),
+    limit: int | None = Query(None, ge=1),
+):
+    """Sessions and findings changed since ``cursor`` as (gzipped) NDJSON, ending in a checkpoint line."""
+    try:
+        since, reset = sync.parse_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {"Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(sync.stream(since, reset, limit, compress), media_type="application/x-ndjson", headers=headers)
+
+
+@app.get("/api/analytics")
+async def analytics_aggregate(
+    group_by: str = Query("image_type,classification"),
+    bucket: str = Query("day"),
+    start: str | None = Query(None, description="First day (YYYY-MM-DD), inclusive"),
+    end: str | None = Query(None, description="Last day (YYYY-MM-DD), inclusive"),
+    van: str | None = Query(None),
+    image_type: str | None = Query(None),
+    histogram: bool = Query(False),
+):
+    """Finding counts and confidence distributions per time bucket, e.g. daily classifications per van."""
+    columns = [c.strip() for c in group_by.split(",") if c.strip()]
+    try:
+        return await run_in_threadpool(analytics.aggregate, columns, bucket, start, end, van, image_type, histogram)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+@app.post("/api/similar")
+async def similar_cases(
+    file: UploadFile = File(...),
+    k: int = Query(5, ge=1, le=50),
+    image_type: str | None = Query(None),
+    exclude_session: str | None = Query(None),
+):
+    """The k most similar prior session findings for an image, by CLIP embedding."""
+    if image_type is not None and image_type not in router.IMAGE_TYPES:
+        raise HTTPException(400, f"Unknown image_type '{image_type}' (expected one of {', '.join(router.IMAGE_TYPES)})")
+    image = await _read_image(file)
+    route = await _route(image, file.filename or "")
+    embedding = route.pop("embedding", None)
+    image_type = image_type or route["type"]
+    if image_type == "unknown":
+        return {"image_type": "unknown", "route": route, "cases": []}
+
+    start = time.perf_counter()
+    cases = case_index.similar(image_type, embedding, k, exclude_session)
+    metrics.observe("similar", time.perf_counter() - start)
+    return {"image_type": image_type, "route": route, "cases": cases}
+
+
+@app.get("/api/archive/{image_id}")
+async def archived_image(image_id: str, thumb: bool = Query(False)):
+    """An archived upload (or its thumbnail) by the image_id reported in findings."""
+    path = archive.path_for(image_id, thumb)
+    if path is None:
+        raise HTTPException(404, "Image not archived")
+    return FileResponse(path)
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return {**metrics.snapshot(), "quality_gate": quality.get_status()}
+
+
+@app.get("/api/admin/profile")
+async def profile_status():
+    return tracing.profile_status()
+
+
+@app.post("/api/admin/profile")
+async def start_profile(requests: int = Query(10, ge=1, le=1000)):
+    """Capture a profiler trace over the next N analyze requests into UPLOAD_DIR."""
+    try:
+        return tracing.arm_profiler(requests)
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+
+
+# Hot-swappable classifiers, by the names used in the model store
+SWAPPABLE = {"skin": skin_classifier, "chest": chest_classifier, "eye": eye_classifier}
+
+
+@app.get("/api/admin/models")
+async def model_versions():
+    return {name: module.get_status() for name, module in SWAPPABLE.items()}
+
+
+@app.post("/api/admin/models/{name}/swap", status_code=202)
+async def swap_model(name: str, model_id: str = Query(..., min_length=1)):
+    """Load ``model_id`` in the background; new requests move to it once it is warmed up."""
+    if name not in SWAPPABLE:
+        raise HTTPException(404, f"Unknown model '{name}' (expected one of {', '.join(SWAPPABLE)})")
+    if MOCK_MODE:
+        raise HTTPException(409, "Model swap is unavailable in mock mode")
+    try:
+        return SWAPPABLE[name].swap(model_id)
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+
+
 # Serve frontend static files
 FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "out")
 if os.path.isdir(FRONTEND_DIR):
@@ -0,0 +1,272 @@
+"""Screening statistics store for MediVan AI.
+
+Every session finding is appended as one row to a SQLite table at
+ANALYTICS_DB: van, day, image type, classification, risk level,
+confidence and model version. The session JSON stays in memory. Rows
+are written in batches by a background thread, so the analyze path
+never waits on disk.
+
+An insert trigger folds each row into ``daily``: one row per (day, van,
+image type, classification, risk level, model version) holding the
+count, confidence sum/min/max and a 10-bin confidence histogram. The
+table is clustered on that key, starting with ``day``. Duplicate
+findings (a re-upload answered with an earlier result) are kept in
+``findings`` but not counted in ``daily``, so statistics count patients'
+images once.
+
+``aggregate()`` runs the group-bys behind ``GET /api/analytics`` over
+``daily``, not the findings. It returns counts, mean/min/max confidence
+and optionally the histogram per time bucket and group columns. Results
+can be filtered by day range, van or modality. A year of one van's
+screening is a few thousand rollup rows, so queries return in
+milliseconds however many findings that was.
+"""
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from datetime import date, datetime
+from backend.config import ANALYTICS, ANALYTICS_DB, VAN_ID
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_BINS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS findings (
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    van TEXT NOT NULL,
+    session TEXT NOT NULL,
+    finding INTEGER NOT NULL,
+    image_type TEXT NOT NULL,
+    classification TEXT,
+    risk_level TEXT,
+    confidence REAL,
+    model_version TEXT,
+    duplicate INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (van, session, finding)
+);
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL,
+    van TEXT NOT NULL,
+    image_type TEXT NOT NULL,
+    classification TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    confidence_min REAL,
+    confidence_max REAL,
+    %(bins_ddl)s,
+    PRIMARY KEY (day, van, image_type, classification, risk_level, model_version)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS findings_daily AFTER INSERT ON findings WHEN NEW.duplicate = 0 BEGIN
+    INSERT INTO daily VALUES (
+        NEW.day, NEW.van, NEW.image_type, COALESCE(NEW.classification, ''), COALESCE(NEW.risk_level, ''),
+        COALESCE(NEW.model_version, ''), 1, COALESCE(NEW.confidence, 0), NEW.confidence, NEW.confidence,
+        %(bins_new)s
+    ) ON CONFLICT DO UPDATE SET
+        count = count + 1,
+        confidence_sum = confidence_sum + excluded.confidence_sum,
+        confidence_min = MIN(COALESCE(confidence_min, excluded.confidence_min), COALESCE(excluded.confidence_min, confidence_min)),
+        confidence_max = MAX(COALESCE(confidence_max, excluded.confidence_max), COALESCE(excluded.confidence_max, confidence_max)),
+        %(bins_update)s;
+END;
+""" % {
+    "bins_ddl": ",\n    ".join(f"h{i} INTEGER NOT NULL" for i in range(HISTOGRAM_BINS)),
+    "bins_new": ", ".join(f"MIN(CAST(COALESCE(NEW.confidence, -1) * {HISTOGRAM_BINS} AS INTEGER), {HISTOGRAM_BINS - 1}) = {i}"
+                          for i in range(HISTOGRAM_BINS)),
+    "bins_update": ",\n        ".join(f"h{i} = h{i} + excluded.h{i}" for i in range(HISTOGRAM_BINS)),
+}
+
+# Databases older than this were rolled up with duplicates counted; _connect() rebuilds their rollup
+SCHEMA_VERSION = 1
+REBUILD_DAILY = """
+DROP TRIGGER IF EXISTS findings_daily;
+DELETE FROM daily;
+INSERT INTO daily
+SELECT day, van, image_type, COALESCE(classification, ''), COALESCE(risk_level, ''), COALESCE(model_version, ''),
+    COUNT(*), SUM(COALESCE(confidence, 0)), MIN(confidence), MAX(confidence),
+    %(bins_sum)s
+FROM findings WHERE duplicate = 0
+GROUP BY 1, 2, 3, 4, 5, 6;
+""" % {
+    "bins_sum": ",\n    ".join(f"SUM(MIN(CAST(COALESCE(confidence, -1) * {HISTOGRAM_BINS} AS INTEGER), {HISTOGRAM_BINS - 1}) = {i})"
+                             for i in range(HISTOGRAM_BINS)),
+}
+
+COLUMNS = ("ts", "day", "van", "session", "finding", "image_type", "classification", "risk_level", "confidence", "model_version", "duplicate")
+
+GROUPS = ("van", "image_type", "classification", "risk_level", "model_version")
+BUCKETS = {
+    "day": "day",
+    "week": "strftime('%Y-W%W', day)",
+    "month": "substr(day, 1, 7)",
+    "year": "substr(day, 1, 4)",
+    "all": None,
+}
+# Rows per write transaction
+BATCH_ROWS = 500
+
+_queue = queue.Queue(maxsize=10000)
+_thread = None
+_thread_lock = threading.Lock()
+_schema_ready = False
+_local = threading.local()
+_stats = {"written": 0, "dropped": 0, "failed": 0}
+
+
+def _connect() -> sqlite3.Connection:
+    global _schema_ready
+    conn = sqlite3.connect(ANALYTICS_DB, timeout=30)
+    if not _schema_ready:
+        with _thread_lock:
+            if not _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                    # Swap in the current trigger and recount the rollup in one transaction
+                    conn.executescript(f"BEGIN; {REBUILD_DAILY} {SCHEMA} PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;")
+                _schema_ready = True
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _row(sid: str, finding: dict) -> tuple:
+    stamp = finding.get("timestamp")
+    ts = datetime.fromisoformat(stamp).timestamp() if stamp else time.time()
+    return (
+        ts,
+        stamp[:10] if stamp else date.today().isoformat(),
+        VAN_ID,
+        sid,
+        finding["index"],
+        finding["image_type"],
+        finding.get("classification"),
+        finding.get("risk_level"),
+        finding.get("confidence"),
+        finding.get("model_version"),
+        int("duplicate_of" in finding),
+    )
+
+
+def record(sid: str, finding: dict):
+    """Queue a session finding for the statistics store; never blocks."""
+    if not ANALYTICS:
+        return
+    _ensure_writer()
+    try:
+        _queue.put_nowait(_row(sid, finding))
+    except queue.Full:
+        _stats["dropped"] += 1
+        metrics.incr("analytics.dropped")
+        logger.warning(f"Analytics queue full; not recording finding {finding['index']} of session {sid}")
+
+
+def _ensure_writer():
+    global _thread
+    if _thread is not None:
+        return
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_writer, name="analytics-writer", daemon=True)
+            _thread.start()
+
+
+def _writer():
+    conn = _connect()
+    sql = f"INSERT OR IGNORE INTO findings ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    while True:
+        rows = [_queue.get()]
+        while len(rows) < BATCH_ROWS:
+            try:
+                rows.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with conn:
+                conn.executemany(sql, rows)
+            _stats["written"] += len(rows)
+        except Exception as e:
+            _stats["failed"] += len(rows)
+            logger.error(f"Writing {len(rows)} analytics rows failed: {e}", exc_info=True)
+        finally:
+            for _ in rows:
+                _queue.task_done()
+
+
+def flush():
+    """Wait until every queued row is written."""
+    if _thread is not None:
+        _queue.join()
+
+
+def _reader() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _connect()
+    return conn
+
+
+def aggregate(
+    group_by: list[str], bucket: str = "day", start: str | None = None, end: str | None = None,
+    van: str | None = None, image_type: str | None = None, histogram: bool = False,
+) -> dict:
+    """Finding counts and confidence stats per time bucket and ``group_by`` columns.
+
+    ``start``/``end`` are inclusive ISO days. Raises ValueError for unknown
+    columns or buckets, malformed days, or when the store is disabled.
+    """
+    if not ANALYTICS:
+        raise ValueError("Analytics store is disabled (ANALYTICS=false)")
+    unknown = [g for g in group_by if g not in GROUPS]
+    if unknown:
+        raise ValueError(f"Cannot group by {', '.join(unknown)} (expected any of {', '.join(GROUPS)})")
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}' (expected one of {', '.join(BUCKETS)})")
+    for d in (start, end):
+        if d is not None:
+            date.fromisoformat(d)
+
+    keys = ([] if BUCKETS[bucket] is None else [f"{BUCKETS[bucket]} AS bucket"]) + list(group_by)
+    select = keys + [
+        "SUM(count) AS count",
+        "ROUND(SUM(confidence_sum) / SUM(count), 4) AS mean_confidence",
+        "MIN(confidence_min) AS min_confidence",
+        "MAX(confidence_max) AS max_confidence",
+    ]
+    if histogram:
+        select += [f"SUM(h{i}) AS h{i}" for i in range(HISTOGRAM_BINS)]
+    where, params = [], []
+    for clause, value in (("day >= ?", start), ("day <= ?", end), ("van = ?", van), ("image_type = ?", image_type)):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    group = [k.split(" AS ")[-1] for k in keys]
+    sql = f"SELECT {', '.join(select)} FROM daily"
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    if group:
+        sql += f" GROUP BY {', '.join(group)} ORDER BY {', '.join(group)}"
+
+    start_t = time.perf_counter()
+    cur = _reader().execute(sql, params)
+    names = [d[0] for d in cur.description]
+    rows = []
+    for values in cur:
+        row = dict(zip(names, values))
+        for g in group_by:
+            row[g] = row[g] or None  # stored as '' so the rollup key is never NULL
+        if histogram:
+            row["confidence_histogram"] = [row.pop(f"h{i}") for i in range(HISTOGRAM_BINS)]
+        rows.append(row)
+    elapsed = time.perf_counter() - start_t
+    metrics.observe("analytics.query", elapsed)
+    return {"bucket": bucket, "group_by": list(group_by), "rows": rows, "query_ms": round(elapsed * 1000, 2)}
+
+
+def get_status() -> dict:
+    return {"enabled": ANALYTICS, "db": ANALYTICS_DB, "van": VAN_ID, "queued": _queue.qsize(), **_stats}
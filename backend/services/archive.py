@@ -0,0 +1,229 @@
+"""Content-addressed archive of uploaded images for MediVan AI.
+
+Every upload is kept under ``UPLOAD_DIR/archive`` with a model-size
+JPEG thumbnail, named by the SHA-256 of the original bytes and sharded
+two levels deep::
+
+    archive/3f/a2/3fa2...e1.jpg          original, byte for byte
+    archive/3f/a2/3fa2...e1.thumb.jpg    longest side ARCHIVE_THUMB_SIZE
+
+Re-uploading the same bytes writes nothing new; it only refreshes the
+file times so retention treats the image as recently used. Writes go
+through a queue to one background thread, so the analyze path never
+waits on disk. The queue holds only the original bytes (the thumbnail is
+decoded from them in the writer) and is bounded by both count and total
+bytes. If either bound is hit the write is dropped and counted rather
+than blocking the request. The same thread periodically
+deletes entries older than ARCHIVE_RETENTION_DAYS, then the least
+recently used ones while the archive exceeds ARCHIVE_MAX_GB.
+"""
+import os
+import io
+import glob
+import time
+import queue
+import hashlib
+import logging
+import threading
+from PIL import Image
+from backend.config import (
+    UPLOAD_DIR, ARCHIVE, ARCHIVE_THUMB_SIZE, ARCHIVE_RETENTION_DAYS, ARCHIVE_MAX_GB, ARCHIVE_QUEUE_SIZE,
+    ARCHIVE_QUEUE_MB,
+)
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.join(UPLOAD_DIR, "archive")
+SWEEP_INTERVAL_S = 600
+# After a size-cap sweep the archive is trimmed to this fraction of the cap, so sweeps don't run back to back
+SWEEP_TARGET = 0.9
+
+_queue = queue.Queue(maxsize=ARCHIVE_QUEUE_SIZE)
+_queued_bytes = 0
+_bytes_lock = threading.Lock()
+_thread = None
+_thread_lock = threading.Lock()
+_stats = {"written": 0, "deduplicated": 0, "dropped": 0, "failed": 0, "swept": 0, "last_sweep": None}
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _shard(sha: str) -> str:
+    return os.path.join(ROOT, sha[:2], sha[2:4])
+
+
+def path_for(sha: str, thumb: bool = False) -> str | None:
+    """Archived original (or thumbnail) for ``sha``, None if not on disk (yet)."""
+    if len(sha) != 64 or any(c not in "0123456789abcdef" for c in sha):
+        return None
+    if thumb:
+        path = os.path.join(_shard(sha), f"{sha}.thumb.jpg")
+        return path if os.path.exists(path) else None
+    for path in glob.glob(os.path.join(_shard(sha), f"{sha}.*")):
+        if not path.endswith(".thumb.jpg"):
+            return path
+    return None
+
+
+def submit(sha: str, data: bytes, fmt: str | None):
+    """Queue an upload for archiving; never blocks."""
+    global _queued_bytes
+    if not ARCHIVE:
+        return
+    _ensure_writer()
+    with _bytes_lock:
+        admitted = _queued_bytes + len(data) <= ARCHIVE_QUEUE_MB * 1e6
+        if admitted:
+            try:
+                _queue.put_nowait((sha, data, fmt))
+                _queued_bytes += len(data)
+            except queue.Full:
+                admitted = False
+    if not admitted:
+        _stats["dropped"] += 1
+        metrics.incr("archive.dropped")
+        logger.warning(f"Archive queue full; not archiving {sha[:12]}")
+
+
+def _release(data: bytes):
+    global _queued_bytes
+    with _bytes_lock:
+        _queued_bytes -= len(data)
+
+
+def _ensure_writer():
+    global _thread
+    if _thread is not None:
+        return
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_writer, name="archive-writer", daemon=True)
+            _thread.start()
+
+
+def _writer():
+    next_sweep = time.monotonic()
+    while True:
+        try:
+            item = _queue.get(timeout=SWEEP_INTERVAL_S)
+        except queue.Empty:
+            item = None
+        if item is not None:
+            try:
+                _write(*item)
+            except Exception as e:
+                _stats["failed"] += 1
+                logger.error(f"Archiving {item[0][:12]} failed: {e}", exc_info=True)
+            finally:
+                _release(item[1])
+                _queue.task_done()
+        if time.monotonic() >= next_sweep:
+            next_sweep = time.monotonic() + SWEEP_INTERVAL_S
+            try:
+                sweep()
+            except Exception as e:
+                logger.error(f"Archive sweep failed: {e}", exc_info=True)
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def _thumbnail(data: bytes) -> bytes:
+    image = Image.open(io.BytesIO(data))
+    # JPEGs decode straight to near thumbnail size instead of full resolution
+    image.draft("RGB", (ARCHIVE_THUMB_SIZE, ARCHIVE_THUMB_SIZE))
+    image = image.convert("RGB")
+    image.thumbnail((ARCHIVE_THUMB_SIZE, ARCHIVE_THUMB_SIZE))
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _write(sha: str, data: bytes, fmt: str | None):
+    existing = path_for(sha)
+    if existing:
+        # Same bytes already archived: mark as recently used for the size-cap sweep
+        os.utime(existing)
+        thumb = path_for(sha, thumb=True)
+        if thumb:
+            os.utime(thumb)
+        _stats["deduplicated"] += 1
+        metrics.incr("archive.deduplicated")
+        return
+
+    os.makedirs(_shard(sha), exist_ok=True)
+    ext = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "TIFF": "tif", "BMP": "bmp"}.get(fmt or "", "bin")
+    # Thumbnail first: an original on disk implies its thumbnail is too
+    _atomic_write(os.path.join(_shard(sha), f"{sha}.thumb.jpg"), _thumbnail(data))
+    _atomic_write(os.path.join(_shard(sha), f"{sha}.{ext}"), data)
+    _stats["written"] += 1
+    metrics.incr("archive.written")
+
+
+def _entries() -> list[tuple[float, int, str]]:
+    """(mtime, total bytes, sha) per archived image."""
+    entries = {}
+    for dirpath, _, filenames in os.walk(ROOT):
+        for fn in filenames:
+            if fn.endswith(".tmp"):
+                continue
+            path = os.path.join(dirpath, fn)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            sha = fn.split(".", 1)[0]
+            mtime, size = entries.get(sha, (0.0, 0))
+            entries[sha] = (max(mtime, st.st_mtime), size + st.st_size)
+    return [(mtime, size, sha) for sha, (mtime, size) in entries.items()]
+
+
+def _remove(sha: str):
+    for path in glob.glob(os.path.join(_shard(sha), f"{sha}.*")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def sweep() -> dict:
+    """Apply the retention and size-cap policy once."""
+    entries = sorted(_entries())  # oldest first
+    removed = 0
+    if ARCHIVE_RETENTION_DAYS > 0:
+        cutoff = time.time() - ARCHIVE_RETENTION_DAYS * 86400
+        while entries and entries[0][0] < cutoff:
+            _remove(entries.pop(0)[2])
+            removed += 1
+    total = sum(size for _, size, _ in entries)
+    if ARCHIVE_MAX_GB > 0 and total > ARCHIVE_MAX_GB * 1e9:
+        target = ARCHIVE_MAX_GB * 1e9 * SWEEP_TARGET
+        while entries and total > target:
+            _, size, sha = entries.pop(0)
+            _remove(sha)
+            total -= size
+            removed += 1
+    _stats["swept"] += removed
+    _stats["last_sweep"] = time.time()
+    if removed:
+        logger.info(f"Archive sweep removed {removed} images ({total / 1e9:.2f} GB left)")
+    return {"removed": removed, "images": len(entries), "bytes": total}
+
+
+def get_status() -> dict:
+    return {
+        "enabled": ARCHIVE,
+        "dir": ROOT,
+        "queued": _queue.qsize(),
+        "queued_mb": round(_queued_bytes / 1e6, 1),
+        "retention_days": ARCHIVE_RETENTION_DAYS,
+        "max_gb": ARCHIVE_MAX_GB,
+        **_stats,
+    }
@@ -0,0 +1,58 @@
+"""Capture profile for MediVan AI clients.
+
+Every model input is 224-384 px, so a 12 MP phone photo is mostly
+wasted uplink and decode time. ``profile()`` tells clients, per
+modality and for the models loaded right now, the smallest image that
+loses nothing downstream:
+
+    short_side   max(model input, router input, quality-gate min_side)
+
+Clients scale captures so their short side is at most that (never up)
+and re-encode as JPEG at CAPTURE_JPEG_QUALITY. Before routing the
+modality is unknown, so single-image uploads use ``default``, the largest
+short side over all modalities.
+
+On the server, ``decode_side()`` bounds JPEG decoding: an oversized JPEG
+is decoded at 1/2, 1/4 or 1/8 scale in the DCT domain (PIL draft mode)
+as long as its short side still covers the profile. A pre-sized capture
+is decoded as-is.
+"""
+from backend.config import MOCK_MODE, MAX_IMAGE_SIZE, UPLOAD_CHUNK_SIZE, CAPTURE_JPEG_QUALITY
+from backend.services import router, skin_classifier, chest_classifier, eye_classifier, quality
+
+CLASSIFIER_MODULES = {"skin_lesion": skin_classifier, "chest_xray": chest_classifier, "fundus": eye_classifier}
+
+
+def _modality(image_type: str, router_side: int | None) -> dict:
+    module = CLASSIFIER_MODULES[image_type]
+    model_side = module.input_size()
+    min_side = quality.THRESHOLDS[image_type]["min_side"]
+    return {
+        "short_side": max(s for s in (model_side, router_side, min_side) if s),
+        "model_input": model_side,
+        "min_side": min_side,
+        "model_version": module.model_version(),
+    }
+
+
+def profile() -> dict:
+    """Largest useful resolution and preferred encoding per modality, for the loaded models."""
+    router_side = router.input_size()
+    modalities = {t: _modality(t, router_side) for t in CLASSIFIER_MODULES}
+    return {
+        "mock_mode": MOCK_MODE,
+        "default": {"short_side": decode_side(modalities)},
+        "modalities": modalities,
+        "format": "image/jpeg",
+        "jpeg_quality": CAPTURE_JPEG_QUALITY,
+        "max_bytes": MAX_IMAGE_SIZE,
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+    }
+
+
+def decode_side(modalities: dict | None = None) -> int:
+    """Short side an upload of unknown modality needs: the largest over all modalities."""
+    if modalities is None:
+        router_side = router.input_size()
+        modalities = {t: _modality(t, router_side) for t in CLASSIFIER_MODULES}
+    return max(m["short_side"] for m in modalities.values())
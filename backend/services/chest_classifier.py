@@ -1,8 +1,8 @@
 """Chest X-ray classifier — ViT fine-tuned for thoracic pathology for MediVan AI."""
 import random
 import logging
-from PIL import Image
-from backend.config import MOCK_MODE, CHEST_MODEL
+from backend.config import CHEST_MODEL
+from backend.services.classifier import ImageClassifier
 
 logger = logging.getLogger(__name__)
 
@@ -38,35 +38,8 @@ LABEL_VARIANTS = {
     "hernia": "normal",
 }
 
-_model = None
-_processor = None
-_device = "cpu"
-
-
-def _load():
-    """Load the pretrained chest X-ray ViT model."""
-    global _model, _processor, _device
-    if _model is not None:
-        return
-
-    import torch
-    from transformers import AutoModelForImageClassification, AutoImageProcessor
-
-    if torch.cuda.is_available():
-        _device = "cuda"
-    elif hasattr(torch.backends, "mps") and torch.backends.mps.is_available():
-        _device = "mps"
-    else:
-        _device = "cpu"
-
-    logger.info(f"Loading chest classifier '{CHEST_MODEL}' on {_device}")
-    _processor = AutoImageProcessor.from_pretrained(CHEST_MODEL)
-    _model = AutoModelForImageClassification.from_pretrained(CHEST_MODEL)
-    _model = _model.to(_device).eval()
-
-    id2label = _model.config.id2label or {}
-    logger.info(f"Chest model labels: {id2label}")
-    logger.info(f"Chest classifier loaded ({sum(p.numel() for p in _model.parameters())/1e6:.1f}M params)")
+# Test-time augmentation views for low-confidence films; crops only, a flip would swap laterality
+TTA_VIEWS = ("zoom", "corners")
 
 
 def _normalize_label(label: str) -> str:
@@ -80,59 +53,6 @@ def _normalize_label(label: str) -> str:
     return label
 
 
-def classify(image: Image.Image) -> dict:
-    """Classify a chest X-ray image."""
-    if MOCK_MODE:
-        return _mock()
-
-    _load()
-    import torch
-
-    try:
-        inputs = _processor(images=image, return_tensors="pt")
-        inputs = {k: v.to(_device) for k, v in inputs.items()}
-
-        with torch.no_grad():
-            outputs = _model(**inputs)
-            logits = outputs.logits
-            probs = torch.softmax(logits, dim=-1)[0]
-
-        id2label = _model.config.id2label or {i: f"class_{i}" for i in range(len(probs))}
-
-        raw_results = {}
-        canonical_results = {}
-        for i in range(len(probs)):
-            raw_label = id2label.get(i, f"class_{i}")
-            norm_label = _normalize_label(raw_label)
-            score = float(probs[i])
-            raw_results[raw_label] = score
-            canonical_results[norm_label] = canonical_results.get(norm_label, 0.0) + score
-
-        best = max(canonical_results, key=canonical_results.get)
-        conf = canonical_results[best]
-        risk = RISK_MAP.get(best, "moderate")
-
-        return {
-            "classification": best,
-            "confidence": round(conf, 4),
-            "risk_level": risk,
-            "all_scores": {k: round(v, 4) for k, v in sorted(canonical_results.items(), key=lambda x: -x[1])[:7]},
-            "raw_model_output": {k: round(v, 4) for k, v in sorted(raw_results.items(), key=lambda x: -x[1])[:5]},
-            "recommendation": _recommendation(best),
-        }
-
-    except Exception as e:
-        logger.error(f"Chest classification failed: {e}", exc_info=True)
-        return {
-            "classification": "error",
-            "confidence": 0,
-            "risk_level": "moderate",
-            "all_scores": {},
-            "recommendation": f"Classification failed: {e}. Please re-upload or consult radiologist.",
-            "error": str(e),
-        }
-
-
 def _mock() -> dict:
     weights = [0.3, 0.15, 0.2, 0.12, 0.1, 0.05, 0.08]
     best = random.choices(CLASSES, weights=weights, k=1)[0]
@@ -145,6 +65,7 @@ def _mock() -> dict:
         "risk_level": RISK_MAP[best],
         "all_scores": dict(sorted(scores.items(), key=lambda x: -x[1])),
         "recommendation": _recommendation(best),
+        "model_version": "mock",
     }
 
 
@@ -161,12 +82,22 @@ def _recommendation(cls: str) -> str:
     return recs.get(cls, "Consult radiologist for further evaluation.")
 
 
-def get_status() -> dict:
-    if MOCK_MODE:
-        return {"name": "Chest X-ray Classifier", "status": "ready (mock)", "model": CHEST_MODEL}
-    return {
-        "name": "Chest X-ray Classifier",
-        "status": "loaded" if _model else "not_loaded",
-        "model": CHEST_MODEL,
-        "device": _device if _model else None,
-    }
+_classifier = ImageClassifier(
+    "chest classifier", "Chest X-ray Classifier", CHEST_MODEL,
+    normalize_label=_normalize_label,
+    risk_map=RISK_MAP,
+    fallback_label=lambda i: f"class_{i}",
+    recommendation=_recommendation,
+    mock=_mock,
+    referral="consult radiologist",
+    tta_views=TTA_VIEWS,
+)
+
+_load = _classifier.load
+classify = _classifier.classify
+classify_batch = _classifier.classify_batch
+warm_up = _classifier.warm_up
+model_version = _classifier.model_version
+input_size = _classifier.input_size
+swap = _classifier.swap
+get_status = _classifier.get_status
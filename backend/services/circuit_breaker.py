@@ -0,0 +1,148 @@
+"""Circuit breaker for remote dependencies (the LLM endpoint) in MediVan AI."""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Trip after consecutive failures, fail fast while open, then probe for recovery.
+
+    While open, callers get ``allow() == False`` immediately. Once the
+    cooldown has elapsed, ``probe`` (a cheap health check) runs in the
+    background every ``cooldown`` seconds; when it succeeds the breaker goes
+    half-open and lets a single real request through as the trial. A
+    successful trial closes the breaker, a failed one re-opens it. Without a
+    ``probe`` the first call after the cooldown is the trial.
+
+    Wrap calls in ``guard()`` so a trial that ends without a recorded
+    outcome (an unexpected exception, cancellation, a coalesced result)
+    never leaves the breaker waiting on it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown: float = 30.0, probe=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._probe = probe
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_owner = None
+        self._probing = False
+        self._stats = {"trips": 0, "rejected": 0, "probes": 0, "last_error": None}
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to the remote service right now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._start_trial()
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                if self._probe is None:
+                    self._state = HALF_OPEN
+                    self._start_trial()
+                    logger.info(f"Circuit '{self.name}' half-open, sending trial request")
+                    return True
+                if not self._probing:
+                    self._probing = True
+                    threading.Thread(target=self._run_probe, daemon=True).start()
+            self._stats["rejected"] += 1
+            return False
+
+    def owns_trial(self) -> bool:
+        """Whether the calling thread holds the half-open trial slot."""
+        with self._lock:
+            return self._trial_in_flight and self._trial_owner == threading.get_ident()
+
+    def _start_trial(self):
+        self._trial_in_flight = True
+        self._trial_owner = threading.get_ident()
+
+    @contextmanager
+    def guard(self):
+        """Yield whether a call may go through, and make sure a trial call always settles.
+
+        An exception escaping the call is recorded as a failure. A trial
+        that finishes without record_success/record_failure (e.g. its
+        result came from another caller) frees the slot for the next trial.
+        """
+        allowed = self.allow()
+        try:
+            yield allowed
+        except BaseException as e:
+            if allowed:
+                self.record_failure(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            if allowed:
+                with self._lock:
+                    if self._trial_in_flight and self._trial_owner == threading.get_ident():
+                        self._trial_in_flight = False
+                        self._trial_owner = None
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed, remote service recovered")
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, error: str | None = None):
+        with self._lock:
+            self._failures += 1
+            self._stats["last_error"] = error
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._stats["trips"] += 1
+                    logger.warning(f"Circuit '{self.name}' open after {self._failures} failure(s): {error}")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def _run_probe(self):
+        ok = False
+        try:
+            ok = bool(self._probe())
+        except Exception as e:
+            logger.debug(f"Circuit '{self.name}' probe failed: {e}")
+        with self._lock:
+            self._probing = False
+            self._stats["probes"] += 1
+            if self._state != OPEN:
+                return
+            if ok:
+                self._state = HALF_OPEN
+                self._trial_in_flight = False
+                logger.info(f"Circuit '{self.name}' probe succeeded, half-open")
+            else:
+                self._opened_at = time.monotonic()
+
+    def status(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = round(max(self.cooldown - (time.monotonic() - self._opened_at), 0.0), 1)
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "cooldown_s": self.cooldown,
+                "retry_in_s": retry_in,
+                **self._stats,
+            }
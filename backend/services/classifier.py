@@ -0,0 +1,160 @@
+"""Shared model handling for MediVan AI's image classifiers.
+
+The skin, chest X-ray and diabetic retinopathy classifiers differ only in
+their labels, risk levels, recommendations and test-time augmentation
+views. ``ImageClassifier`` holds everything else:
+
+- loading onto the best available device;
+- the hot-swappable ``ModelSlot`` that pins a version per request;
+- the batched forward pass, with TTA for low-confidence images;
+- warm-up, version and status reporting.
+
+Each classifier module builds one instance and re-exports its methods as
+the module-level API (``classify``, ``classify_batch``, ``swap``, ...).
+"""
+import logging
+from PIL import Image
+from backend.config import MOCK_MODE
+from backend.services import model_store, model_swap, pipeline, tta, warmup
+from backend.services.label_map import LabelMap, raw_labels_for
+from backend.services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class ImageClassifier:
+    """One image classifier: its active model version plus the wording that goes with it.
+
+    ``fallback_label(i)`` names model outputs that have no ``id2label``
+    entry. ``recommendation(cls)`` gives the clinical advice for a
+    canonical class. ``mock()`` returns one simulated result in mock mode.
+    ``referral`` completes the advice shown when classification fails.
+    """
+
+    def __init__(
+        self, name: str, title: str, model_id: str, *, normalize_label, risk_map: dict, fallback_label,
+        recommendation, mock, referral: str, grades: list | None = None, tta_views: tuple = (), top_k: int | None = 7,
+    ):
+        self.name = name
+        self.title = title
+        self.configured_model = model_id
+        self.normalize_label = normalize_label
+        self.risk_map = risk_map
+        self.fallback_label = fallback_label
+        self.recommendation = recommendation
+        self.mock = mock
+        self.referral = referral
+        self.grades = grades
+        self.tta_views = tta_views
+        self.top_k = top_k
+        # The active model version; swap() replaces it while requests are in flight
+        self.slot = model_swap.ModelSlot(name, model_id, self._build, self._run)
+
+    def _build(self, model_id: str) -> model_swap.LoadedModel:
+        import torch
+
+        if torch.cuda.is_available():
+            device = "cuda"
+        elif hasattr(torch.backends, "mps") and torch.backends.mps.is_available():
+            device = "mps"
+        else:
+            device = "cpu"
+
+        logger.info(f"Loading {self.name} '{model_id}' on {device}")
+        processor, model = model_store.load_image_classifier(model_id, device)
+        label_map = LabelMap(
+            raw_labels_for(model, self.fallback_label), self.normalize_label, self.risk_map, grades=self.grades,
+        ).to(device)
+
+        logger.info(f"{self.title} labels: {model.config.id2label or {}}")
+        logger.info(f"{self.title} loaded ({sum(p.numel() for p in model.parameters())/1e6:.1f}M params)")
+        return model_swap.LoadedModel(model_id, model, processor, label_map, pipeline.Stage(self.name, device), device)
+
+    def load(self):
+        """Load the configured model if no version is active yet."""
+        self.slot.load()
+
+    def classify(self, image: Image.Image) -> dict:
+        """Classify one image. Returns classification, confidence, risk and recommendation."""
+        return self.classify_batch([image])[0]
+
+    def classify_batch(self, images: list) -> list[dict]:
+        """Classify a batch of images in one forward pass."""
+        if MOCK_MODE:
+            return [self.mock() for _ in images]
+
+        with self.slot.use() as m:
+            return self._run(m, images)
+
+    def _run(self, m: model_swap.LoadedModel, images: list) -> list[dict]:
+        import torch
+
+        try:
+            # AutoImageProcessor applies each model's own resize/crop/normalization
+            with span("classifier_preprocess"):
+                inputs = m.processor(images=images, return_tensors="pt")
+
+            with m.stage.slot():
+                with span("classifier_forward"), torch.no_grad():
+                    inputs = m.stage.to_device(inputs)
+                    probs = torch.softmax(m.model(**inputs).logits, dim=-1)
+
+                with span("classifier_tta"), torch.no_grad():
+                    probs, base_conf = tta.refine(m, inputs, probs, self.tta_views)
+
+                with span("label_normalization"):
+                    results = m.label_map.summarize(probs, top_k=self.top_k)
+
+            tta.annotate(results, base_conf, self.tta_views)
+            for r in results:
+                r["recommendation"] = self.recommendation(r["classification"])
+                r["model_version"] = m.version
+            return results
+
+        except Exception as e:
+            logger.error(f"Classification by the {self.name} failed: {e}", exc_info=True)
+            return [{
+                "classification": "error",
+                "confidence": 0,
+                "risk_level": "moderate",
+                "all_scores": {},
+                "recommendation": f"Classification failed: {e}. Please re-upload or {self.referral}.",
+                "error": str(e),
+                "model_version": m.version,
+            } for _ in images]
+
+    def warm_up(self, batch_sizes: list, iterations: int) -> dict:
+        """Run synthetic batches through the loaded model before the first real request."""
+        self.load()
+        return warmup.run(self.name, self.classify_batch, batch_sizes, iterations)
+
+    def model_version(self) -> str | None:
+        """Version new results are produced by ("mock" in mock mode), None before the first load."""
+        if MOCK_MODE:
+            return "mock"
+        return self.slot.current.version if self.slot.current else None
+
+    def input_size(self) -> int | None:
+        """Short side the active model's processor resizes to, None in mock mode or before loading."""
+        if MOCK_MODE or self.slot.current is None:
+            return None
+        return self.slot.current.input_side
+
+    def swap(self, model_id: str) -> dict:
+        """Load ``model_id`` in the background and switch new requests to it once warmed up."""
+        return self.slot.swap(model_id)
+
+    def get_status(self) -> dict:
+        if MOCK_MODE:
+            return {"name": self.title, "status": "ready (mock)", "model": self.configured_model}
+        m = self.slot.current
+        return {
+            "name": self.title,
+            "status": "loaded" if m else "not_loaded",
+            "model": self.slot.model_id,
+            "version": m.version if m else None,
+            "device": m.device if m else None,
+            "pipeline": m.stage.status() if m else None,
+            "active": m.status() if m else None,
+            "swap": self.slot.swap_status(),
+        }
@@ -0,0 +1,193 @@
+"""Near-duplicate image detection for MediVan AI session findings.
+
+``_read_image`` stores the SHA-256 of every upload in
+``image.info["sha256"]``. It also stores a 64-bit difference hash (dHash)
+in ``image.info["dhash"]``. Recompression, resizing and small exposure
+changes flip only a few of the dHash bits.
+
+Hashes of session findings go into a multi-index hash table. The hash is
+split into DEDUP_MAX_DISTANCE + 1 chunks, and any hash within that many
+bits of a query matches it exactly in at least one chunk. A lookup
+therefore probes one bucket per chunk instead of scanning every upload.
+
+A dHash alone is not enough evidence. Low-texture medical images
+(fundus photos, X-rays, skin close-ups) land within a few bits of each
+other even across modalities. A match therefore needs one of:
+
+- the same SHA-256, or
+- a dHash within DEDUP_MAX_DISTANCE plus a CLIP image embedding with
+  cosine similarity of at least DEDUP_MIN_SIMILARITY.
+
+The stored finding must also have the routed modality. The caller
+decides what a match is worth. Within the same session it may reuse the
+finding. Across sessions it is only a "possible duplicate" hint next to
+a fresh classification.
+
+Like sessions, the index lives in memory only.
+"""
+import logging
+import threading
+from PIL import Image
+from backend.config import DEDUP, DEDUP_MAX_DISTANCE, DEDUP_MIN_SIMILARITY
+from backend.services import session_manager, metrics
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit dHash: sign of horizontal gradients on a 9x8 grayscale thumbnail."""
+    small = image.resize((9, 8), Image.BILINEAR, reducing_gap=2.0).convert("L")
+    px = small.tobytes()
+    h = 0
+    for row in range(8):
+        for col in range(8):
+            h = (h << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return h
+
+
+def distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class HashIndex:
+    """Multi-index hash table over 64-bit hashes for Hamming-radius lookups up to ``radius``."""
+
+    def __init__(self, radius: int):
+        self.radius = radius
+        chunks = radius + 1
+        # Chunk boundaries as (shift, mask), sizes as even as 64 bits allow
+        bounds = [64 * i // chunks for i in range(chunks + 1)]
+        self._chunks = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        self._tables = [{} for _ in self._chunks]  # chunk value -> [hash, ...]
+        self._values = {}  # hash -> [value, ...]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, h: int, value):
+        with self._lock:
+            values = self._values.get(h)
+            if values is not None:
+                values.append(value)
+                return
+            self._values[h] = [value]
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                table.setdefault((h >> shift) & mask, []).append(h)
+
+    def search(self, h: int, radius: int | None = None) -> list[tuple[int, object]]:
+        """``(distance, value)`` for every value within ``radius`` bits, nearest first."""
+        radius = self.radius if radius is None else min(radius, self.radius)
+        hits = []
+        with self._lock:
+            seen = set()
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                for candidate in table.get((h >> shift) & mask, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    d = distance(h, candidate)
+                    if d <= radius:
+                        hits.extend((d, v) for v in self._values[candidate])
+        hits.sort(key=lambda x: x[0])
+        return hits
+
+
+_index = HashIndex(DEDUP_MAX_DISTANCE)
+_exact = {}  # sha256 -> [(sid, finding index), ...]
+_embeddings = {}  # (sid, finding index) -> normalized CLIP embedding
+_lock = threading.Lock()
+
+
+def _normalized(embedding):
+    import numpy as np
+
+    if embedding is None:
+        return None
+    v = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else None
+
+
+def add(image_hash: int | None, sha256: str | None, embedding, sid: str, finding: dict):
+    """Index a session finding under its image hashes and embedding."""
+    if not DEDUP:
+        return
+    key = (sid, finding["index"])
+    with _lock:
+        if sha256 is not None:
+            _exact.setdefault(sha256, []).append(key)
+        v = _normalized(embedding)
+        if v is not None:
+            _embeddings[key] = v
+    if image_hash is not None:
+        _index.add(image_hash, key)
+
+
+def _finding(sid: str, index: int, image_type: str) -> dict | None:
+    session = session_manager.get_session(sid)
+    if session is None or index >= len(session["findings"]):
+        return None
+    finding = session["findings"][index]
+    return finding if finding["image_type"] == image_type else None
+
+
+def _matches(image_hash: int | None, sha256: str | None, embedding, image_type: str):
+    """Confirmed prior findings of ``image_type``: exact SHA-256 matches first, then by dHash distance."""
+    with _lock:
+        exact = list(_exact.get(sha256, ())) if sha256 is not None else []
+    for sid, index in exact:
+        finding = _finding(sid, index, image_type)
+        if finding is not None:
+            yield {"finding": finding, "sid": sid, "index": index, "exact": True, "distance": 0, "similarity": 1.0}
+
+    v = _normalized(embedding)
+    if image_hash is None or v is None:
+        return
+    for d, (sid, index) in _index.search(image_hash):
+        if (sid, index) in exact:
+            continue
+        with _lock:
+            stored = _embeddings.get((sid, index))
+        if stored is None or stored.shape != v.shape:
+            continue
+        similarity = float(stored @ v)
+        if similarity < DEDUP_MIN_SIMILARITY:
+            metrics.incr("dedup.rejected.embedding")
+            continue
+        finding = _finding(sid, index, image_type)
+        if finding is not None:
+            yield {"finding": finding, "sid": sid, "index": index, "exact": False, "distance": d, "similarity": round(similarity, 4)}
+
+
+def lookup(image_hash: int | None, sha256: str | None, embedding, image_type: str, sid: str | None = None) -> dict | None:
+    """The closest confirmed prior finding of ``image_type``, or None.
+
+    Returns ``{"finding", "sid", "index", "exact", "distance", "similarity"}``.
+    A match needs the same SHA-256, or a dHash within DEDUP_MAX_DISTANCE
+    whose stored embedding is at least DEDUP_MIN_SIMILARITY similar.
+    Matches from session ``sid`` win over closer ones from other sessions.
+    """
+    if not DEDUP:
+        return None
+    metrics.incr("dedup.lookups")
+    best = None
+    for match in _matches(image_hash, sha256, embedding, image_type):
+        if best is None:
+            best = match
+        if match["sid"] == sid:
+            best = match
+            break
+    if best is not None:
+        metrics.incr("dedup.hits.exact" if best["exact"] else "dedup.hits.near")
+    return best
+
+
+def get_status() -> dict:
+    return {
+        "enabled": DEDUP,
+        "max_distance": DEDUP_MAX_DISTANCE,
+        "min_similarity": DEDUP_MIN_SIMILARITY,
+        "hashes": len(_index),
+        "images": len(_exact),
+    }
@@ -0,0 +1,44 @@
+"""Cached compute-device snapshot for MediVan AI health checks."""
+import sys
+import logging
+import platform
+import threading
+from backend.config import MOCK_MODE
+
+logger = logging.getLogger(__name__)
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def snapshot() -> dict:
+    """Platform and accelerator info, detected once per process.
+
+    In mock mode torch is only consulted if something else already imported
+    it, so health checks never pull in torch just to report "N/A".
+    """
+    global _snapshot
+    if _snapshot is not None:
+        return _snapshot
+    with _lock:
+        if _snapshot is None:
+            _snapshot = _detect()
+        return _snapshot
+
+
+def _detect() -> dict:
+    info = {"platform": platform.machine(), "gpu": "N/A", "device": "cpu", "torch": None}
+    if MOCK_MODE and "torch" not in sys.modules:
+        return info
+    try:
+        import torch
+
+        info["torch"] = torch.__version__
+        if torch.cuda.is_available():
+            info["gpu"] = torch.cuda.get_device_name(0)
+            info["device"] = "cuda"
+        elif hasattr(torch.backends, "mps") and torch.backends.mps.is_available():
+            info["device"] = "mps"
+    except Exception as e:
+        logger.warning(f"Device detection failed: {e}")
+    return info
@@ -0,0 +1,95 @@
+"""Precompiled model-label → canonical-class mapping for the MediVan AI classifiers.
+
+A classifier's ``id2label`` is fixed once the model is loaded, so label
+normalization is done once here and compiled into an aggregation matrix.
+Per request, canonical scores, top-k, risk level and DR severity are plain
+tensor ops over the whole batch.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVELS = ["low", "moderate", "high"]
+
+
+class LabelMap:
+    """Aggregation matrix from model logits to canonical classes.
+
+    ``raw_labels`` are the model's labels in logit order; ``normalize`` maps
+    each to a canonical class name. Canonical columns keep the order in
+    which classes first appear, so argmax ties resolve like the old
+    per-label dict aggregation did.
+    """
+
+    def __init__(self, raw_labels: list, normalize, risk_map: dict, default_risk: str = "moderate", grades: list | None = None):
+        import torch
+
+        self.raw_labels = list(raw_labels)
+        self.canonical = []
+        index = []
+        for raw in self.raw_labels:
+            norm = normalize(raw)
+            if norm not in self.canonical:
+                self.canonical.append(norm)
+            index.append(self.canonical.index(norm))
+
+        n_raw, n_canon = len(self.raw_labels), len(self.canonical)
+        self.matrix = torch.zeros(n_raw, n_canon)
+        self.matrix[torch.arange(n_raw), torch.tensor(index)] = 1.0
+        self.risk_codes = torch.tensor([RISK_LEVELS.index(risk_map.get(c, default_risk)) for c in self.canonical])
+
+        # Ordinal grade per canonical column (-1 if not a grade), e.g. DR 0-4
+        self.grades = None
+        if grades is not None:
+            self.grades = torch.tensor([grades.index(c) if c in grades else -1 for c in self.canonical])
+        logger.info(f"Compiled label map: {n_raw} model labels -> {n_canon} classes {self.canonical}")
+
+    def to(self, device) -> "LabelMap":
+        self.matrix = self.matrix.to(device)
+        self.risk_codes = self.risk_codes.to(device)
+        if self.grades is not None:
+            self.grades = self.grades.to(device)
+        return self
+
+    def summarize(self, probs, top_k: int | None = 7, top_k_raw: int = 5) -> list[dict]:
+        """Turn a (batch, n_labels) probability tensor into one result dict per image."""
+        import torch
+
+        probs = probs.float()
+        canon = probs @ self.matrix  # (batch, n_canonical)
+        conf, best = canon.max(dim=1)
+        risk = self.risk_codes[best]
+
+        k = canon.shape[1] if top_k is None else min(top_k, canon.shape[1])
+        canon_vals, canon_idx = canon.topk(k, dim=1)
+        raw_vals, raw_idx = probs.topk(min(top_k_raw, probs.shape[1]), dim=1)
+
+        tensors = [conf, best, risk, canon_vals, canon_idx, raw_vals, raw_idx]
+        if self.grades is not None:
+            severity = canon @ self.grades.clamp(min=0).to(canon.dtype)
+            tensors += [self.grades[best], severity]
+
+        # One device→host transfer per tensor for the whole batch
+        host = [t.cpu().tolist() for t in tensors]
+        conf, best, risk, canon_vals, canon_idx, raw_vals, raw_idx = host[:7]
+
+        results = []
+        for i in range(len(best)):
+            r = {
+                "classification": self.canonical[best[i]],
+                "confidence": round(conf[i], 4),
+                "risk_level": RISK_LEVELS[risk[i]],
+                "all_scores": {self.canonical[j]: round(v, 4) for j, v in zip(canon_idx[i], canon_vals[i])},
+                "raw_model_output": {self.raw_labels[j]: round(v, 4) for j, v in zip(raw_idx[i], raw_vals[i])},
+            }
+            if self.grades is not None:
+                r["dr_grade"] = host[7][i]
+                r["severity_score"] = round(host[8][i], 2)
+            results.append(r)
+        return results
+
+
+def raw_labels_for(model, default_label) -> list:
+    """The model's labels in logit order, falling back to ``default_label(i)``."""
+    id2label = model.config.id2label or {}
+    return [id2label.get(i, default_label(i)) for i in range(model.config.num_labels)]
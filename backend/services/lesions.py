@@ -0,0 +1,114 @@
+"""Candidate lesion proposals for wide-field skin photos.
+
+The skin classifier expects one centered lesion per image. For a photo
+of a back or an arm with several moles, ``propose()`` finds regions that
+are markedly darker than the skin around them. It uses a coarse grid
+with the longest side DETECT_SIDE:
+
+1. Luminance, and a heavily blurred copy of it as the local skin tone,
+   so uneven lighting across the photo doesn't register as lesions.
+2. Relative darkness ``(background - luminance) / background``,
+   thresholded at the larger of MIN_CONTRAST and mean + K_STD * std.
+3. Connected components of the mask (4-connected), filtered by area.
+   They are ranked by contrast x sqrt(area).
+
+Each surviving component becomes a square box around it, padded so the
+lesion fills about half the crop like a single-lesion capture. Boxes are
+in pixels of the uploaded image. The caller crops them from the full
+resolution image and classifies all crops in one batch.
+
+This is a cheap heuristic (~10 ms), not a trained detector. It favours
+recall: false positives are classified like any crop and usually come
+back benign with low confidence.
+"""
+import logging
+from collections import deque
+from PIL import Image, ImageFilter
+
+logger = logging.getLogger(__name__)
+
+DETECT_SIDE = 192
+# Blur radius of the local-background estimate, as a fraction of DETECT_SIDE
+BACKGROUND_RADIUS = 1 / 10
+MIN_CONTRAST = 0.12
+K_STD = 2.5
+# Component area bounds as fractions of the grid
+MIN_AREA = 0.0004
+MAX_AREA = 0.15
+# Crop side = PADDING x the component's longer side
+PADDING = 2.0
+# Smallest crop, in pixels of the uploaded image
+MIN_CROP = 96
+# Boxes overlapping a better-ranked one by more than this IoU are dropped
+NMS_IOU = 0.4
+
+
+def _components(mask) -> list[dict]:
+    """Connected components of a boolean grid as ``{"area", "box" (x0, y0, x1, y1), "pixels"}``."""
+    import numpy as np
+
+    h, w = mask.shape
+    seen = np.zeros_like(mask)
+    comps = []
+    for y0, x0 in zip(*np.nonzero(mask)):
+        if seen[y0, x0]:
+            continue
+        seen[y0, x0] = True
+        queue = deque([(y0, x0)])
+        pixels = []
+        while queue:
+            y, x = queue.popleft()
+            pixels.append((y, x))
+            for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                if 0 <= ny < h and 0 <= nx < w and mask[ny, nx] and not seen[ny, nx]:
+                    seen[ny, nx] = True
+                    queue.append((ny, nx))
+        ys, xs = zip(*pixels)
+        comps.append({"area": len(pixels), "box": (min(xs), min(ys), max(xs) + 1, max(ys) + 1), "pixels": pixels})
+    return comps
+
+
+def _iou(a: tuple, b: tuple) -> float:
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def propose(image: Image.Image, max_regions: int) -> list[dict]:
+    """Up to ``max_regions`` candidate lesions, best first, as ``{"box", "score"}`` in image pixels."""
+    import numpy as np
+
+    width, height = image.size
+    scale = DETECT_SIDE / max(width, height)
+    grid = image.convert("L").resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR, reducing_gap=2.0)
+    lum = np.asarray(grid, dtype=np.float32)
+    background = np.asarray(grid.filter(ImageFilter.BoxBlur(max(2, round(DETECT_SIDE * BACKGROUND_RADIUS)))), dtype=np.float32)
+    contrast = (background - lum) / (background + 1.0)
+    threshold = max(MIN_CONTRAST, float(contrast.mean() + K_STD * contrast.std()))
+    mask = contrast > threshold
+
+    cells = mask.size
+    candidates = []
+    for comp in _components(mask):
+        if not MIN_AREA * cells <= comp["area"] <= MAX_AREA * cells:
+            continue
+        ys, xs = zip(*comp["pixels"])
+        score = float(contrast[ys, xs].mean()) * comp["area"] ** 0.5
+        x0, y0, x1, y1 = comp["box"]
+        # Square crop centered on the component, in full-resolution pixels
+        cx, cy = (x0 + x1) / 2 / scale, (y0 + y1) / 2 / scale
+        side = min(max(PADDING * max(x1 - x0, y1 - y0) / scale, MIN_CROP), width, height)
+        left = min(max(0, round(cx - side / 2)), width - round(side))
+        top = min(max(0, round(cy - side / 2)), height - round(side))
+        candidates.append({"box": [left, top, left + round(side), top + round(side)], "score": round(score, 4)})
+
+    candidates.sort(key=lambda c: -c["score"])
+    regions = []
+    for c in candidates:
+        if all(_iou(c["box"], r["box"]) <= NMS_IOU for r in regions):
+            regions.append(c)
+            if len(regions) >= max_regions:
+                break
+    return regions
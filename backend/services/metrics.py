@@ -0,0 +1,93 @@
+"""In-process latency windows and percentiles for MediVan AI."""
+import threading
+from collections import deque
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Linear-interpolated percentile (0-100) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+class LatencyWindow:
+    """Rolling window of the most recent latencies (seconds)."""
+
+    def __init__(self, size: int = 200):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.total = 0
+        # Kept separately: the first call after startup is the cold-start outlier
+        self.first = None
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._values.append(seconds)
+            self.total += 1
+            if self.first is None:
+                self.first = seconds
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            values = sorted(self._values)
+        return percentile(values, q)
+
+    def summary(self) -> dict:
+        with self._lock:
+            values = sorted(self._values)
+        ms = lambda v: round(v * 1000, 2)
+        return {
+            "count": self.total,
+            "window": len(values),
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1]) if values else 0.0,
+            "first_ms": ms(self.first) if self.first is not None else None,
+        }
+
+
+# ── Process-wide registry ─────────────────────────────────
+
+_registry_lock = threading.Lock()
+_counters: dict[str, int] = {}
+_windows: dict[str, LatencyWindow] = {}
+
+
+def incr(name: str, n: int = 1):
+    with _registry_lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def window(name: str) -> LatencyWindow:
+    """The named latency window, created on first use."""
+    with _registry_lock:
+        w = _windows.get(name)
+        if w is None:
+            w = _windows[name] = LatencyWindow()
+        return w
+
+
+def observe(name: str, seconds: float):
+    window(name).observe(seconds)
+
+
+def counters() -> dict:
+    with _registry_lock:
+        return dict(_counters)
+
+
+def snapshot() -> dict:
+    with _registry_lock:
+        windows = dict(_windows)
+        counts = dict(_counters)
+    return {
+        "counters": dict(sorted(counts.items())),
+        "latency": {k: w.summary() for k, w in sorted(windows.items())},
+    }
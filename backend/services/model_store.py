@@ -0,0 +1,241 @@
+"""Local safetensors model store for MediVan AI.
+
+``prefetch`` materializes every configured model (CLIP router, the three
+classifiers and the RAG embedding model) under MODEL_STORE_DIR as
+safetensors plus the config/processor files needed to rebuild it, and
+records a SHA-256 checksum and size for every file in ``manifest.json``.
+At startup the loaders use a store entry when one exists: weights are
+memory-mapped from local files with no hub lookups, and go straight onto
+the target device when ``accelerate`` is installed. Models missing from
+the store still load from the HF/open_clip caches as before.
+
+Usage:
+    python -m backend.services.model_store prefetch            # all configured models
+    python -m backend.services.model_store prefetch --only skin eye --force
+    python -m backend.services.model_store verify
+    python -m backend.services.model_store list
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import importlib.util
+from datetime import datetime, timezone
+from backend.config import MODEL_STORE_DIR, CLIP_MODEL, SKIN_MODEL, CHEST_MODEL, EYE_MODEL, EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+OPEN_CLIP_WEIGHTS = "open_clip_model.safetensors"
+
+# Store name -> (model ID, kind)
+MODELS = {
+    "clip": (CLIP_MODEL, "clip"),
+    "skin": (SKIN_MODEL, "image_classifier"),
+    "chest": (CHEST_MODEL, "image_classifier"),
+    "eye": (EYE_MODEL, "image_classifier"),
+    "embedding": (EMBEDDING_MODEL, "sentence_transformer"),
+}
+
+
+def path_for(model_id: str) -> str:
+    return os.path.join(MODEL_STORE_DIR, model_id.replace("/", "--"))
+
+
+def manifest(model_id: str) -> dict | None:
+    try:
+        with open(os.path.join(path_for(model_id), MANIFEST), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def resolve(model_id: str, fmt: str | None = None) -> str | None:
+    """Store directory for ``model_id`` if it is complete (and in ``fmt``), else None.
+
+    Only file sizes are checked here, so startup stays fast; ``verify``
+    recomputes the checksums.
+    """
+    m = manifest(model_id)
+    if m is None or (fmt is not None and m.get("format") != fmt):
+        return None
+    root = path_for(model_id)
+    for name, meta in m["files"].items():
+        path = os.path.join(root, name)
+        if not os.path.isfile(path) or os.path.getsize(path) != meta["size"]:
+            logger.warning(f"Model store entry for '{model_id}' is incomplete ({name}); loading from hub cache")
+            return None
+    return root
+
+
+def load_image_classifier(model_id: str, device: str):
+    """(processor, model) for a HF image classifier, preferring the local store."""
+    from transformers import AutoModelForImageClassification, AutoImageProcessor
+
+    path = resolve(model_id, "transformers")
+    if path is None:
+        logger.info(f"'{model_id}' not in model store, loading via HF cache (run model_store prefetch for offline use)")
+        processor = AutoImageProcessor.from_pretrained(model_id)
+        model = AutoModelForImageClassification.from_pretrained(model_id)
+        return processor, model.to(device).eval()
+
+    processor = AutoImageProcessor.from_pretrained(path, local_files_only=True)
+    if importlib.util.find_spec("accelerate"):
+        # Materialize tensors directly on the target device from the mmapped file
+        model = AutoModelForImageClassification.from_pretrained(path, local_files_only=True, device_map=device)
+    else:
+        model = AutoModelForImageClassification.from_pretrained(path, local_files_only=True).to(device)
+    logger.info(f"Loaded '{model_id}' from model store {path}")
+    return processor, model.eval()
+
+
+# ── Prefetch / verify ─────────────────────────────────────
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _save_image_classifier(model_id: str, out: str) -> dict:
+    from transformers import AutoModelForImageClassification, AutoImageProcessor
+
+    AutoImageProcessor.from_pretrained(model_id).save_pretrained(out)
+    AutoModelForImageClassification.from_pretrained(model_id).save_pretrained(out, safe_serialization=True)
+    return {"format": "transformers"}
+
+
+def _save_clip(model_id: str, out: str) -> dict:
+    from backend.services import router
+
+    if importlib.util.find_spec("open_clip"):
+        import open_clip
+        from safetensors.torch import save_model
+
+        arch = router.open_clip_arch(model_id)
+        model, _, _ = open_clip.create_model_and_transforms(arch, pretrained=router.OPEN_CLIP_PRETRAINED)
+        save_model(model, os.path.join(out, OPEN_CLIP_WEIGHTS))
+        return {"format": "open_clip", "arch": arch, "pretrained": router.OPEN_CLIP_PRETRAINED}
+
+    from transformers import CLIPModel, CLIPProcessor
+
+    CLIPProcessor.from_pretrained(model_id).save_pretrained(out)
+    CLIPModel.from_pretrained(model_id).save_pretrained(out, safe_serialization=True)
+    return {"format": "transformers"}
+
+
+def _save_sentence_transformer(model_id: str, out: str) -> dict:
+    from sentence_transformers import SentenceTransformer
+
+    SentenceTransformer(model_id).save(out, safe_serialization=True)
+    return {"format": "sentence_transformers"}
+
+
+_SAVERS = {
+    "image_classifier": _save_image_classifier,
+    "clip": _save_clip,
+    "sentence_transformer": _save_sentence_transformer,
+}
+
+
+def prefetch(name: str, force: bool = False) -> dict:
+    """Download one configured model and write it to the store with checksums."""
+    model_id, kind = MODELS[name]
+    root = path_for(model_id)
+    if not force and manifest(model_id) is not None:
+        return {"name": name, "model_id": model_id, "status": "present", "path": root}
+
+    tmp = root + ".partial"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        info = _SAVERS[kind](model_id, tmp)
+        files = {}
+        for dirpath, _, filenames in os.walk(tmp):
+            for fn in filenames:
+                path = os.path.join(dirpath, fn)
+                rel = os.path.relpath(path, tmp)
+                files[rel] = {"sha256": _sha256(path), "size": os.path.getsize(path)}
+        m = {
+            "model_id": model_id,
+            "kind": kind,
+            **info,
+            "files": dict(sorted(files.items())),
+            "created": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as fh:
+            json.dump(m, fh, indent=2)
+        # Swap in the finished entry so a crashed prefetch never leaves a half-written model
+        shutil.rmtree(root, ignore_errors=True)
+        os.replace(tmp, root)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    size_mb = sum(f["size"] for f in files.values()) / 1e6
+    logger.info(f"Stored '{model_id}' ({m['format']}, {size_mb:.1f} MB) in {root}")
+    return {"name": name, "model_id": model_id, "status": "stored", "path": root, "size_mb": round(size_mb, 1)}
+
+
+def verify(name: str) -> dict:
+    """Recompute checksums for one store entry."""
+    model_id, _ = MODELS[name]
+    m = manifest(model_id)
+    if m is None:
+        return {"name": name, "model_id": model_id, "status": "missing"}
+    root = path_for(model_id)
+    bad = []
+    for rel, meta in m["files"].items():
+        path = os.path.join(root, rel)
+        if not os.path.isfile(path) or _sha256(path) != meta["sha256"]:
+            bad.append(rel)
+    return {"name": name, "model_id": model_id, "status": "corrupt" if bad else "ok", "bad_files": bad}
+
+
+def get_status() -> dict:
+    entries = {}
+    for name, (model_id, _) in MODELS.items():
+        m = manifest(model_id)
+        entries[name] = {
+            "model_id": model_id,
+            "stored": m is not None,
+            "format": m.get("format") if m else None,
+            "size_mb": round(sum(f["size"] for f in m["files"].values()) / 1e6, 1) if m else None,
+        }
+    return {"dir": MODEL_STORE_DIR, "models": entries}
+
+
+def main(argv: list | None = None):
+    p = argparse.ArgumentParser(description="Manage the MediVan AI local model store")
+    sub = p.add_subparsers(dest="command", required=True)
+    pf = sub.add_parser("prefetch", help="Download configured models into the store")
+    pf.add_argument("--only", nargs="+", choices=list(MODELS), help="Subset of models")
+    pf.add_argument("--force", action="store_true", help="Re-download models already stored")
+    vf = sub.add_parser("verify", help="Recompute checksums of stored models")
+    vf.add_argument("--only", nargs="+", choices=list(MODELS), help="Subset of models")
+    sub.add_parser("list", help="Show what is stored")
+    args = p.parse_args(argv)
+
+    if args.command == "list":
+        print(json.dumps(get_status(), indent=2))
+        return
+
+    ok = True
+    for name in args.only or list(MODELS):
+        try:
+            result = prefetch(name, args.force) if args.command == "prefetch" else verify(name)
+        except Exception as e:
+            result = {"name": name, "model_id": MODELS[name][0], "status": "error", "error": str(e)}
+        ok = ok and result["status"] in ("present", "stored", "ok")
+        print(json.dumps(result))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
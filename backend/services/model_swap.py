@@ -0,0 +1,193 @@
+"""Zero-downtime model hot-swap for the MediVan AI classifiers.
+
+Each classifier keeps everything a forward pass needs (weights, processor,
+label map, pipeline stage) in one ``LoadedModel`` held by a ``ModelSlot``.
+Requests take a reference to the current version for their whole call
+via ``slot.use()``. A swap loads and warms the new version in a background
+thread, replaces ``slot.current`` in one assignment, then waits for
+in-flight requests on the old version before freeing its weights.
+"""
+import gc
+import sys
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from backend.config import WARMUP, WARMUP_BATCH_SIZES, WARMUP_ITERATIONS
+from backend.services import model_store, warmup
+
+logger = logging.getLogger(__name__)
+
+
+def version_of(model_id: str, model) -> str:
+    """``model_id@<id>`` identifying the exact weights: store checksum, else hub commit."""
+    m = model_store.manifest(model_id)
+    if m:
+        weights = sorted(f for f in m["files"] if f.endswith(".safetensors"))
+        if weights:
+            return f"{model_id}@{m['files'][weights[0]]['sha256'][:12]}"
+    commit = getattr(getattr(model, "config", None), "_commit_hash", None)
+    return f"{model_id}@{commit[:12]}" if commit else model_id
+
+
+def input_side(processor) -> int | None:
+    """Short side of the image ``processor`` feeds its model, None if it can't be read.
+
+    Covers transformers image processors (crop_size, else size) and
+    torchvision transform pipelines like open_clip's preprocess.
+    """
+    ip = getattr(processor, "image_processor", processor)
+    for attr in ("crop_size", "size"):
+        size = getattr(ip, attr, None)
+        if isinstance(size, int):
+            return size
+        if size is not None:
+            # A plain dict in older transformers, a SizeDict in newer ones
+            get = size.get if isinstance(size, dict) else lambda key: getattr(size, key, None)
+            sides = [v for v in map(get, ("height", "width", "shortest_edge")) if isinstance(v, int)]
+            if sides:
+                return max(sides)
+    for t in getattr(processor, "transforms", ()):
+        size = getattr(t, "size", None)
+        if isinstance(size, int):
+            return size
+        if isinstance(size, (tuple, list)) and size:
+            return max(size)
+    return None
+
+
+class LoadedModel:
+    """One loaded version of a classifier, reference-counted by in-flight requests."""
+
+    def __init__(self, model_id: str, model, processor, label_map, stage, device: str):
+        self.model_id = model_id
+        self.model = model
+        self.processor = processor
+        self.label_map = label_map
+        self.stage = stage
+        self.device = device
+        self.version = version_of(model_id, model)
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+        self._cond = threading.Condition()
+        self._inflight = 0
+
+    def acquire(self):
+        with self._cond:
+            self._inflight += 1
+
+    def release(self):
+        with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+    def retire(self):
+        """Wait for in-flight requests to finish, then drop the weights."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._inflight == 0)
+        self.model = self.processor = self.label_map = self.stage = None
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and str(self.device).startswith("cuda"):
+            torch.cuda.empty_cache()
+        logger.info(f"Freed {self.version}")
+
+    @property
+    def input_side(self) -> int | None:
+        return input_side(self.processor)
+
+    def status(self) -> dict:
+        with self._cond:
+            inflight = self._inflight
+        return {
+            "version": self.version,
+            "model_id": self.model_id,
+            "device": self.device,
+            "loaded_at": self.loaded_at,
+            "in_flight": inflight,
+        }
+
+
+class ModelSlot:
+    """The active version of one classifier plus its background swap state.
+
+    ``build(model_id)`` returns a LoadedModel; ``run(loaded, images)``
+    returns one result dict per image (used to warm a new version).
+    """
+
+    def __init__(self, name: str, model_id: str, build, run):
+        self.name = name
+        self.model_id = model_id
+        self.current: LoadedModel | None = None
+        self._build = build
+        self._run = run
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._swap = {"state": "idle"}
+
+    def load(self) -> LoadedModel:
+        """The current version, loading the configured model on first use."""
+        if self.current is None:
+            with self._load_lock:
+                if self.current is None:
+                    self.current = self._build(self.model_id)
+        return self.current
+
+    @contextmanager
+    def use(self):
+        """Pin the current version for the enclosed call; a concurrent swap won't free it."""
+        self.load()
+        with self._lock:
+            loaded = self.current
+            loaded.acquire()
+        try:
+            yield loaded
+        finally:
+            loaded.release()
+
+    def swap(self, model_id: str) -> dict:
+        """Start loading ``model_id`` in the background; returns the swap status."""
+        with self._lock:
+            if self._swap["state"] in ("loading", "warming", "draining"):
+                raise RuntimeError(f"A swap of {self.name} is already in progress")
+            self._swap = {
+                "state": "loading",
+                "target": model_id,
+                "previous": self.current.version if self.current else None,
+                "started": datetime.now(timezone.utc).isoformat(),
+            }
+        threading.Thread(target=self._do_swap, args=(model_id,), daemon=True).start()
+        return self.swap_status()
+
+    def _set(self, **state):
+        with self._lock:
+            self._swap.update(state)
+
+    def _do_swap(self, model_id: str):
+        try:
+            new = self._build(model_id)
+            self._set(state="warming", version=new.version)
+
+            def check(images):
+                failed = [r["error"] for r in self._run(new, images) if "error" in r]
+                if failed:
+                    raise RuntimeError(failed[0])
+
+            # Even with WARMUP off, one pass proves the new version works before it takes traffic
+            warmup.run(f"{self.name} ({new.version})", check,
+                       WARMUP_BATCH_SIZES if WARMUP else [1], WARMUP_ITERATIONS if WARMUP else 1)
+
+            with self._lock:
+                old, self.current = self.current, new
+                self.model_id = model_id
+            logger.info(f"Swapped {self.name} to {new.version}")
+            self._set(state="draining")
+            if old is not None and old is not new:
+                old.retire()
+            self._set(state="done", finished=datetime.now(timezone.utc).isoformat())
+        except Exception as e:
+            logger.error(f"Swap of {self.name} to '{model_id}' failed: {e}", exc_info=True)
+            self._set(state="failed", error=str(e), finished=datetime.now(timezone.utc).isoformat())
+
+    def swap_status(self) -> dict:
+        with self._lock:
+            return dict(self._swap)
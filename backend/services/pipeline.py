@@ -0,0 +1,139 @@
+"""Overlapped host-to-device staging for the MediVan AI vision models.
+
+Each model (router, classifiers) owns a ``Stage``. On CUDA a stage has its
+own compute stream and copy stream: preprocessed tensors are copied into
+reusable pinned host buffers and sent to the GPU with non-blocking copies
+on the copy stream, so one request's upload overlaps another's forward
+pass, and the router and classifier stages run on separate streams. At
+most ``depth`` batches are in a stage at once (double buffering by
+default), which also bounds the GPU activations. Pinned buffers are
+sized in power-of-two capacities and reused for any batch that fits, and
+at most MAX_PINNED_RINGS sets are kept per stage (least recently used
+freed first), so varying batch sizes don't pile up page-locked memory.
+Waiting batches are admitted by the request's priority class (see
+``scheduler``).
+
+On CPU/MPS a stage degrades to plain ``.to(device)`` and the default
+stream; only the ``depth`` limit applies.
+"""
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from backend.config import PIPELINE_DEPTH
+from backend.services import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Pinned buffer rings kept per stage; one per (input, dtype, capacity) in use
+MAX_PINNED_RINGS = 8
+
+
+class Stage:
+    """Staging buffers, streams and an in-flight limit for one model."""
+
+    def __init__(self, name: str, device: str, depth: int = PIPELINE_DEPTH):
+        self.name = name
+        self.device = device
+        self.depth = max(depth, 1)
+        self.cuda = str(device).startswith("cuda")
+        self._queue = scheduler.PriorityScheduler(f"stage.{name}", self.depth)
+        self._lock = threading.Lock()
+        self._buffers = OrderedDict()  # (key, dtype, capacity) -> ring of [flat pinned tensor, last copy event]
+        self._turn = {}
+        self._copy_stream = None
+        self._compute_stream = None
+        if self.cuda:
+            import torch
+
+            self._copy_stream = torch.cuda.Stream(device)
+            self._compute_stream = torch.cuda.Stream(device)
+        self.stats = {"batches": 0, "bytes_staged": 0}
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the stage's ``depth`` slots, admitted by priority class, on its compute stream."""
+        with self._queue.slot(scheduler.current()):
+            try:
+                if self.cuda:
+                    import torch
+
+                    with torch.cuda.stream(self._compute_stream):
+                        yield
+                else:
+                    yield
+            finally:
+                with self._lock:
+                    self.stats["batches"] += 1
+
+    def to_device(self, tensors: dict) -> dict:
+        """Move a dict of host tensors to the stage's device.
+
+        Call inside ``slot()``. On CUDA the copy is staged through a pinned
+        buffer on the copy stream and the compute stream waits on it, so
+        the caller can go straight on to the forward pass.
+        """
+        if not self.cuda:
+            return {k: v.to(self.device) for k, v in tensors.items()}
+
+        import torch
+
+        compute = torch.cuda.current_stream()
+        staged = {}
+        event = torch.cuda.Event()
+        with torch.cuda.stream(self._copy_stream):
+            for key, value in tensors.items():
+                entry = self._pinned(key, value)
+                if entry[1] is not None:
+                    entry[1].synchronize()  # previous upload from this buffer has finished
+                host = entry[0][:value.numel()].view(value.shape)
+                host.copy_(value)
+                staged[key] = host.to(self.device, non_blocking=True)
+                entry[1] = event
+            event.record(self._copy_stream)
+        compute.wait_event(event)
+        for t in staged.values():
+            # Allocated on the copy stream, used on the compute stream
+            t.record_stream(compute)
+        with self._lock:
+            self.stats["bytes_staged"] += sum(v.numel() * v.element_size() for v in tensors.values())
+        return staged
+
+    def _pinned(self, key: str, value) -> list:
+        """Next buffer of the ring whose power-of-two capacity fits ``value``."""
+        import torch
+
+        capacity = 1 << max(value.numel() - 1, 0).bit_length()
+        k = (key, value.dtype, capacity)
+        with self._lock:
+            ring = self._buffers.get(k)
+            if ring is None:
+                ring = self._buffers[k] = [
+                    [torch.empty(capacity, dtype=value.dtype, pin_memory=True), None] for _ in range(self.depth)
+                ]
+                self._turn[k] = 0
+                while len(self._buffers) > MAX_PINNED_RINGS:
+                    # Pending copies out of an evicted buffer keep its memory alive until they finish
+                    evicted, _ = self._buffers.popitem(last=False)
+                    del self._turn[evicted]
+            self._buffers.move_to_end(k)
+            entry = ring[self._turn[k]]
+            self._turn[k] = (self._turn[k] + 1) % self.depth
+        return entry
+
+    def backlog(self) -> int:
+        """Batches waiting for a slot: nonzero means the stage is saturated."""
+        return self._queue.backlog()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "device": self.device,
+                "overlapped": self.cuda,
+                "depth": self.depth,
+                "pinned_buffers": sum(len(r) for r in self._buffers.values()),
+                "pinned_bytes": sum(e[0].numel() * e[0].element_size() for r in self._buffers.values() for e in r),
+                **self.stats,
+                "queue": self._queue.status(),
+            }
+
@@ -0,0 +1,150 @@
+"""Live camera preview for MediVan AI.
+
+The capture screen streams low-resolution JPEG frames over the
+``/api/preview`` WebSocket. For each one the server answers with the
+predicted modality and a quality verdict, so the clinician can see
+whether the camera frames a usable lesion or fundus before capturing.
+
+Previews must never slow down real analyses:
+
+- Each connection keeps only its newest frame. Frames that arrive while
+  one is being processed replace each other (counted as dropped).
+- A connection is answered at most PREVIEW_MAX_FPS times per second.
+- Routing uses ``router.route_preview``: one CLIP pass against the cached
+  prompt embeddings, without the ensemble retry.
+- A frame is routed only if the CLIP stage has no backlog and one of the
+  PREVIEW_CONCURRENCY preview slots is free. It then runs as the
+  ``batch`` priority class. Otherwise the reply repeats the previous
+  route (``routed: false``) with a fresh quality check.
+"""
+import io
+import time
+import asyncio
+import logging
+import threading
+from PIL import Image
+from fastapi.concurrency import run_in_threadpool
+from backend.config import PREVIEW_MAX_FPS, PREVIEW_CONCURRENCY
+from backend.services import router, quality, scheduler, metrics
+
+logger = logging.getLogger(__name__)
+
+# Preview frames are small; anything bigger is a misbehaving client
+MAX_FRAME_BYTES = 512 * 1024
+# Frames are decoded (JPEG draft mode) to about this short side, the scale quality thresholds assume
+FRAME_SIDE = 256
+
+_slots = threading.BoundedSemaphore(max(1, PREVIEW_CONCURRENCY))
+_stats = {"connections": 0, "active": 0, "frames": 0, "routed": 0, "busy": 0, "dropped": 0, "errors": 0}
+
+
+def analyze_frame(data: bytes, previous: dict | None = None) -> dict:
+    """Quality check plus (capacity permitting) routing of one preview frame."""
+    start = time.perf_counter()
+    if len(data) > MAX_FRAME_BYTES:
+        raise ValueError(f"Preview frame too large ({len(data)} bytes, max {MAX_FRAME_BYTES})")
+    try:
+        raw = Image.open(io.BytesIO(data))
+    except Exception:
+        raise ValueError("Preview frame is not a readable image") from None
+    raw.draft("RGB", (FRAME_SIDE, FRAME_SIDE))
+    image = raw.convert("RGB")
+    image_quality = quality.assess(image)
+
+    route, routed = previous, False
+    if router.backlog() == 0 and _slots.acquire(blocking=False):
+        try:
+            with scheduler.priority("batch"):
+                route = router.route_preview(image)
+            routed = True
+        finally:
+            _slots.release()
+    else:
+        _stats["busy"] += 1
+        metrics.incr("preview.busy")
+
+    modality = route["type"] if route and route["type"] in quality.THRESHOLDS else "default"
+    check = quality.check(image_quality, modality)
+    # Preview frames are low resolution by design; the capture itself is full size
+    issues = [i for i in check["issues"] if i != "resolution"]
+    return {
+        "type": route["type"] if route else None,
+        "confidence": route["confidence"] if route else None,
+        "scores": route["scores"] if route else None,
+        "routed": routed,
+        "quality": {
+            "modality": modality,
+            "score": quality.frame_score(image_quality),
+            "issues": issues,
+            "hint": " ".join(quality.HINTS[i] for i in issues) if issues else None,
+        },
+        "usable": bool(route) and route["type"] != "unknown" and not issues,
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+async def serve(ws):
+    """Answer preview frames on an accepted WebSocket until the client disconnects."""
+    loop = asyncio.get_running_loop()
+    state = {"latest": None, "dropped": 0, "closed": False}
+    ready = asyncio.Event()
+
+    async def receive():
+        try:
+            while True:
+                message = await ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is None:
+                    continue
+                if state["latest"] is not None:
+                    state["dropped"] += 1
+                    _stats["dropped"] += 1
+                state["latest"] = message["bytes"]
+                ready.set()
+        finally:
+            state["closed"] = True
+            ready.set()
+
+    _stats["connections"] += 1
+    _stats["active"] += 1
+    receiver = asyncio.create_task(receive())
+    interval = 1.0 / PREVIEW_MAX_FPS if PREVIEW_MAX_FPS > 0 else 0.0
+    previous, next_at, frame = None, 0.0, 0
+    try:
+        while True:
+            await ready.wait()
+            ready.clear()
+            if state["closed"]:
+                break
+            delay = next_at - loop.time()
+            if delay > 0:
+                # Throttled: frames arriving meanwhile replace the pending one
+                await asyncio.sleep(delay)
+            data, state["latest"] = state["latest"], None
+            if data is None:
+                continue
+            next_at = loop.time() + interval
+            frame += 1
+            _stats["frames"] += 1
+            try:
+                result = await run_in_threadpool(analyze_frame, data, previous)
+            except Exception as e:
+                _stats["errors"] += 1
+                await ws.send_json({"frame": frame, "error": str(e)})
+                continue
+            if result["routed"]:
+                _stats["routed"] += 1
+                previous = {k: result[k] for k in ("type", "confidence", "scores")}
+            metrics.observe("preview", result["ms"] / 1000)
+            await ws.send_json({"frame": frame, "dropped": state["dropped"], **result})
+    except Exception as e:
+        if not state["closed"]:
+            logger.warning(f"Preview connection ended: {e}")
+    finally:
+        receiver.cancel()
+        _stats["active"] -= 1
+
+
+def get_status() -> dict:
+    return {"max_fps": PREVIEW_MAX_FPS, "concurrency": PREVIEW_CONCURRENCY, **_stats}
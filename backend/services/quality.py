@@ -0,0 +1,138 @@
+"""Cheap image-quality gate for MediVan AI.
+
+Rejects blurry, badly exposed or tiny captures before CLIP routing and
+classification. The metrics are computed once per image on a downscaled
+grayscale copy, so checking costs a few milliseconds.
+"""
+import logging
+from PIL import Image
+from backend.config import QUALITY_GATE
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Longest side of the copy the metrics are computed on
+ANALYSIS_SIZE = 256
+
+# Dark/bright pixel cutoffs on the 0-255 grayscale histogram
+DARK_LEVEL = 8
+BRIGHT_LEVEL = 248
+
+# "default" is applied before routing; modality thresholds after routing, before the classifier.
+# Sharpness is Laplacian variance at ANALYSIS_SIZE.
+THRESHOLDS = {
+    "default": {
+        "min_side": 224, "min_sharpness": 6.0, "min_brightness": 20.0, "max_brightness": 235.0,
+        "max_dark_fraction": 0.85, "max_bright_fraction": 0.4,
+    },
+    "skin_lesion": {
+        "min_side": 224, "min_sharpness": 12.0, "min_brightness": 40.0, "max_brightness": 230.0,
+        "max_dark_fraction": 0.3, "max_bright_fraction": 0.3,
+    },
+    "chest_xray": {
+        "min_side": 256, "min_sharpness": 6.0, "min_brightness": 25.0, "max_brightness": 230.0,
+        "max_dark_fraction": 0.6, "max_bright_fraction": 0.4,
+    },
+    # Fundus photos have a wide black border around the retina
+    "fundus": {
+        "min_side": 224, "min_sharpness": 8.0, "min_brightness": 20.0, "max_brightness": 220.0,
+        "max_dark_fraction": 0.85, "max_bright_fraction": 0.2,
+    },
+}
+
+HINTS = {
+    "resolution": "Image resolution is too low. Move closer and capture at full camera resolution.",
+    "blur": "Image is blurry. Hold the camera steady, tap to focus and retake.",
+    "dark": "Image is too dark. Improve lighting or enable the flash and retake.",
+    "bright": "Image is overexposed. Reduce glare or flash and retake.",
+}
+
+
+def assess(image: Image.Image) -> dict:
+    """Compute resolution, sharpness and exposure metrics on a downscaled grayscale copy."""
+    import numpy as np
+
+    w, h = image.size
+    factor = max(1, max(w, h) // ANALYSIS_SIZE)
+    small = image.reduce(factor) if factor > 1 else image
+    gray = np.asarray(small.convert("L"))
+
+    g = gray.astype(np.float32)
+    lap = g[1:-1, :-2] + g[1:-1, 2:] + g[:-2, 1:-1] + g[2:, 1:-1] - 4 * g[1:-1, 1:-1]
+    hist = np.bincount(gray.ravel(), minlength=256) / gray.size
+
+    return {
+        "width": w,
+        "height": h,
+        "sharpness": round(float(lap.var()), 2) if lap.size else 0.0,
+        "brightness": round(float(g.mean()), 2),
+        "dark_fraction": round(float(hist[:DARK_LEVEL].sum()), 4),
+        "bright_fraction": round(float(hist[BRIGHT_LEVEL:].sum()), 4),
+    }
+
+
+def check(quality: dict, modality: str = "default") -> dict:
+    """Compare metrics from ``assess`` against the thresholds for a modality."""
+    t = THRESHOLDS.get(modality, THRESHOLDS["default"])
+    issues = []
+    if min(quality["width"], quality["height"]) < t["min_side"]:
+        issues.append("resolution")
+    if quality["sharpness"] < t["min_sharpness"]:
+        issues.append("blur")
+    if quality["brightness"] < t["min_brightness"] or quality["dark_fraction"] > t["max_dark_fraction"]:
+        issues.append("dark")
+    if quality["brightness"] > t["max_brightness"] or quality["bright_fraction"] > t["max_bright_fraction"]:
+        issues.append("bright")
+
+    return {
+        "passed": not issues,
+        "modality": modality,
+        "issues": issues,
+        "hint": " ".join(HINTS[i] for i in issues) if issues else None,
+        "metrics": quality,
+    }
+
+
+def frame_score(quality: dict) -> float:
+    """Rank frames of one burst: sharpness, discounted for poor exposure and clipped pixels."""
+    exposure = 1.0 - abs(quality["brightness"] - 128.0) / 128.0
+    clipped = quality["dark_fraction"] + quality["bright_fraction"]
+    return round(quality["sharpness"] * max(exposure, 0.05) * max(1.0 - clipped, 0.05), 3)
+
+
+def gate(quality: dict, modality: str = "default") -> dict | None:
+    """Check and count. Returns the failed check result, or None if the image may proceed."""
+    if not QUALITY_GATE:
+        return None
+    result = check(quality, modality)
+    metrics.incr(f"quality.checked.{modality}")
+    if result["passed"]:
+        return None
+
+    metrics.incr(f"quality.rejected.{modality}")
+    # A pre-route rejection skips CLIP and the classifier; a post-route one skips the classifier
+    if modality == "default":
+        metrics.incr("quality.saved.route")
+    metrics.incr("quality.saved.classify")
+    logger.info(f"Quality gate rejected image ({modality}): {', '.join(result['issues'])}")
+    return result
+
+
+def get_status() -> dict:
+    """Rejection counters and an estimate of model compute saved, from observed stage latency."""
+    counts = metrics.counters()
+    route_p50 = metrics.window("route").percentile(50)
+    classify_windows = [metrics.window(f"classify.{m}") for m in THRESHOLDS if m != "default"]
+    classify_p50 = [w.percentile(50) for w in classify_windows if len(w)]
+    classify_est = sum(classify_p50) / len(classify_p50) if classify_p50 else 0.0
+
+    saved_route = counts.get("quality.saved.route", 0)
+    saved_classify = counts.get("quality.saved.classify", 0)
+    return {
+        "enabled": QUALITY_GATE,
+        "checked": {m: counts.get(f"quality.checked.{m}", 0) for m in THRESHOLDS},
+        "rejected": {m: counts.get(f"quality.rejected.{m}", 0) for m in THRESHOLDS},
+        "saved_route_calls": saved_route,
+        "saved_classifier_calls": saved_classify,
+        "saved_ms_estimate": round((saved_route * route_p50 + saved_classify * classify_est) * 1000, 1),
+    }
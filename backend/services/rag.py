@@ -3,6 +3,8 @@ import os
 import glob
 import logging
 from backend.config import MOCK_MODE, EMBEDDING_MODEL, KNOWLEDGE_DIR
+from backend.services import model_store
+from backend.services.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +31,12 @@ def _load():
         import numpy as np
         from sentence_transformers import SentenceTransformer
 
-        logger.info(f"Loading embedding model '{EMBEDDING_MODEL}'")
-        _embed_model = SentenceTransformer(EMBEDDING_MODEL)
+        store_path = model_store.resolve(EMBEDDING_MODEL, "sentence_transformers")
+        logger.info(f"Loading embedding model '{EMBEDDING_MODEL}'{' from model store' if store_path else ''}")
+        if store_path:
+            _embed_model = SentenceTransformer(store_path, local_files_only=True)
+        else:
+            _embed_model = SentenceTransformer(EMBEDDING_MODEL)
 
         if not _chunks:
             logger.warning("No knowledge chunks found — RAG will return empty results")
@@ -90,10 +96,11 @@ def retrieve(query: str, k: int = 3) -> list[str]:
     """Retrieve top-k relevant clinical guideline chunks for a query."""
     _load()
 
-    if _index is not None and _embed_model is not None:
-        return _semantic_retrieve(query, k)
-    else:
-        return _keyword_retrieve(query, k)
+    with span("rag"):
+        if _index is not None and _embed_model is not None:
+            return _semantic_retrieve(query, k)
+        else:
+            return _keyword_retrieve(query, k)
 
 
 def _semantic_retrieve(query: str, k: int) -> list[str]:
@@ -1,16 +1,88 @@
 """Clinical report generation via NIM/Ollama LLM for MediVan AI."""
-import httpx
+import time
 import logging
 from datetime import datetime, timezone
-from backend.config import MOCK_MODE, NIM_ENDPOINT, NIM_MODEL
+from backend.config import (
+    MOCK_MODE, NIM_ENDPOINT, NIM_MODEL,
+    LLM_TIMEOUT, LLM_TIMEOUT_MIN, LLM_TIMEOUT_MULTIPLIER, LLM_CONNECT_TIMEOUT,
+    LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN, LLM_MAX_CONCURRENCY, LLM_REPORT_SLOTS,
+)
+from backend.services import scheduler
+from backend.services.circuit_breaker import CircuitBreaker
+from backend.services.metrics import LatencyWindow
+from backend.services.tracing import span
 
 logger = logging.getLogger(__name__)
 
+# Successful requests needed before the timeout adapts to observed latency
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20
 
-def _call_llm(prompt: str, max_tokens: int = 2000, temperature: float = 0.3) -> str | None:
-    """Call LLM via OpenAI-compatible API (NIM, Ollama, vLLM, etc.)."""
+_latency: dict[int, LatencyWindow] = {}  # keyed by max_tokens (explanation vs full report)
+_http = None
+
+
+def _client():
+    """Shared keep-alive httpx.Client so concurrent calls reuse pooled connections."""
+    global _http
+    if _http is None:
+        import httpx  # deferred: ~150 ms of imports that mock-mode startup never needs
+
+        _http = httpx.Client(limits=httpx.Limits(
+            max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY,
+        ))
+    return _http
+
+
+def _probe_endpoint() -> bool:
+    """Cheap liveness check used by the circuit breaker while open."""
+    resp = _client().get(f"{NIM_ENDPOINT}/models", timeout=LLM_CONNECT_TIMEOUT)
+    return resp.status_code < 500
+
+
+_breaker = CircuitBreaker("llm", LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN, probe=_probe_endpoint)
+
+
+def _timeout_for(max_tokens: int) -> float:
+    """Request timeout from the observed p99 for this request size, capped at LLM_TIMEOUT.
+
+    Timed-out calls enter the window at their timeout, so once a slower
+    endpoint reaches the p99 the timeout grows toward LLM_TIMEOUT instead of
+    staying tuned to the old, faster latency.
+    """
+    window = _latency.get(max_tokens)
+    if window is None or len(window) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+        return LLM_TIMEOUT
+    return min(LLM_TIMEOUT, max(LLM_TIMEOUT_MIN, window.percentile(99) * LLM_TIMEOUT_MULTIPLIER))
+
+
+# Full reports may hold at most LLM_REPORT_SLOTS so interactive explanations always have capacity
+_scheduler = scheduler.PriorityScheduler("llm", LLM_MAX_CONCURRENCY, limits={"report": LLM_REPORT_SLOTS})
+
+
+def _call_llm(prompt: str, max_tokens: int = 2000, temperature: float = 0.3, kind: str = "report") -> str | None:
+    """Call LLM via OpenAI-compatible API (NIM, Ollama, vLLM, etc.).
+
+    Queued under the current request's priority class; ``kind`` is the class
+    used outside a request.
+    """
+    with _breaker.guard() as allowed:
+        if not allowed:
+            logger.debug("LLM circuit open, skipping call")
+            return None
+        with span("llm"):
+            cls = scheduler.current(kind)
+            key = (max_tokens, temperature, prompt)
+            # The half-open trial decides whether the circuit closes, so it gets the full ceiling
+            timeout = LLM_TIMEOUT if _breaker.owns_trial() else _timeout_for(max_tokens)
+            return _scheduler.run(cls, lambda: _post_chat(prompt, max_tokens, temperature, timeout), key=key)
+
+
+def _post_chat(prompt: str, max_tokens: int, temperature: float, timeout: float) -> str | None:
+    import httpx
+
+    start = time.perf_counter()
     try:
-        resp = httpx.post(
+        resp = _client().post(
             f"{NIM_ENDPOINT}/chat/completions",
             json={
                 "model": NIM_MODEL,
@@ -21,17 +93,29 @@ def _call_llm(prompt: str, max_tokens: int = 2000, temperature: float = 0.3) ->
                 "max_tokens": max_tokens,
                 "temperature": temperature,
             },
-            timeout=60,
+            timeout=httpx.Timeout(timeout, connect=min(LLM_CONNECT_TIMEOUT, timeout)),
         )
         resp.raise_for_status()
-        return resp.json()["choices"][0]["message"]["content"]
+        content = resp.json()["choices"][0]["message"]["content"]
     except httpx.ConnectError:
         logger.warning(f"LLM endpoint unreachable at {NIM_ENDPOINT}")
+        _breaker.record_failure("endpoint unreachable")
+        return None
+    except httpx.TimeoutException:
+        logger.warning(f"LLM call timed out after {timeout:.1f}s")
+        # The real latency was at least the timeout; recording it lets the timeout grow back
+        _latency.setdefault(max_tokens, LatencyWindow()).observe(timeout)
+        _breaker.record_failure(f"timeout after {timeout:.1f}s")
         return None
     except Exception as e:
         logger.error(f"LLM call failed: {e}")
+        _breaker.record_failure(str(e))
         return None
 
+    _latency.setdefault(max_tokens, LatencyWindow()).observe(time.perf_counter() - start)
+    _breaker.record_success()
+    return content
+
 
 def generate_report(session: dict) -> str:
     """Generate a holistic patient screening report from all session findings."""
@@ -105,7 +189,7 @@ def generate_explanation(image_type: str, result: dict) -> str:
 - Risk Level: {risk}
 Include what this means clinically and immediate next steps."""
 
-    result_text = _call_llm(prompt, max_tokens=200)
+    result_text = _call_llm(prompt, max_tokens=200, kind="interactive")
     if result_text:
         return result_text
     return result.get("recommendation", f"{classification} detected with {confidence*100:.1f}% confidence. Risk level: {risk}.")
@@ -236,3 +320,19 @@ def _priority_referrals(findings: list) -> str:
         }.get(f.get("image_type"), "Specialist")
         lines.append(f"  {i}. [ROUTINE] {specialty}: {f.get('classification', 'finding')} — Follow-up within 2-4 weeks")
     return "\n".join(lines) if lines else "  No urgent referrals indicated. Routine follow-up recommended."
+
+
+def get_status() -> dict:
+    if MOCK_MODE:
+        return {"name": "LLM (Report Generator)", "status": "ready (mock)", "model": NIM_MODEL}
+    breaker = _breaker.status()
+    return {
+        "name": "LLM (Report Generator)",
+        "status": "available" if breaker["state"] == "closed" else "degraded (template fallback)",
+        "model": NIM_MODEL,
+        "endpoint": NIM_ENDPOINT,
+        "breaker": breaker,
+        "scheduler": _scheduler.status(),
+        "timeouts_s": {str(k): round(_timeout_for(k), 2) for k in sorted(_latency)},
+        "latency": {str(k): w.summary() for k, w in sorted(_latency.items())},
+    }
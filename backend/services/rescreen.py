@@ -0,0 +1,347 @@
+"""Offline bulk re-screening of archived images for MediVan AI.
+
+Runs a directory tree or manifest of images through the same router and
+classifiers as the API, without going through HTTP. Worker processes
+decode the images, using JPEG draft mode and a downscale to ``--max-side``,
+which covers far more than any model input. They stay a bounded number of
+batches ahead of the main process. The main process routes each batch in
+one CLIP pass and classifies images in per-modality batches. Everything
+runs as the ``batch`` priority class.
+
+Results are appended as they finish, so an interrupted run loses at most
+one flush. Re-running with the same ``--out`` skips images that already
+have a result (failed ones are retried). Output formats:
+
+    results.jsonl   one JSON object per image, fsynced per flush
+    results/        a directory of Parquet parts (``--format parquet``,
+                    needs pyarrow); each part is written atomically
+
+Usage:
+    python -m backend.services.rescreen /data/archive --out rescreen.jsonl
+    python -m backend.services.rescreen manifest.jsonl --out rescreen/ --format parquet --batch-size 64
+    python -m backend.services.rescreen manifest.txt --out rescreen.jsonl --workers 8 --limit 1000
+
+A manifest is a text file with one path per line, or JSONL with a
+``path`` and optional ``image_type`` (which skips routing). Relative paths
+are resolved against the manifest's directory.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+import importlib.util
+from collections import deque
+from datetime import datetime, timezone
+from PIL import Image
+from backend.services import router, skin_classifier, chest_classifier, eye_classifier, scheduler
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+CLASSIFIERS = {
+    "skin_lesion": skin_classifier.classify_batch,
+    "chest_xray": chest_classifier.classify_batch,
+    "fundus": eye_classifier.classify_batch,
+}
+
+# Nested values are stored as JSON strings in Parquet so every part has the same schema
+PARQUET_COLUMNS = [
+    "path", "image_type", "route_confidence", "route_scores", "classification", "confidence",
+    "risk_level", "all_scores", "model_version", "error", "rescreened_at",
+]
+
+
+# ── Inputs ────────────────────────────────────────────────
+
+
+def discover(source: str) -> list[dict]:
+    """``[{"path", "image_type"?}]`` for a directory tree or a manifest file."""
+    if os.path.isdir(source):
+        items = []
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for fn in sorted(filenames):
+                if os.path.splitext(fn)[1].lower() in IMAGE_EXTENSIONS:
+                    items.append({"path": os.path.join(dirpath, fn)})
+        return items
+
+    base = os.path.dirname(os.path.abspath(source))
+    items = []
+    with open(source, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item = json.loads(line) if line.startswith("{") else {"path": line}
+            item["path"] = os.path.join(base, item["path"])
+            items.append(item)
+    return items
+
+
+def _decode(item: dict, max_side: int) -> tuple[dict, Image.Image | None, str | None]:
+    """Worker: open, draft-decode and downscale one image."""
+    try:
+        image = Image.open(item["path"])
+        # JPEGs decode at 1/2, 1/4 or 1/8 scale in the DCT domain when that still covers max_side
+        image.draft("RGB", (max_side, max_side))
+        image = image.convert("RGB")
+        image.thumbnail((max_side, max_side))
+        return item, image, None
+    except Exception as e:
+        return item, None, str(e)
+
+
+def _decoded(pool, items: list, max_side: int, ahead: int):
+    """Yield decode results in input order, keeping at most ``ahead`` images in flight."""
+    pending = deque()
+    it = iter(items)
+    for item in it:
+        pending.append(pool.apply_async(_decode, (item, max_side)))
+        if len(pending) >= ahead:
+            break
+    for item in it:
+        yield pending.popleft().get()
+        pending.append(pool.apply_async(_decode, (item, max_side)))
+    while pending:
+        yield pending.popleft().get()
+
+
+# ── Outputs ───────────────────────────────────────────────
+
+
+class JsonlWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    def done(self) -> set:
+        """Paths with a successful result; drops a line cut short by a crash."""
+        if not os.path.exists(self.path):
+            return set()
+        done = set()
+        with open(self.path, "rb") as fh:
+            data = fh.read()
+        good = data.rfind(b"\n") + 1
+        if good < len(data):
+            logger.warning(f"Dropping a truncated last line from {self.path}")
+            with open(self.path, "r+b") as fh:
+                fh.truncate(good)
+        for line in data[:good].splitlines():
+            row = json.loads(line)
+            if not row.get("error"):
+                done.add(row["path"])
+        return done
+
+    def write(self, rows: list[dict]):
+        if self._fh is None:
+            parent = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(parent, exist_ok=True)
+            self._fh = open(self.path, "a", encoding="utf-8")
+        for row in rows:
+            self._fh.write(json.dumps(row) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+
+
+class ParquetWriter:
+    def __init__(self, path: str):
+        import pyarrow  # noqa: F401  (fail before any work if missing)
+
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._part = len(self._parts())
+
+    def _parts(self) -> list:
+        return sorted(f for f in os.listdir(self.path) if f.startswith("part-") and f.endswith(".parquet"))
+
+    def done(self) -> set:
+        import pyarrow.parquet as pq
+
+        done = set()
+        for fn in self._parts():
+            table = pq.read_table(os.path.join(self.path, fn), columns=["path", "error"])
+            for path, error in zip(table.column("path").to_pylist(), table.column("error").to_pylist()):
+                if not error:
+                    done.add(path)
+        return done
+
+    def write(self, rows: list[dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = {c: [] for c in PARQUET_COLUMNS}
+        for row in rows:
+            for c in PARQUET_COLUMNS:
+                value = row.get(c)
+                columns[c].append(json.dumps(value) if isinstance(value, dict) else value)
+        table = pa.table({c: pa.array(v, type=pa.float64() if "confidence" in c else pa.string())
+                          for c, v in columns.items()})
+        final = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+        tmp = final + ".tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, final)
+        self._part += 1
+
+    def close(self):
+        pass
+
+
+# ── Run ───────────────────────────────────────────────────
+
+
+def _row(item: dict, route: dict | None, result: dict | None, error: str | None = None) -> dict:
+    result = result or {}
+    return {
+        "path": item["path"],
+        "image_type": route["type"] if route else item.get("image_type"),
+        "route_confidence": route["confidence"] if route else None,
+        "route_scores": route["scores"] if route else None,
+        "classification": result.get("classification"),
+        "confidence": result.get("confidence"),
+        "risk_level": result.get("risk_level"),
+        "all_scores": result.get("all_scores"),
+        "model_version": result.get("model_version"),
+        "error": error or result.get("error"),
+        "rescreened_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class Rescreen:
+    """Routes decoded images in batches and classifies them in per-modality batches."""
+
+    def __init__(self, writer, batch_size: int, flush_every: int):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_every = flush_every
+        self._buffers = {t: [] for t in CLASSIFIERS}  # image_type -> [(item, route, image)]
+        self._rows = []
+        self.counts = {"images": 0, "errors": 0, "unknown": 0}
+
+    def add(self, batch: list):
+        """``batch``: decode results ``(item, image, error)`` in input order."""
+        to_route = []
+        for item, image, error in batch:
+            if error:
+                self._emit(_row(item, None, None, error))
+            elif item.get("image_type") in CLASSIFIERS:
+                self._queue(item["image_type"], item, None, image)
+            else:
+                to_route.append((item, image))
+
+        if to_route:
+            routes = router.route_batch([im for _, im in to_route], [os.path.basename(i["path"]) for i, _ in to_route])
+            for (item, image), route in zip(to_route, routes):
+                if route["type"] in CLASSIFIERS:
+                    self._queue(route["type"], item, route, image)
+                else:
+                    self.counts["unknown"] += 1
+                    self._emit(_row(item, route, None))
+
+    def _queue(self, image_type: str, item: dict, route: dict | None, image):
+        buf = self._buffers[image_type]
+        buf.append((item, route, image))
+        if len(buf) >= self.batch_size:
+            self._classify(image_type)
+
+    def _classify(self, image_type: str):
+        buf, self._buffers[image_type] = self._buffers[image_type], []
+        if not buf:
+            return
+        results = CLASSIFIERS[image_type]([image for _, _, image in buf])
+        for (item, route, _), result in zip(buf, results):
+            row = _row(item, route, result)
+            row["image_type"] = image_type
+            self._emit(row)
+
+    def _emit(self, row: dict):
+        self.counts["images"] += 1
+        if row["error"]:
+            self.counts["errors"] += 1
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            self.writer.write(self._rows)
+            self._rows = []
+
+    def finish(self):
+        for image_type in CLASSIFIERS:
+            self._classify(image_type)
+        self.flush()
+        self.writer.close()
+
+
+def run(source: str, out: str, fmt: str = "jsonl", batch_size: int = 32, workers: int | None = None,
+        max_side: int = 768, flush_every: int = 256, limit: int | None = None) -> dict:
+    """Re-screen every image in ``source`` not already in ``out``; returns a summary."""
+    writer = ParquetWriter(out) if fmt == "parquet" else JsonlWriter(out)
+    items = discover(source)
+    done = writer.done()
+    todo = [i for i in items if i["path"] not in done]
+    if limit is not None:
+        todo = todo[:limit]
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    logger.info(f"Re-screening {len(todo)} of {len(items)} images ({len(done)} already done) with {workers} decode workers")
+
+    start = time.perf_counter()
+    job = Rescreen(writer, batch_size, flush_every)
+    # Start the decode workers before any model is loaded so forked workers don't inherit CUDA state
+    with multiprocessing.Pool(workers) as pool, scheduler.priority("batch"):
+        batch = []
+        last_log = start
+        for decoded in _decoded(pool, todo, max_side, ahead=batch_size * 4):
+            batch.append(decoded)
+            if len(batch) >= batch_size:
+                job.add(batch)
+                batch = []
+            now = time.perf_counter()
+            if now - last_log >= 10:
+                last_log = now
+                logger.info(f"{job.counts['images']}/{len(todo)} images ({job.counts['images'] / (now - start):.1f}/s)")
+        if batch:
+            job.add(batch)
+        job.finish()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "source": source,
+        "out": out,
+        "total": len(items),
+        "skipped": len(done),
+        **job.counts,
+        "seconds": round(elapsed, 1),
+        "images_per_s": round(job.counts["images"] / elapsed, 1) if elapsed else None,
+    }
+
+
+def main(argv: list | None = None):
+    p = argparse.ArgumentParser(description="Re-run archived images through the current MediVan AI models")
+    p.add_argument("source", help="Directory of images, or a manifest (.txt paths or .jsonl with path/image_type)")
+    p.add_argument("--out", required=True, help="JSONL file, or Parquet directory with --format parquet")
+    p.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Output format (default: jsonl)")
+    p.add_argument("--batch-size", type=int, default=32, help="Images per router/classifier batch")
+    p.add_argument("--workers", type=int, help="Decode processes (default: CPU count - 1)")
+    p.add_argument("--max-side", type=int, default=768, help="Downscale decoded images to this longest side")
+    p.add_argument("--flush-every", type=int, default=256, help="Rows per incremental write")
+    p.add_argument("--limit", type=int, help="Stop after this many new images")
+    args = p.parse_args(argv)
+
+    if args.format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        p.error("--format parquet needs pyarrow (pip install pyarrow), or use the default --format jsonl")
+    summary = run(args.source, args.out, args.format, args.batch_size, args.workers, args.max_side, args.flush_every, args.limit)
+    print(json.dumps(summary))
+    sys.exit(0 if summary["errors"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 """CLIP/SigLIP zero-shot image router for MediVan AI."""
+import os
 import random
 import logging
 from PIL import Image
 from backend.config import MOCK_MODE, CLIP_MODEL
+from backend.services import model_store, model_swap, pipeline, warmup
+from backend.services.tracing import span
 
 logger = logging.getLogger(__name__)
 
 IMAGE_TYPES = ["skin_lesion", "chest_xray", "fundus"]
+OPEN_CLIP_PRETRAINED = "openai"
 PROMPTS = {
     "skin_lesion": [
         "a dermoscopic image of a skin lesion",
@@ -28,12 +32,15 @@ PROMPTS = {
 _model = None
 _processor = None
 _tokenizer = None
+_stage = None
 _device = "cpu"
+# Normalized text embeddings per prompt tuple; prompts are fixed, so encode them once
+_text_features = {}
 
 
 def _load_model():
     """Load CLIP model for zero-shot image classification."""
-    global _model, _processor, _tokenizer, _device
+    global _model, _processor, _tokenizer, _stage, _device
     if _model is not None:
         return
 
@@ -47,20 +54,17 @@ def _load_model():
     else:
         _device = "cpu"
     logger.info(f"Loading CLIP model '{CLIP_MODEL}' on {_device}")
+    _stage = pipeline.Stage("router", _device)
 
     try:
         # Try open_clip first (supports more model variants)
         import open_clip
-        model_name = "ViT-B-32"
-        pretrained = "openai"
-
-        # If user specified a HF model ID, try to map it
-        if "/" in CLIP_MODEL:
-            # e.g. "openai/clip-vit-base-patch32" -> use default open_clip
-            if "large" in CLIP_MODEL.lower():
-                model_name = "ViT-L-14"
-            elif "huge" in CLIP_MODEL.lower():
-                model_name = "ViT-H-14"
+        model_name = open_clip_arch(CLIP_MODEL)
+        pretrained = OPEN_CLIP_PRETRAINED
+        store_path = model_store.resolve(CLIP_MODEL, "open_clip")
+        if store_path:
+            # Local safetensors file: no download or cache lookup
+            pretrained = os.path.join(store_path, model_store.OPEN_CLIP_WEIGHTS)
 
         model, _, preprocess = open_clip.create_model_and_transforms(
             model_name, pretrained=pretrained, device=_device
@@ -70,21 +74,39 @@ def _load_model():
         _model = model
         _processor = preprocess
         _tokenizer = tokenizer
-        logger.info(f"CLIP model loaded successfully ({model_name}, {pretrained}) on {_device}")
+        logger.info(f"CLIP model loaded successfully ({model_name}, {'store' if store_path else pretrained}) on {_device}")
     except ImportError:
         # Fallback to transformers CLIP
         logger.info("open_clip not available, falling back to transformers CLIPModel")
         from transformers import CLIPModel, CLIPProcessor
-        _model = CLIPModel.from_pretrained(CLIP_MODEL).to(_device).eval()
-        _processor = CLIPProcessor.from_pretrained(CLIP_MODEL)
+        store_path = model_store.resolve(CLIP_MODEL, "transformers")
+        source = store_path or CLIP_MODEL
+        _model = CLIPModel.from_pretrained(source, local_files_only=bool(store_path)).to(_device).eval()
+        _processor = CLIPProcessor.from_pretrained(source, local_files_only=bool(store_path))
         _tokenizer = None  # CLIPProcessor handles tokenization
-        logger.info(f"CLIP model loaded via transformers on {_device}")
+        logger.info(f"CLIP model loaded via transformers on {_device}{' from model store' if store_path else ''}")
+
+
+def open_clip_arch(model_id: str) -> str:
+    """open_clip architecture for a configured CLIP model ID."""
+    # If user specified a HF model ID, try to map it,
+    # e.g. "openai/clip-vit-base-patch32" -> use default open_clip
+    if "/" in model_id:
+        if "large" in model_id.lower():
+            return "ViT-L-14"
+        if "huge" in model_id.lower():
+            return "ViT-H-14"
+    return "ViT-B-32"
 
 
 def route_image(image: Image.Image, filename: str = "") -> dict:
-    """Classify image type using CLIP zero-shot. Returns {type, confidence, scores}."""
+    """Classify image type using CLIP zero-shot. Returns {type, confidence, scores, embedding}.
+
+    ``embedding`` is the normalized image embedding (float32 numpy array),
+    or None if routing fell back to filenames; callers pop it before responding.
+    """
     if MOCK_MODE:
-        return _mock_route(filename)
+        return {**_mock_route(filename), "embedding": _mock_embedding(image)}
 
     _load_model()
     import torch
@@ -92,31 +114,33 @@ def route_image(image: Image.Image, filename: str = "") -> dict:
     try:
         if _tokenizer is not None:
             # open_clip path
-            img_tensor = _processor(image).unsqueeze(0).to(_device)
-            # Use primary prompt per category
-            text_labels = [PROMPTS[t][0] for t in IMAGE_TYPES]
-            texts = _tokenizer(text_labels).to(_device)
-
-            with torch.no_grad():
-                img_features = _model.encode_image(img_tensor)
-                txt_features = _model.encode_text(texts)
-                img_features = img_features / img_features.norm(dim=-1, keepdim=True)
-                txt_features = txt_features / txt_features.norm(dim=-1, keepdim=True)
-                similarity = (100.0 * img_features @ txt_features.T).softmax(dim=-1)[0]
-
-            scores = {t: round(float(similarity[i]), 4) for i, t in enumerate(IMAGE_TYPES)}
+            with span("clip_preprocess"):
+                pixels = _processor(image).unsqueeze(0)
+
+            with _stage.slot():
+                # Use primary prompt per category
+                txt_features = _encode_text(tuple(PROMPTS[t][0] for t in IMAGE_TYPES))
+                with span("clip_forward"), torch.no_grad():
+                    img_features = _model.encode_image(_stage.to_device({"pixel_values": pixels})["pixel_values"])
+                    img_features = img_features / img_features.norm(dim=-1, keepdim=True)
+                    similarity = (100.0 * img_features @ txt_features.T).softmax(dim=-1)[0]
+
+                scores = {t: round(float(similarity[i]), 4) for i, t in enumerate(IMAGE_TYPES)}
+                embedding = img_features[0].float().cpu().numpy()
         else:
             # transformers CLIPModel path
             text_labels = [PROMPTS[t][0] for t in IMAGE_TYPES]
-            inputs = _processor(text=text_labels, images=image, return_tensors="pt", padding=True)
-            inputs = {k: v.to(_device) for k, v in inputs.items()}
+            with span("clip_preprocess"):
+                inputs = _processor(text=text_labels, images=image, return_tensors="pt", padding=True)
 
-            with torch.no_grad():
-                outputs = _model(**inputs)
-                logits = outputs.logits_per_image[0]
-                probs = logits.softmax(dim=-1)
+            with _stage.slot():
+                with span("clip_forward"), torch.no_grad():
+                    outputs = _model(**_stage.to_device(dict(inputs)))
+                    logits = outputs.logits_per_image[0]
+                    probs = logits.softmax(dim=-1)
 
-            scores = {t: round(float(probs[i]), 4) for i, t in enumerate(IMAGE_TYPES)}
+                scores = {t: round(float(probs[i]), 4) for i, t in enumerate(IMAGE_TYPES)}
+                embedding = outputs.image_embeds[0].float().cpu().numpy()
 
         best = max(scores, key=scores.get)
         conf = scores[best]
@@ -130,13 +154,14 @@ def route_image(image: Image.Image, filename: str = "") -> dict:
         if conf < 0.35:
             best = "unknown"
 
-        return {"type": best, "confidence": conf, "scores": scores}
+        return {"type": best, "confidence": conf, "scores": scores, "embedding": embedding}
 
     except Exception as e:
         logger.error(f"CLIP routing failed: {e}")
         # Fallback to filename-based routing
         result = _mock_route(filename)
         result["fallback"] = True
+        result["embedding"] = None
         return result
 
 
@@ -151,20 +176,20 @@ def _ensemble_route(image: Image.Image) -> dict:
             all_prompts.append(p)
             prompt_map.append(t)
 
-    img_tensor = _processor(image).unsqueeze(0).to(_device)
-    texts = _tokenizer(all_prompts).to(_device)
+    with span("clip_preprocess"):
+        pixels = _processor(image).unsqueeze(0)
 
-    with torch.no_grad():
-        img_features = _model.encode_image(img_tensor)
-        txt_features = _model.encode_text(texts)
-        img_features = img_features / img_features.norm(dim=-1, keepdim=True)
-        txt_features = txt_features / txt_features.norm(dim=-1, keepdim=True)
-        similarity = (100.0 * img_features @ txt_features.T).softmax(dim=-1)[0]
+    with _stage.slot():
+        txt_features = _encode_text(tuple(all_prompts))
+        with span("clip_forward"), torch.no_grad():
+            img_features = _model.encode_image(_stage.to_device({"pixel_values": pixels})["pixel_values"])
+            img_features = img_features / img_features.norm(dim=-1, keepdim=True)
+            similarity = (100.0 * img_features @ txt_features.T).softmax(dim=-1)[0].cpu().tolist()
 
     # Average scores per category
     cat_scores = {t: [] for t in IMAGE_TYPES}
     for i, cat in enumerate(prompt_map):
-        cat_scores[cat].append(float(similarity[i]))
+        cat_scores[cat].append(similarity[i])
 
     scores = {t: round(sum(s) / len(s), 4) for t, s in cat_scores.items()}
     # Renormalize
@@ -174,6 +199,159 @@ def _ensemble_route(image: Image.Image) -> dict:
     return scores
 
 
+def _encode_text(prompts: tuple):
+    """Normalized CLIP text embeddings for ``prompts``, computed once per prompt set."""
+    features = _text_features.get(prompts)
+    if features is not None:
+        return features
+
+    import torch
+
+    with torch.no_grad():
+        if _tokenizer is not None:
+            features = _model.encode_text(_tokenizer(list(prompts)).to(_device))
+        else:
+            inputs = _processor(text=list(prompts), return_tensors="pt", padding=True)
+            features = _projected(_model.get_text_features(**{k: v.to(_device) for k, v in inputs.items()}))
+        features = features / features.norm(dim=-1, keepdim=True)
+    _text_features[prompts] = features
+    return features
+
+
+def _projected(output):
+    # Newer transformers return a model output whose pooler_output holds the projected embeddings
+    return getattr(output, "pooler_output", output)
+
+
+def _similarity(images: list):
+    """(prompt-similarity softmax (frames x IMAGE_TYPES), normalized image embeddings) in one batched CLIP pass."""
+    import torch
+
+    with span("clip_preprocess"):
+        if _tokenizer is not None:
+            pixels = torch.stack([_processor(im) for im in images])
+        else:
+            pixels = _processor(images=images, return_tensors="pt")["pixel_values"]
+
+    with _stage.slot():
+        txt_features = _encode_text(tuple(PROMPTS[t][0] for t in IMAGE_TYPES))
+        with span("clip_forward"), torch.no_grad():
+            batch = _stage.to_device({"pixel_values": pixels})["pixel_values"]
+            if _tokenizer is not None:
+                img_features = _model.encode_image(batch)
+            else:
+                img_features = _projected(_model.get_image_features(pixel_values=batch))
+            img_features = img_features / img_features.norm(dim=-1, keepdim=True)
+            similarity = (100.0 * img_features @ txt_features.T).softmax(dim=-1)
+            return similarity.cpu(), img_features.float().cpu().numpy()
+
+
+def route_burst(images: list, filename: str = "") -> dict:
+    """Route a burst of frames of the same subject with one batched CLIP pass.
+
+    Returns the ``route_image`` shape with scores averaged over the frames,
+    plus ``frame_scores`` and ``frame_embeddings`` (per frame, in input order)
+    in place of ``embedding``.
+    """
+    if MOCK_MODE:
+        route = _mock_route(filename)
+        return {**route, "frame_scores": [route["scores"]] * len(images), "frame_embeddings": [_mock_embedding(im) for im in images]}
+
+    _load_model()
+
+    try:
+        similarity, features = _similarity(images)
+        per_frame = similarity.tolist()
+        mean = similarity.mean(dim=0).tolist()
+        scores = {t: round(mean[i], 4) for i, t in enumerate(IMAGE_TYPES)}
+        best = max(scores, key=scores.get)
+        conf = scores[best]
+        if conf < 0.35:
+            best = "unknown"
+        return {
+            "type": best,
+            "confidence": conf,
+            "scores": scores,
+            "frame_scores": [{t: round(row[i], 4) for i, t in enumerate(IMAGE_TYPES)} for row in per_frame],
+            "frame_embeddings": list(features),
+        }
+
+    except Exception as e:
+        logger.error(f"CLIP burst routing failed: {e}")
+        result = _mock_route(filename)
+        return {**result, "fallback": True, "frame_scores": [result["scores"]] * len(images), "frame_embeddings": [None] * len(images)}
+
+
+def route_batch(images: list, filenames: list | None = None) -> list[dict]:
+    """Route independent images with one batched CLIP pass; one ``route_image`` result per image."""
+    filenames = filenames or [""] * len(images)
+    if MOCK_MODE:
+        return [{**_mock_route(fn), "embedding": _mock_embedding(im)} for im, fn in zip(images, filenames)]
+
+    _load_model()
+
+    try:
+        similarity, features = _similarity(images)
+        rows = similarity.tolist()
+    except Exception as e:
+        logger.error(f"CLIP batch routing failed: {e}")
+        return [{**_mock_route(fn), "fallback": True, "embedding": None} for fn in filenames]
+
+    routes = []
+    for image, row, embedding in zip(images, rows, features):
+        scores = {t: round(row[i], 4) for i, t in enumerate(IMAGE_TYPES)}
+        best = max(scores, key=scores.get)
+        conf = scores[best]
+        # Same low-confidence handling as route_image, per image
+        if conf < 0.5 and _tokenizer is not None:
+            scores = _ensemble_route(image)
+            best = max(scores, key=scores.get)
+            conf = scores[best]
+        if conf < 0.35:
+            best = "unknown"
+        routes.append({"type": best, "confidence": conf, "scores": scores, "embedding": embedding})
+    return routes
+
+
+def route_preview(image: Image.Image) -> dict:
+    """Cheapest routing for live camera preview: one CLIP pass, primary prompts only, no embedding."""
+    if MOCK_MODE:
+        return _mock_route("")
+
+    _load_model()
+    similarity, _ = _similarity([image])
+    row = similarity[0].tolist()
+    scores = {t: round(row[i], 4) for i, t in enumerate(IMAGE_TYPES)}
+    best = max(scores, key=scores.get)
+    conf = scores[best]
+    return {"type": best if conf >= 0.35 else "unknown", "confidence": conf, "scores": scores}
+
+
+def backlog() -> int:
+    """Routing requests queued behind the CLIP stage (0 in mock mode or before loading)."""
+    return _stage.backlog() if _stage is not None else 0
+
+
+def warm_up(batch_sizes: list, iterations: int) -> dict:
+    """Synthetic routing passes: batch 1 goes through route_image, larger batches through route_burst."""
+    _load_model()
+
+    def run(images):
+        if len(images) == 1:
+            route_image(images[0])
+        else:
+            route_burst(images)
+
+    return warmup.run("router", run, batch_sizes, iterations)
+
+
+def input_size() -> int | None:
+    """Short side CLIP preprocessing resizes to, None in mock mode or before loading."""
+    if MOCK_MODE or _processor is None:
+        return None
+    return model_swap.input_side(_processor)
+
+
 def _mock_route(filename: str) -> dict:
     fn = filename.lower()
     if any(k in fn for k in ["skin", "derm", "lesion", "mole", "nevus", "melanoma"]):
@@ -190,6 +368,15 @@ def _mock_route(filename: str) -> dict:
     return {"type": t, "confidence": conf, "scores": scores}
 
 
+def _mock_embedding(image: Image.Image):
+    """Normalized 8x8 RGB thumbnail: a stand-in embedding so mock mode finds identical images."""
+    import numpy as np
+
+    v = np.asarray(image.convert("RGB").resize((8, 8), Image.BILINEAR), dtype=np.float32).ravel()
+    v -= v.mean()
+    return v / (np.linalg.norm(v) or 1.0)
+
+
 def get_status() -> dict:
     if MOCK_MODE:
         return {"name": "CLIP Router", "status": "ready (mock)", "model": CLIP_MODEL}
@@ -198,4 +385,5 @@ def get_status() -> dict:
         "status": "loaded" if _model is not None else "not_loaded",
         "model": CLIP_MODEL,
         "device": _device if _model else None,
+        "pipeline": _stage.status() if _stage else None,
     }
@@ -0,0 +1,203 @@
+"""Triage-priority scheduling for the MediVan AI inference and LLM queues.
+
+Every request carries a priority class. The request's class is set once
+at the endpoint with ``priority()`` and read wherever the request queues:
+the model pipeline stages and the LLM client. Work runs on threadpool
+threads, which inherit the caller's contextvars, so the class follows the
+request there too.
+
+Classes:
+    interactive  analyze/capture for the patient in the chair
+    report       full-session report generation
+    batch        bulk re-analysis and other background jobs
+
+Admission uses weighted fair queuing. Each class advances a virtual clock
+by 1/weight per admitted request, so under contention classes get
+capacity in proportion to their weights instead of strict priority.
+Aging credits each waiting request with its wait time, at one virtual
+unit per ``aging`` seconds, so a long-waiting batch job eventually wins
+over fresh interactive work and is never starved.
+"""
+import time
+import logging
+import itertools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from backend.config import PRIORITY_WEIGHTS, PRIORITY_AGING_S
+from backend.services import metrics
+from backend.services.metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+CLASSES = ["interactive", "report", "batch"]
+
+_current = contextvars.ContextVar("medivan_priority", default=None)
+
+
+@contextmanager
+def priority(cls: str):
+    """Run the enclosed request as ``cls`` and record its latency in ``class.<cls>``."""
+    if cls not in CLASSES:
+        raise ValueError(f"Unknown priority class '{cls}' (expected one of {', '.join(CLASSES)})")
+    token = _current.set(cls)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current.reset(token)
+    metrics.observe(f"class.{cls}", time.perf_counter() - start)
+
+
+def current(default: str = "interactive") -> str:
+    """The priority class of the request being served, or ``default`` outside a request."""
+    return _current.get() or default
+
+
+class _Pending:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class PriorityScheduler:
+    """Weighted fair admission over ``capacity`` slots, with aging and optional per-class caps.
+
+    ``limits`` caps the slots one class may hold, e.g. so full reports can
+    never occupy every LLM slot. ``run`` with a ``key`` coalesces identical
+    in-flight calls into one.
+    """
+
+    def __init__(self, name: str, capacity: int, weights: dict | None = None,
+                 limits: dict | None = None, aging: float = PRIORITY_AGING_S):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.weights = {c: float((weights or PRIORITY_WEIGHTS).get(c, 1.0)) for c in CLASSES}
+        self.limits = {c: max(1, min(n, self.capacity)) for c, n in (limits or {}).items()}
+        self.aging = max(aging, 1e-3)
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting = {c: deque() for c in CLASSES}  # FIFO of (seq, enqueued_at) per class
+        self._active = {c: 0 for c in CLASSES}
+        self._vtime = {c: 0.0 for c in CLASSES}  # virtual finish time of each class's last admission
+        self._head_start = {c: 0.0 for c in CLASSES}  # virtual start time of each class's head-of-line request
+        self._clock = 0.0  # virtual start time of the last admission
+        self._inflight = {}  # coalescing key -> _Pending
+        self._stats = {"requests": 0, "coalesced": 0, "aged": 0}
+        self.queue_wait = {c: LatencyWindow() for c in CLASSES}
+        self.service = {c: LatencyWindow() for c in CLASSES}
+
+    def run(self, cls: str, fn, key=None):
+        """Run ``fn()`` once admitted as ``cls``; callers with the same ``key`` share one call."""
+        if key is None:
+            with self._cond:
+                self._stats["requests"] += 1
+            with self.slot(cls):
+                return fn()
+
+        with self._cond:
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = _Pending()
+                self._stats["requests"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            pending.done.wait()
+            return pending.result
+
+        try:
+            with self.slot(cls):
+                pending.result = fn()
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+            pending.done.set()
+        return pending.result
+
+    @contextmanager
+    def slot(self, cls: str):
+        """Hold one slot as ``cls`` for the enclosed block."""
+        self._acquire(cls)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.service[cls].observe(time.perf_counter() - start)
+            self._release(cls)
+
+    def _admissible(self, cls: str) -> bool:
+        if sum(self._active.values()) >= self.capacity:
+            return False
+        return cls not in self.limits or self._active[cls] < self.limits[cls]
+
+    def _next(self) -> str | None:
+        """Class whose head-of-line request should be admitted next.
+
+        Tag = virtual finish time + enqueue time / aging. This equals the
+        finish time minus the aging credit (time waited / aging) plus a term
+        common to every waiter, so ordering never changes while requests wait.
+        """
+        best, best_tag = None, None
+        for cls in CLASSES:
+            if not self._waiting[cls] or not self._admissible(cls):
+                continue
+            _, enqueued = self._waiting[cls][0]
+            tag = self._head_start[cls] + 1.0 / self.weights[cls] + enqueued / self.aging
+            if best_tag is None or tag < best_tag:
+                best, best_tag = cls, tag
+        return best
+
+    def _acquire(self, cls: str):
+        start = time.perf_counter()
+        with self._cond:
+            ticket = (next(self._seq), start)
+            if not self._waiting[cls]:
+                # A class that was idle starts at the current clock rather than banking credit
+                self._head_start[cls] = max(self._vtime[cls], self._clock)
+            self._waiting[cls].append(ticket)
+            while not (self._waiting[cls][0] is ticket and self._next() == cls):
+                self._cond.wait()
+            self._waiting[cls].popleft()
+            # Admitted ahead of a class that would have won on weight alone: aging decided it
+            begin = self._head_start[cls]
+            own = begin + 1.0 / self.weights[cls]
+            if any(self._waiting[c] and self._admissible(c) and self._head_start[c] + 1.0 / self.weights[c] < own
+                   for c in CLASSES if c != cls):
+                self._stats["aged"] += 1
+            self._clock = begin
+            self._vtime[cls] = own
+            # The next request of a backlogged class starts where this one finishes
+            self._head_start[cls] = own
+            self._active[cls] += 1
+            # Another waiter may also fit in the remaining capacity
+            self._cond.notify_all()
+        waited = time.perf_counter() - start
+        self.queue_wait[cls].observe(waited)
+        metrics.observe(f"queue.{self.name}.{cls}", waited)
+
+    def _release(self, cls: str):
+        with self._cond:
+            self._active[cls] -= 1
+            self._cond.notify_all()
+
+    def backlog(self) -> int:
+        """Requests waiting for a slot, over all classes."""
+        with self._cond:
+            return sum(len(q) for q in self._waiting.values())
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "weights": dict(self.weights),
+                "limits": dict(self.limits),
+                "aging_s": self.aging,
+                "active": dict(self._active),
+                "waiting": {c: len(q) for c, q in self._waiting.items()},
+                **self._stats,
+                "queue_wait": {c: w.summary() for c, w in self.queue_wait.items()},
+                "service": {c: w.summary() for c, w in self.service.items()},
+            }
@@ -1,9 +1,42 @@
-"""Patient screening session management."""
+"""Patient screening session management.
+
+Every change (session created, finding added, report set) gets the next
+sequence number and is appended to a change log, so ``changes(since)``
+can replay everything after a checkpoint without scanning all sessions.
+Sessions are in memory only; ``EPOCH`` identifies this process so a
+cursor from before a restart is recognised as stale.
+"""
 import uuid
+import bisect
+import itertools
+import threading
 from datetime import datetime, timezone
 from typing import Optional
 
+EPOCH = uuid.uuid4().hex[:8]
+
 _sessions: dict = {}
+_seq = itertools.count(1)
+_log: list = []  # (seq, kind, sid, finding index), seq ascending
+_session_seq: dict = {}  # sid -> seq of the session's latest "session" change
+_stale = 0  # session entries superseded by a later change to the same session
+_lock = threading.Lock()
+
+
+def _record(kind: str, sid: str, index: int | None = None) -> int:
+    global _log, _stale
+    with _lock:
+        seq = next(_seq)
+        _log.append((seq, kind, sid, index))
+        if kind == "session":
+            if sid in _session_seq:
+                _stale += 1
+            _session_seq[sid] = seq
+            if _stale > len(_log) // 2:
+                # Readers iterating the old list keep their reference; new changes go to the compacted one
+                _log = [e for e in _log if e[1] != "session" or e[0] == _session_seq[e[2]]]
+                _stale = 0
+        return seq
 
 
 def create_session() -> dict:
@@ -15,6 +48,7 @@ def create_session() -> dict:
         "report": None,
     }
     _sessions[sid] = session
+    _record("session", sid)
     return session
 
 
@@ -29,6 +63,7 @@ def add_finding(sid: str, finding: dict) -> dict:
     finding["timestamp"] = datetime.now(timezone.utc).isoformat()
     finding["index"] = len(session["findings"])
     session["findings"].append(finding)
+    _record("finding", sid, finding["index"])
     return finding
 
 
@@ -37,8 +72,38 @@ def set_report(sid: str, report: str):
     if not session:
         raise ValueError(f"Session {sid} not found")
     session["report"] = report
+    _record("session", sid)
 
 
 def list_sessions() -> list:
     return list(_sessions.values())
 
+
+def last_seq() -> int:
+    with _lock:
+        return _log[-1][0] if _log else 0
+
+
+def changes(since: int = 0, until: int | None = None):
+    """Yield ``(seq, record)`` for every change in ``(since, until]``, oldest first.
+
+    Session records carry the session's current fields minus its findings
+    (each finding is its own record), and appear once at their latest
+    change, which may lie after ``until``.
+    """
+    with _lock:
+        log = _log
+    key = lambda e: e[0]  # noqa: E731
+    start = bisect.bisect_right(log, since, key=key)
+    end = len(log) if until is None else bisect.bisect_right(log, until, key=key)
+    for i in range(start, end):
+        seq, kind, sid, index = log[i]
+        session = _sessions[sid]
+        if kind == "session":
+            if _session_seq[sid] != seq:
+                continue  # superseded; the later entry emits it
+            record = {k: v for k, v in session.items() if k != "findings"}
+            record["findings"] = len(session["findings"])
+            yield seq, {"type": "session", "seq": seq, **record}
+        else:
+            yield seq, {"type": "finding", "seq": seq, "session": sid, **session["findings"][index]}
@@ -0,0 +1,78 @@
+"""Incremental export feed of sessions and findings for MediVan AI.
+
+``GET /api/sync?cursor=...`` streams every session and finding changed
+since ``cursor`` as NDJSON, one record per line, gzip-compressed when
+the client accepts it. Records are encoded and compressed one at a
+time as the response is sent, so the session set is never copied into
+one payload. The last line is a checkpoint::
+
+    {"type": "checkpoint", "cursor": "3f9a12c0:1843", "records": 412, "more": false}
+
+The headquarters sync stores ``cursor`` and passes it next time, so
+each run transfers only the deltas. ``more`` is true when ``limit`` cut
+the feed short; call again with the new cursor to continue.
+
+A cursor is ``<epoch>:<seq>``. Sessions live in memory, so after a
+restart the epoch changes, and an old cursor replays the new process's
+changes from the start (``"reset": true`` in the checkpoint).
+"""
+import json
+import zlib
+import logging
+from backend.services import session_manager, metrics
+
+logger = logging.getLogger(__name__)
+
+# Compressed bytes buffered before a chunk is sent
+CHUNK_BYTES = 64 * 1024
+
+
+def parse_cursor(cursor: str | None) -> tuple[int, bool]:
+    """``(seq to resume after, reset)``; a cursor from another process epoch resets to 0."""
+    if not cursor:
+        return 0, False
+    epoch, sep, seq = cursor.partition(":")
+    if not sep or not seq.isdigit():
+        raise ValueError(f"Malformed cursor '{cursor}' (expected <epoch>:<seq>)")
+    if epoch != session_manager.EPOCH:
+        return 0, True
+    return int(seq), False
+
+
+def _lines(since: int, reset: bool, limit: int | None):
+    until = session_manager.last_seq()
+    cursor, count, more = since, 0, False
+    for seq, record in session_manager.changes(since, until):
+        if limit is not None and count >= limit:
+            more = True
+            break
+        yield json.dumps(record, default=str).encode() + b"\n"
+        cursor, count = seq, count + 1
+    if not more:
+        # Superseded session entries up to ``until`` were skipped, not pending
+        cursor = max(cursor, until)
+    metrics.incr("sync.records", count)
+    checkpoint = {"type": "checkpoint", "cursor": f"{session_manager.EPOCH}:{cursor}", "records": count, "more": more}
+    if reset:
+        checkpoint["reset"] = True
+    yield json.dumps(checkpoint).encode() + b"\n"
+
+
+def stream(since: int, reset: bool = False, limit: int | None = None, compress: bool = True):
+    """Response body chunks: NDJSON lines, gzip-compressed incrementally if ``compress``."""
+    if not compress:
+        yield from _lines(since, reset, limit)
+        return
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    buf = []
+    size = 0
+    for line in _lines(since, reset, limit):
+        out = gz.compress(line)
+        if out:
+            buf.append(out)
+            size += len(out)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buf)
+            buf, size = [], 0
+    buf.append(gz.flush())
+    yield b"".join(buf)
@@ -0,0 +1,251 @@
+"""Per-request stage tracing and on-demand profiling for MediVan AI.
+
+Services wrap their stages in ``span("stage")``. Spans are no-ops unless a
+trace is active for the current request, so the default path pays only a
+context-variable lookup.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from backend.config import MOCK_MODE, UPLOAD_DIR
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Stage names in pipeline order (used to order the breakdown)
+STAGES = [
+    "decode",
+    "quality",
+    "clip_preprocess",
+    "clip_forward",
+    "classifier_preprocess",
+    "classifier_forward",
+    "classifier_tta",
+    "label_normalization",
+    "rag",
+    "llm",
+]
+
+_current: contextvars.ContextVar = contextvars.ContextVar("medivan_trace", default=None)
+
+_profile_lock = threading.Lock()
+_profile = {
+    "remaining": 0,
+    "in_flight": 0,
+    "requests": 0,
+    "events": [],
+    "torch_traces": [],
+    "path": None,
+    "last_path": None,
+}
+
+
+class Trace:
+    """Timing spans collected for a single request."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.t0 = time.perf_counter()
+        self.wall_start = time.time()
+        self.spans = []  # (stage, start_s, end_s) relative to t0
+        self.total = None
+
+    def add(self, stage: str, start: float, end: float):
+        self.spans.append((stage, start - self.t0, end - self.t0))
+
+    def finish(self):
+        self.total = time.perf_counter() - self.t0
+
+    def breakdown(self) -> dict:
+        """Summed milliseconds per stage plus the raw span list."""
+        stages = {}
+        for stage, start, end in self.spans:
+            stages[stage] = stages.get(stage, 0.0) + (end - start) * 1000
+        order = {s: i for i, s in enumerate(STAGES)}
+        stages = dict(sorted(stages.items(), key=lambda x: order.get(x[0], len(STAGES))))
+        total = self.total if self.total is not None else time.perf_counter() - self.t0
+        return {
+            "total_ms": round(total * 1000, 2),
+            "stages_ms": {k: round(v, 2) for k, v in stages.items()},
+            "untracked_ms": round(max(total * 1000 - sum(stages.values()), 0.0), 2),
+            "spans": [
+                {"stage": s, "start_ms": round(a * 1000, 2), "duration_ms": round((b - a) * 1000, 2)}
+                for s, a, b in self.spans
+            ],
+        }
+
+
+def _cuda_sync():
+    """Wait for queued GPU work so a span measures compute, not kernel launch."""
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
+    try:
+        if torch.cuda.is_available() and torch.cuda.is_initialized():
+            torch.cuda.synchronize()
+    except Exception:
+        pass
+
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage if the current request is being traced."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _cuda_sync()
+        trace.add(stage, start, time.perf_counter())
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+@contextmanager
+def request(name: str, enabled: bool = False):
+    """Trace one request. Yields the Trace, or None if tracing is off and no profile is armed.
+
+    The request latency is always recorded in the ``request.<name>`` metrics window.
+    """
+    start = time.perf_counter()
+    profiling = _claim_profile_slot()
+    if not enabled and profiling is None:
+        yield None
+        metrics.observe(f"request.{name}", time.perf_counter() - start)
+        return
+
+    trace = Trace(name)
+    token = _current.set(trace)
+    # The torch profiler must start and stop on the same thread, so it wraps a single request
+    prof = _start_torch_profiler() if profiling else None
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current.reset(token)
+        if profiling:
+            _release_profile_slot(profiling, trace, prof)
+    metrics.observe(f"request.{name}", trace.total)
+
+
+# ── Profiler capture ──────────────────────────────────────
+
+
+def arm_profiler(n_requests: int) -> dict:
+    """Capture a profile over the next ``n_requests`` traced requests.
+
+    Stage spans for all captured requests are written to one Chrome
+    trace-event file (the format py-spy's ``chrometrace`` output and
+    Perfetto/chrome://tracing read). When real models are loaded, each
+    request also gets a torch profiler trace next to it.
+    """
+    with _profile_lock:
+        if _profile["remaining"] > 0 or _profile["in_flight"] > 0:
+            raise RuntimeError("A profile capture is already in progress")
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        profile_dir = os.path.join(UPLOAD_DIR, "profiles")
+        os.makedirs(profile_dir, exist_ok=True)
+        _profile.update(
+            remaining=n_requests,
+            requests=n_requests,
+            events=[],
+            torch_traces=[],
+            path=os.path.join(profile_dir, f"trace-{stamp}.json"),
+        )
+        logger.info(f"Profiler armed for next {n_requests} requests -> {_profile['path']}")
+        return profile_status()
+
+
+def profile_status() -> dict:
+    return {
+        "armed": _profile["remaining"] > 0,
+        "remaining": _profile["remaining"],
+        "in_flight": _profile["in_flight"],
+        "requests": _profile["requests"],
+        "path": _profile["path"] if _profile["remaining"] > 0 else None,
+        "last_path": _profile["last_path"],
+        "torch_traces": list(_profile["torch_traces"]),
+    }
+
+
+def _claim_profile_slot() -> dict | None:
+    """Reserve one of the armed capture's requests; None if no capture is armed."""
+    with _profile_lock:
+        if _profile["remaining"] <= 0:
+            return None
+        _profile["remaining"] -= 1
+        _profile["in_flight"] += 1
+        return {"ordinal": _profile["requests"] - _profile["remaining"] - 1, "path": _profile["path"]}
+
+
+def _start_torch_profiler():
+    # Only worth it when a real model path has loaded torch
+    torch = sys.modules.get("torch")
+    if MOCK_MODE or torch is None:
+        return None
+    try:
+        from torch.profiler import profile, ProfilerActivity
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        prof = profile(activities=activities, record_shapes=True)
+        prof.start()
+        return prof
+    except Exception as e:
+        logger.warning(f"torch profiler unavailable, recording spans only: {e}")
+        return None
+
+
+def _release_profile_slot(slot: dict, trace: Trace, prof=None):
+    """Record a profiled request and write the capture once its last request is done."""
+    ordinal, path = slot["ordinal"], slot["path"]
+    if prof is not None:
+        torch_path = path.replace(".json", f"-req{ordinal}-torch.json")
+        try:
+            prof.stop()
+            prof.export_chrome_trace(torch_path)
+            _profile["torch_traces"].append(torch_path)
+        except Exception as e:
+            logger.error(f"Failed to export torch profile: {e}", exc_info=True)
+
+    pid = os.getpid()
+    base_us = trace.wall_start * 1e6
+    events = [{
+        "name": trace.name, "ph": "X", "pid": pid, "tid": ordinal,
+        "ts": base_us, "dur": (trace.total or 0) * 1e6, "cat": "request",
+    }]
+    for stage, start, end in trace.spans:
+        events.append({
+            "name": stage, "ph": "X", "pid": pid, "tid": ordinal,
+            "ts": base_us + start * 1e6, "dur": (end - start) * 1e6, "cat": "stage",
+        })
+    with _profile_lock:
+        _profile["events"].extend(events)
+        _profile["in_flight"] -= 1
+        if _profile["remaining"] == 0 and _profile["in_flight"] == 0 and path == _profile["path"]:
+            _write_profile()
+
+
+def _write_profile():
+    path = _profile["path"]
+    try:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"traceEvents": _profile["events"], "displayTimeUnit": "ms"}, fh)
+        logger.info(f"Profile written to {path}")
+        _profile["last_path"] = path
+    except Exception as e:
+        logger.error(f"Failed to write profile: {e}", exc_info=True)
+    finally:
+        _profile["events"] = []
@@ -0,0 +1,124 @@
+"""Test-time augmentation for MediVan AI's classifiers.
+
+A borderline image, such as a melanoma vs nevus call near 50%, is scored
+again on a few augmented views and the probabilities are averaged. The
+augmentation cost is only paid for images that need it:
+
+1. The normal forward runs on the whole batch.
+2. Images whose top canonical confidence is below TTA_THRESHOLD are
+   selected.
+3. Their already-preprocessed, on-device ``pixel_values`` are flipped
+   and cropped. All views of all selected images are stacked into one
+   tensor and run as a single second forward.
+4. Each selected image's probabilities become the mean over its
+   original and augmented views.
+
+Views are built on the tensor, so there is no second round of PIL
+preprocessing. Each classifier picks only the views that are valid for
+its modality. A skin lesion has no orientation. A fundus may be
+mirrored. A chest X-ray is only cropped, because flipping it swaps
+laterality.
+"""
+import logging
+import threading
+from backend.config import TTA, TTA_THRESHOLD
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Crops keep this fraction of each side and are resized back to the model input
+ZOOM = 0.875
+# Tensors each view name contributes ("corners" = the four corner crops)
+VIEW_COUNTS = {"hflip": 1, "vflip": 1, "zoom": 1, "corners": 4}
+
+_stats = {"batches": 0, "images": 0, "refined": 0, "changed": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(**counts):
+    # refine() runs on threadpool workers
+    with _stats_lock:
+        for k, n in counts.items():
+            _stats[k] += n
+
+
+def _zoom(pixels, x: int, y: int):
+    """Crop of ZOOM x the input at offset (x, y), resized back to the input size."""
+    import torch.nn.functional as F
+
+    h, w = pixels.shape[-2:]
+    ch, cw = round(h * ZOOM), round(w * ZOOM)
+    crop = pixels[..., y:y + ch, x:x + cw]
+    return F.interpolate(crop, size=(h, w), mode="bilinear", align_corners=False)
+
+
+def views(pixels, names: tuple) -> list:
+    """Augmented copies of a (batch, C, H, W) tensor, one tensor per view."""
+    import torch
+
+    h, w = pixels.shape[-2:]
+    dy, dx = h - round(h * ZOOM), w - round(w * ZOOM)
+    out = []
+    for name in names:
+        if name == "hflip":
+            out.append(torch.flip(pixels, dims=[-1]))
+        elif name == "vflip":
+            out.append(torch.flip(pixels, dims=[-2]))
+        elif name == "zoom":
+            out.append(_zoom(pixels, dx // 2, dy // 2))
+        elif name == "corners":
+            out += [_zoom(pixels, x, y) for y in (0, dy) for x in (0, dx)]
+    return out
+
+
+def refine(m, inputs: dict, probs, names: tuple):
+    """Average ``probs`` over augmented views for the images below TTA_THRESHOLD.
+
+    ``inputs`` are the on-device model inputs of the first forward and
+    ``probs`` its (batch, n_labels) softmax. Call inside the stage slot
+    with gradients disabled. Returns the updated probabilities and, per
+    image, the base confidence for refined images and None otherwise.
+    """
+    import torch
+
+    base = (probs.float() @ m.label_map.matrix).max(dim=1).values
+    if not TTA or not names:
+        return probs, [None] * len(base)
+    selected = (base < TTA_THRESHOLD).nonzero().flatten()
+    _count(batches=1, images=len(base))
+    if len(selected) == 0:
+        return probs, [None] * len(base)
+
+    augmented = views(inputs["pixel_values"][selected], names)
+    # One forward over every view of every selected image, laid out view-major
+    logits = m.model(pixel_values=torch.cat(augmented, dim=0)).logits
+    stacked = torch.softmax(logits, dim=-1).view(len(augmented), len(selected), -1)
+    mean = (probs[selected] + stacked.sum(dim=0)) / (len(augmented) + 1)
+
+    before = (probs[selected].float() @ m.label_map.matrix).argmax(dim=1)
+    after = (mean.float() @ m.label_map.matrix).argmax(dim=1)
+    changed = int((before != after).sum())
+    probs = probs.clone()
+    probs[selected] = mean.to(probs.dtype)
+
+    _count(refined=len(selected), changed=changed)
+    metrics.incr("tta.refined", len(selected))
+    if changed:
+        metrics.incr("tta.changed", changed)
+    base_conf = [None] * len(base)
+    for i, conf in zip(selected.tolist(), base[selected].tolist()):
+        base_conf[i] = round(conf, 4)
+    return probs, base_conf
+
+
+def annotate(results: list[dict], base_conf: list, names: tuple):
+    """Record on each refined result how many views it was averaged over."""
+    n_views = 1 + sum(VIEW_COUNTS[n] for n in names)
+    for r, conf in zip(results, base_conf):
+        if conf is not None:
+            r["tta"] = {"views": n_views, "base_confidence": conf}
+
+
+def get_status() -> dict:
+    with _stats_lock:
+        return {"enabled": TTA, "threshold": TTA_THRESHOLD, **_stats}
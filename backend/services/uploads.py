@@ -0,0 +1,175 @@
+"""Resumable chunked uploads for MediVan AI (tus-style).
+
+A phone on a weak link uploads an image in chunks instead of one
+multipart POST, so a dropped connection resumes from the last chunk the
+server has rather than from zero::
+
+    POST  /api/session/{sid}/uploads?size=N&filename=...   (Idempotency-Key header)
+    PATCH /api/uploads/{id}        Upload-Offset header, raw chunk body
+    GET   /api/uploads/{id}        current offset after a reconnect
+    POST  /api/uploads/{id}/finalize
+
+Chunks are appended to ``UPLOAD_DIR/partial/<id>.part``. A chunk is
+accepted only at the current offset, so a retried chunk that already
+landed is rejected with the offset to continue from. A retried initiate
+with the same Idempotency-Key returns the existing upload. Finalize runs
+the normal session analysis once and stores the finding, so a retried
+finalize returns the same finding instead of adding a duplicate.
+
+Upload records live in memory next to the sessions they belong to.
+Records and their temp files expire UPLOAD_TTL_S after their last
+activity, so a slow upload that keeps sending chunks is never swept.
+Operations on an expired or unknown upload raise LookupError.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from backend.config import UPLOAD_DIR, MAX_IMAGE_SIZE, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_CHUNK, UPLOAD_TTL_S
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, "partial")
+
+_uploads: dict = {}
+_keys: dict = {}  # (sid, idempotency key) -> upload id
+_lock = threading.Lock()
+_stats = {"created": 0, "resumed": 0, "chunks": 0, "rejected_chunks": 0, "finalized": 0, "replayed": 0, "expired": 0}
+
+
+def _path(upload_id: str) -> str:
+    return os.path.join(PARTIAL_DIR, f"{upload_id}.part")
+
+
+def create(sid: str, size: int, filename: str = "", key: str | None = None) -> dict:
+    """Start an upload of ``size`` bytes, or return the one already started under ``key``."""
+    if size <= 0:
+        raise ValueError("Upload size must be positive")
+    if size > MAX_IMAGE_SIZE:
+        raise ValueError(f"Image too large (max {MAX_IMAGE_SIZE // (1024 * 1024)}MB)")
+    sweep()
+    with _lock:
+        if key is not None:
+            existing = _uploads.get(_keys.get((sid, key)))
+            if existing is not None:
+                if existing["size"] != size:
+                    raise RuntimeError("Idempotency-Key already used for an upload of a different size")
+                _stats["resumed"] += 1
+                return existing
+        upload_id = uuid.uuid4().hex
+        upload = {
+            "upload_id": upload_id,
+            "sid": sid,
+            "filename": filename,
+            "size": size,
+            "offset": 0,
+            "chunk_size": UPLOAD_CHUNK_SIZE,
+            "created": time.time(),
+            "updated": time.time(),
+            "result": None,
+        }
+        os.makedirs(PARTIAL_DIR, exist_ok=True)
+        open(_path(upload_id), "wb").close()
+        _uploads[upload_id] = upload
+        if key is not None:
+            _keys[(sid, key)] = upload_id
+        _stats["created"] += 1
+    return upload
+
+
+def get(upload_id: str) -> dict | None:
+    return _uploads.get(upload_id)
+
+
+def _require(upload_id: str) -> dict:
+    upload = _uploads.get(upload_id)
+    if upload is None:
+        raise LookupError(f"Upload {upload_id} not found or expired")
+    return upload
+
+
+def append(upload_id: str, offset: int, data: bytes) -> int:
+    """Write a chunk at ``offset``; returns the new offset.
+
+    Raises RuntimeError if ``offset`` isn't where the upload stands (the
+    caller reports the current offset to resume from), ValueError if the
+    chunk would overrun the declared size, LookupError if the upload expired.
+    """
+    with _lock:
+        upload = _require(upload_id)
+        if upload["result"] is not None:
+            raise RuntimeError("Upload already finalized")
+        if offset != upload["offset"]:
+            _stats["rejected_chunks"] += 1
+            raise RuntimeError(f"Expected offset {upload['offset']}, got {offset}")
+        if offset + len(data) > upload["size"]:
+            raise ValueError(f"Chunk overruns declared size {upload['size']}")
+        with open(_path(upload_id), "r+b") as fh:
+            fh.seek(offset)
+            fh.write(data)
+        upload["offset"] = offset + len(data)
+        upload["updated"] = time.time()
+        _stats["chunks"] += 1
+        return upload["offset"]
+
+
+def path(upload_id: str) -> str:
+    """Assembled file of a complete upload."""
+    with _lock:
+        upload = _require(upload_id)
+        if upload["offset"] != upload["size"]:
+            raise ValueError(f"Upload incomplete: {upload['offset']} of {upload['size']} bytes")
+        # Finalizing counts as activity: the sweep must not expire it mid-analysis
+        upload["updated"] = time.time()
+    return _path(upload_id)
+
+
+def complete(upload_id: str, result: dict):
+    """Store the analysis result for replays and drop the temp file."""
+    with _lock:
+        upload = _require(upload_id)
+        upload["result"] = result
+        upload["updated"] = time.time()
+        _stats["finalized"] += 1
+    try:
+        os.remove(_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def replayed():
+    _stats["replayed"] += 1
+
+
+def sweep():
+    """Forget uploads idle for longer than UPLOAD_TTL_S and delete their temp files."""
+    cutoff = time.time() - UPLOAD_TTL_S
+    with _lock:
+        expired = [u for u in _uploads.values() if u["updated"] < cutoff]
+        for upload in expired:
+            del _uploads[upload["upload_id"]]
+            try:
+                os.remove(_path(upload["upload_id"]))
+            except FileNotFoundError:
+                pass
+        if expired:
+            gone = {u["upload_id"] for u in expired}
+            for k in [k for k, v in _keys.items() if v in gone]:
+                del _keys[k]
+            _stats["expired"] += len(expired)
+        # Temp files left behind by a restart, whose records are gone
+        if os.path.isdir(PARTIAL_DIR):
+            for fn in os.listdir(PARTIAL_DIR):
+                p = os.path.join(PARTIAL_DIR, fn)
+                if fn.split(".", 1)[0] not in _uploads and os.path.getmtime(p) < cutoff:
+                    os.remove(p)
+
+
+def get_status() -> dict:
+    return {
+        "active": sum(1 for u in _uploads.values() if u["result"] is None),
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "max_chunk": UPLOAD_MAX_CHUNK,
+        **_stats,
+    }
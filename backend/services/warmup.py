@@ -0,0 +1,61 @@
+"""Synthetic warm-up passes for the MediVan AI vision models.
+
+The first forward pass of a freshly loaded model pays for CUDA context
+creation, kernel selection/autotuning and allocator growth. Running a few
+synthetic batches at startup, at the batch sizes requests will use, moves
+that cost out of the first patient's request.
+"""
+import sys
+import time
+import logging
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Synthetic frames are larger than any model input so the resize path is exercised too
+SYNTHETIC_SIZE = (512, 512)
+
+_results: dict[str, dict] = {}
+
+
+def synthetic_images(n: int, size: tuple = SYNTHETIC_SIZE, seed: int = 0) -> list:
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    return [Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)) for _ in range(n)]
+
+
+def _sync():
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.synchronize()
+
+
+def run(name: str, fn, batch_sizes: list, iterations: int) -> dict:
+    """Call ``fn(images)`` ``iterations`` times per batch size and record the timings."""
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        # Fixed input shapes, so let cuDNN autotune once per shape during warm-up
+        torch.backends.cudnn.benchmark = True
+
+    batches = {}
+    start_all = time.perf_counter()
+    for bs in batch_sizes:
+        images = synthetic_images(bs)
+        times = []
+        for _ in range(max(iterations, 1)):
+            start = time.perf_counter()
+            fn(images)
+            _sync()
+            times.append(time.perf_counter() - start)
+        batches[bs] = {"first_ms": round(times[0] * 1000, 1), "last_ms": round(times[-1] * 1000, 1)}
+
+    result = {"batches": batches, "iterations": iterations, "total_ms": round((time.perf_counter() - start_all) * 1000, 1)}
+    _results[name] = result
+    summary = ", ".join(f"batch {bs}: {b['first_ms']:.0f} -> {b['last_ms']:.0f} ms" for bs, b in batches.items())
+    logger.info(f"Warmed up {name} ({summary})")
+    return result
+
+
+def get_status() -> dict:
+    return dict(_results)
@@ -0,0 +1 @@
+# MediVan AI benchmarks
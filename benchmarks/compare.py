@@ -0,0 +1,79 @@
+"""Compare two benchmark result files and flag latency/throughput regressions.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+
+Exits with status 1 if any case's p50/p95 latency grows, or throughput
+drops, by more than the threshold percentage.
+"""
+import sys
+import json
+import argparse
+
+LATENCY_KEYS = ["p50_ms", "p95_ms"]
+
+
+def _cases(results: dict) -> dict:
+    """Flatten a results file into {"mode/case": summary}."""
+    flat = {}
+    groups = dict(results.get("modes", {}))
+    if "http" in results:
+        groups["http"] = results["http"]
+    for mode, data in groups.items():
+        for section in ("services", "endpoints"):
+            for case, summary in (data.get(section) or {}).items():
+                flat[f"{mode}/{case}"] = summary
+    return flat
+
+
+def _pct(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list:
+    """Return rows of (case, metric, old, new, change_pct, regressed)."""
+    old_cases, new_cases = _cases(baseline), _cases(candidate)
+    rows = []
+    for case in sorted(set(old_cases) & set(new_cases)):
+        old, new = old_cases[case], new_cases[case]
+        for key in LATENCY_KEYS:
+            change = _pct(old.get(key, 0), new.get(key, 0))
+            rows.append((case, key, old.get(key, 0), new.get(key, 0), change, change > threshold))
+        change = _pct(old.get("throughput_per_s", 0), new.get("throughput_per_s", 0))
+        rows.append((case, "throughput_per_s", old.get("throughput_per_s", 0), new.get("throughput_per_s", 0), change, change < -threshold))
+    return rows
+
+
+def main(argv: list | None = None):
+    p = argparse.ArgumentParser(description="Compare MediVan AI benchmark results")
+    p.add_argument("baseline")
+    p.add_argument("candidate")
+    p.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    p.add_argument("--json", action="store_true", help="Emit the comparison as JSON")
+    args = p.parse_args(argv)
+
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    with open(args.candidate, encoding="utf-8") as fh:
+        candidate = json.load(fh)
+
+    rows = compare(baseline, candidate, args.threshold)
+    if args.json:
+        print(json.dumps([
+            {"case": c, "metric": m, "baseline": o, "candidate": n, "change_pct": round(d, 2), "regressed": r}
+            for c, m, o, n, d, r in rows
+        ], indent=2))
+    else:
+        print(f"{'case':<45} {'metric':<18} {'baseline':>12} {'candidate':>12} {'change':>9}")
+        for c, m, o, n, d, r in rows:
+            flag = "  REGRESSED" if r else ""
+            print(f"{c:<45} {m:<18} {o:>12.3f} {n:>12.3f} {d:>+8.1f}%{flag}")
+
+    regressions = [r for r in rows if r[5]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold}%", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
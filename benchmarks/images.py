@@ -0,0 +1,103 @@
+"""Benchmark image corpus: bundled examples plus synthetic phone-resolution captures."""
+import io
+import os
+import glob
+import random
+from PIL import Image, ImageDraw, ImageFilter
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+# Typical rear-camera still sizes (12 MP 4:3, 12 MP 3:4, 1080p 16:9)
+PHONE_RESOLUTIONS = [(4032, 3024), (3024, 4032), (1920, 1080)]
+
+# Filename keyword per modality so mock routing is deterministic
+MODALITY_FILENAMES = {
+    "skin_lesion": "skin_synthetic",
+    "chest_xray": "chest_synthetic",
+    "fundus": "fundus_synthetic",
+}
+
+
+class BenchImage:
+    """An encoded benchmark image with the modality it is expected to route to."""
+
+    def __init__(self, name: str, modality: str, data: bytes, size: tuple):
+        self.name = name
+        self.modality = modality
+        self.data = data
+        self.size = size
+
+    def decode(self) -> Image.Image:
+        return Image.open(io.BytesIO(self.data)).convert("RGB")
+
+
+def _modality_for_path(path: str) -> str:
+    folder = os.path.basename(os.path.dirname(path))
+    return {"skin": "skin_lesion", "chest_xray": "chest_xray", "fundus": "fundus"}.get(folder, "unknown")
+
+
+def load_examples() -> list:
+    """Load every image in ``examples/`` as-is."""
+    images = []
+    for path in sorted(glob.glob(os.path.join(EXAMPLES_DIR, "*", "*.jpg")) + glob.glob(os.path.join(EXAMPLES_DIR, "*", "*.png"))):
+        with open(path, "rb") as fh:
+            data = fh.read()
+        with Image.open(io.BytesIO(data)) as im:
+            size = im.size
+        images.append(BenchImage(os.path.basename(path), _modality_for_path(path), data, size))
+    return images
+
+
+def _synthetic(modality: str, size: tuple, rng: random.Random) -> Image.Image:
+    """Draw a crude modality-like scene; content only needs to be realistic enough for codec and resize cost."""
+    w, h = size
+    small = (w // 8, h // 8)
+    if modality == "chest_xray":
+        base = Image.effect_noise(small, 40).convert("RGB")
+        draw = ImageDraw.Draw(base)
+        cx, cy = small[0] // 2, small[1] // 2
+        draw.ellipse([cx - small[0] // 3, cy - small[1] // 3, cx - small[0] // 20, cy + small[1] // 3], fill=(30, 30, 30))
+        draw.ellipse([cx + small[0] // 20, cy - small[1] // 3, cx + small[0] // 3, cy + small[1] // 3], fill=(35, 35, 35))
+    elif modality == "fundus":
+        base = Image.new("RGB", small, (0, 0, 0))
+        draw = ImageDraw.Draw(base)
+        r = min(small) // 2 - 4
+        cx, cy = small[0] // 2, small[1] // 2
+        draw.ellipse([cx - r, cy - r, cx + r, cy + r], fill=(180, 70, 30))
+        draw.ellipse([cx + r // 3, cy - r // 8, cx + r // 3 + r // 5, cy + r // 8], fill=(240, 200, 120))
+        for _ in range(12):
+            x, y = cx + rng.randint(-r // 2, r // 2), cy + rng.randint(-r // 2, r // 2)
+            draw.line([cx + r // 3, cy, x, y], fill=(120, 20, 20), width=2)
+    else:
+        tone = (rng.randint(170, 230), rng.randint(120, 170), rng.randint(100, 140))
+        base = Image.new("RGB", small, tone)
+        noise = Image.effect_noise(small, 20).convert("RGB")
+        base = Image.blend(base, noise, 0.15)
+        draw = ImageDraw.Draw(base)
+        rx, ry = rng.randint(small[0] // 12, small[0] // 6), rng.randint(small[1] // 12, small[1] // 6)
+        cx, cy = small[0] // 2, small[1] // 2
+        draw.ellipse([cx - rx, cy - ry, cx + rx, cy + ry], fill=(70, 40, 30))
+    img = base.resize(size, Image.BILINEAR).filter(ImageFilter.GaussianBlur(2))
+    # Sensor-like high-frequency noise so JPEG size/decode cost resembles a real photo
+    grain = Image.effect_noise(size, 12).convert("RGB")
+    return Image.blend(img, grain, 0.08)
+
+
+def synthetic_phone_images(seed: int = 0, quality: int = 90) -> list:
+    """One JPEG per modality per phone resolution, deterministic for a given seed."""
+    rng = random.Random(seed)
+    images = []
+    for modality, stem in MODALITY_FILENAMES.items():
+        for w, h in PHONE_RESOLUTIONS:
+            img = _synthetic(modality, (w, h), rng)
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=quality)
+            images.append(BenchImage(f"{stem}_{w}x{h}.jpg", modality, buf.getvalue(), (w, h)))
+    return images
+
+
+def corpus(seed: int = 0, synthetic: bool = True) -> list:
+    images = load_examples()
+    if synthetic:
+        images += synthetic_phone_images(seed)
+    return images
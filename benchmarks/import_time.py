@@ -0,0 +1,99 @@
+"""Import-time budget check for the backend.
+
+Runs ``python -X importtime -c "import backend.main"`` in a fresh
+interpreter (mock mode by default), reports the slowest imports and exits
+non-zero when the app import exceeds the budget or a heavy library that
+should only load on a real model path was imported.
+
+Usage:
+    python -m benchmarks.import_time                      # 1000 ms budget, mock mode
+    python -m benchmarks.import_time --budget-ms 600 --repeat 5
+    python -m benchmarks.import_time --real               # MOCK_MODE=false, no forbidden-module check
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from benchmarks.run import REPO_ROOT
+
+# Must not be imported just by importing the app in mock mode
+HEAVY_MODULES = ["torch", "transformers", "open_clip", "faiss", "sentence_transformers", "httpx", "numpy"]
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """Parse ``-X importtime`` lines into {module, self_us, cumulative_us, depth}."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_part, cumulative_us, name = line.split("|", 2)
+        name = name[1:]  # one separator space; the rest is nesting indentation
+        rows.append({
+            "module": name.strip(),
+            "self_us": int(self_part.split(":")[1]),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+        })
+    return rows
+
+
+def measure(module: str, env: dict) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = parse_importtime(proc.stderr)
+    total = next((r["cumulative_us"] for r in rows if r["module"] == module), 0)
+    loaded = {r["module"].split(".")[0] for r in rows}
+    return {"total_ms": round(total / 1000, 1), "rows": rows, "loaded": loaded}
+
+
+def main(argv: list | None = None):
+    p = argparse.ArgumentParser(description="Check the backend import time against a budget")
+    p.add_argument("--module", default="backend.main", help="Module to import (default: backend.main)")
+    p.add_argument("--budget-ms", type=float, default=1000.0, help="Fail above this import time")
+    p.add_argument("--repeat", type=int, default=3, help="Fresh interpreters to run; the fastest counts")
+    p.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    p.add_argument("--real", action="store_true", help="Import with MOCK_MODE=false")
+    p.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = p.parse_args(argv)
+
+    env = dict(os.environ, MOCK_MODE="false" if args.real else "true")
+    runs = [measure(args.module, env) for _ in range(max(args.repeat, 1))]
+    best = min(runs, key=lambda r: r["total_ms"])
+
+    # Top-level packages by cumulative time: depth-1 rows are what the module (transitively first) pulled in
+    top = sorted((r for r in best["rows"] if r["depth"] <= 1 and r["module"] != args.module),
+                 key=lambda r: r["cumulative_us"], reverse=True)[:args.top]
+    heavy = [] if args.real else sorted(m for m in HEAVY_MODULES if m in best["loaded"])
+    over = best["total_ms"] > args.budget_ms
+
+    result = {
+        "module": args.module,
+        "mock_mode": not args.real,
+        "import_ms": best["total_ms"],
+        "runs_ms": [r["total_ms"] for r in runs],
+        "budget_ms": args.budget_ms,
+        "heavy_modules_loaded": heavy,
+        "slowest": [{"module": r["module"], "cumulative_ms": round(r["cumulative_us"] / 1000, 1)} for r in top],
+        "ok": not over and not heavy,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import {args.module}: {result['import_ms']} ms (budget {args.budget_ms:.0f} ms, runs {result['runs_ms']})")
+        for r in result["slowest"]:
+            print(f"  {r['cumulative_ms']:>8.1f} ms  {r['module']}")
+        if heavy:
+            print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        if over:
+            print(f"FAIL: import time {result['import_ms']} ms exceeds budget {args.budget_ms:.0f} ms")
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
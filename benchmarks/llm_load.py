@@ -0,0 +1,190 @@
+"""Concurrent load harness for the report/explanation LLM path.
+
+Runs ``report_generator.generate_explanation``/``generate_report`` and the
+report endpoints against the stub LLM server under a set of failure
+scenarios, recording latency, throughput and how often the template
+fallback (``_template_report`` / the finding's recommendation) was served.
+
+Usage:
+    python -m benchmarks.llm_load                        # every scenario
+    python -m benchmarks.llm_load --scenario flaky -c 16 -n 64 -o flaky.json
+    python -m benchmarks.llm_load --scenario custom --ttft 1.5 --tokens-per-s 20 --llm-timeout 5
+"""
+import os
+import sys
+import json
+import socket
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+
+from benchmarks import stub_llm
+from benchmarks.run import REPO_ROOT, REAL_MODE_DEPS, measure, _meta, _sample_session
+
+# Stub settings per scenario; "llm_timeout" sets the backend's LLM_TIMEOUT
+SCENARIOS = {
+    "healthy": {"ttft": 0.2, "tokens_per_s": 200.0},
+    "slow": {"ttft": 2.0, "tokens_per_s": 20.0},
+    "overloaded": {"ttft": 0.5, "tokens_per_s": 100.0, "max_concurrency": 2},
+    "flaky": {"ttft": 0.2, "tokens_per_s": 200.0, "failure_rate": 0.3},
+    "hanging": {"ttft": 0.2, "timeout_rate": 0.5, "hang_seconds": 30.0, "llm_timeout": 2.0},
+    "down": None,  # nothing listening on the endpoint
+}
+
+SAMPLE_FINDINGS = [
+    {"image_type": "skin_lesion", "classification": "melanoma", "confidence": 0.81, "risk_level": "high",
+     "recommendation": "URGENT: Refer to dermatologist immediately for biopsy."},
+    {"image_type": "chest_xray", "classification": "pneumonia", "confidence": 0.77, "risk_level": "high",
+     "recommendation": "Consolidation/opacity pattern consistent with pneumonia."},
+    {"image_type": "fundus", "classification": "Moderate", "confidence": 0.69, "risk_level": "moderate",
+     "dr_grade": 2, "severity_score": 1.9, "recommendation": "Moderate NPDR detected."},
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _timed_with_outcomes(fn, args) -> dict:
+    """Measure ``fn`` and add the fraction of calls that came from the stub vs the fallback."""
+    outcomes = []
+
+    def call(i):
+        outcomes.append(stub_llm.STUB_MARKER in (fn(i) or ""))
+
+    result = measure(call, args.iterations, 0, args.concurrency)
+    from_llm = sum(outcomes)
+    result["llm_responses"] = from_llm
+    result["fallbacks"] = len(outcomes) - from_llm
+    result["fallback_rate"] = round((len(outcomes) - from_llm) / len(outcomes), 4) if outcomes else 0.0
+    return result
+
+
+def worker(args) -> dict:
+    """Run inside a subprocess with NIM_ENDPOINT/LLM_TIMEOUT/MOCK_MODE=false set."""
+    from fastapi.testclient import TestClient
+    from backend.services import report_generator, session_manager
+    from backend.main import app
+
+    out = {}
+    findings = SAMPLE_FINDINGS
+    out["generate_explanation"] = _timed_with_outcomes(
+        lambda i: report_generator.generate_explanation(findings[i % len(findings)]["image_type"], findings[i % len(findings)]),
+        args,
+    )
+    session = _sample_session([dict(f) for f in findings])
+    out["generate_report"] = _timed_with_outcomes(lambda i: report_generator.generate_report(session), args)
+
+    # Endpoint path: seed sessions directly so no vision model is needed
+    client = TestClient(app)
+    sids = []
+    for _ in range(max(args.concurrency, 1)):
+        sid = session_manager.create_session()["id"]
+        for f in findings:
+            session_manager.add_finding(sid, dict(f))
+        sids.append(sid)
+
+    def report_endpoint(i):
+        resp = client.post(f"/api/session/{sids[i % len(sids)]}/report")
+        resp.raise_for_status()
+        return resp.json()["report"]
+
+    out["endpoint.session_report"] = _timed_with_outcomes(report_endpoint, args)
+
+    if all(importlib.util.find_spec(m) for m in REAL_MODE_DEPS):
+        from benchmarks.images import load_examples
+        images = load_examples()
+
+        def analyze(i):
+            img = images[i % len(images)]
+            resp = client.post("/api/analyze", files={"file": (img.name, img.data, "image/jpeg")})
+            resp.raise_for_status()
+            return resp.json().get("explanation")
+
+        out["endpoint.analyze"] = _timed_with_outcomes(analyze, args)
+    else:
+        out["endpoint.analyze"] = {"skipped": "vision model dependencies not installed"}
+    return out
+
+
+def run_scenario(name: str, stub_config: dict | None, argv: list, llm_timeout: float) -> dict:
+    stub = None
+    if stub_config is None:
+        endpoint = f"http://127.0.0.1:{_free_port()}/v1"
+    else:
+        stub = stub_llm.serve(**stub_config)
+        endpoint = stub_llm.endpoint(stub)
+
+    env = dict(os.environ, MOCK_MODE="false", NIM_ENDPOINT=endpoint, LLM_TIMEOUT=str(llm_timeout))
+    env.setdefault("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "medivanai_bench_uploads"))
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as fh:
+        out_path = fh.name
+    try:
+        cmd = [sys.executable, "-m", "benchmarks.llm_load", *argv, "--worker-output", out_path]
+        print(f"[llm_load] scenario '{name}' -> {endpoint}", file=sys.stderr)
+        proc = subprocess.run(cmd, cwd=REPO_ROOT, env=env, stdout=sys.stderr)
+        if proc.returncode != 0:
+            result = {"error": f"worker exited with status {proc.returncode}"}
+        else:
+            with open(out_path, encoding="utf-8") as fh:
+                result = json.load(fh)
+    finally:
+        os.unlink(out_path)
+        if stub:
+            stub.shutdown()
+
+    result["llm_timeout"] = llm_timeout
+    result["stub"] = stub.state.snapshot() if stub else {"config": None, "note": "endpoint down"}
+    return result
+
+
+def _parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Load-test the MediVan AI LLM path against the stub server")
+    p.add_argument("--scenario", action="append", choices=[*SCENARIOS, "custom"],
+                   help="Scenario(s) to run (default: all presets). 'custom' uses the stub options below.")
+    p.add_argument("-n", "--iterations", type=int, default=24, help="Calls per case")
+    p.add_argument("-c", "--concurrency", type=int, default=8, help="Concurrent callers")
+    p.add_argument("--llm-timeout", type=float, default=10.0, help="Backend LLM_TIMEOUT unless the scenario sets one")
+    p.add_argument("-o", "--output", help="Write JSON results here (default: stdout)")
+    p.add_argument("--worker-output", help=argparse.SUPPRESS)
+    stub_llm.add_arguments(p.add_argument_group("custom scenario stub options"))
+    return p
+
+
+def main(argv: list | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = _parser().parse_args(argv)
+
+    if args.worker_output:
+        with open(args.worker_output, "w", encoding="utf-8") as fh:
+            json.dump(worker(args), fh)
+        return
+
+    worker_argv = ["-n", str(args.iterations), "-c", str(args.concurrency)]
+    meta = _meta(argparse.Namespace(
+        iterations=args.iterations, llm_iterations=args.iterations, warmup=0,
+        concurrency=args.concurrency, seed=args.seed,
+    ))
+    results = {"meta": meta, "scenarios": {}}
+    for name in args.scenario or list(SCENARIOS):
+        if name == "custom":
+            config = {k: getattr(args, k) for k in stub_llm.DEFAULTS}
+        else:
+            config = None if SCENARIOS[name] is None else dict(SCENARIOS[name])
+        timeout = (config or {}).pop("llm_timeout", args.llm_timeout)
+        results["scenarios"][name] = run_scenario(name, config, worker_argv, timeout)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
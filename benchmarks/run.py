@@ -0,0 +1,316 @@
+"""End-to-end MediVan AI pipeline benchmarks.
+
+Usage:
+    python -m benchmarks.run                          # mock + real mode, in-process
+    python -m benchmarks.run --mode mock -n 50 -o bench.json
+    python -m benchmarks.run --url http://localhost:8000 -c 4
+
+Each mode runs in its own subprocess because MOCK_MODE is read at import
+time. Real mode points NIM_ENDPOINT at a local stub LLM so report timings
+do not depend on a NIM container. Results are written as JSON; compare two
+runs with ``python -m benchmarks.compare``.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import importlib.util
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.images import corpus
+from backend.services.metrics import percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REAL_MODE_DEPS = ["torch", "transformers", "faiss", "sentence_transformers"]
+# Used when installed, with a fallback otherwise; recorded per run since they change the timings
+OPTIONAL_BACKENDS = ["open_clip", "accelerate"]
+
+
+# ── Statistics ────────────────────────────────────────────
+
+
+def summarize(samples: list, wall: float) -> dict:
+    s = sorted(samples)
+    ms = lambda v: round(v * 1000, 3)
+    return {
+        "count": len(s),
+        "throughput_per_s": round(len(s) / wall, 3) if wall > 0 else 0.0,
+        "mean_ms": ms(sum(s) / len(s)) if s else 0.0,
+        "p50_ms": ms(percentile(s, 50)),
+        "p95_ms": ms(percentile(s, 95)),
+        "p99_ms": ms(percentile(s, 99)),
+        "min_ms": ms(s[0]) if s else 0.0,
+        "max_ms": ms(s[-1]) if s else 0.0,
+    }
+
+
+def measure(fn, iterations: int, warmup: int = 2, concurrency: int = 1) -> dict:
+    """Call ``fn(i)`` ``iterations`` times and summarize per-call latency and throughput."""
+    for i in range(warmup):
+        fn(i)
+
+    def timed(i):
+        start = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - start
+
+    t0 = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, range(iterations)))
+    else:
+        samples = [timed(i) for i in range(iterations)]
+    return summarize(samples, time.perf_counter() - t0)
+
+
+def _stage_summary(traces: list) -> dict:
+    """Per-stage latency summary from the ``trace`` blocks returned by traced requests."""
+    per_stage = {}
+    for t in traces:
+        for stage, value in (t or {}).get("stages_ms", {}).items():
+            per_stage.setdefault(stage, []).append(value / 1000)
+    return {stage: summarize(v, sum(v)) for stage, v in per_stage.items()}
+
+
+# ── Benchmark cases ───────────────────────────────────────
+
+
+def _sample_session(findings: list) -> dict:
+    return {"id": "bench0001", "created_at": datetime.now(timezone.utc).isoformat(), "findings": findings, "report": None}
+
+
+def run_services(images: list, args) -> dict:
+    """Time each pipeline stage by calling the service modules directly."""
+    from backend.main import CLASSIFIERS
+    from backend.services import router, rag, report_generator
+
+    decoded = [(img, img.decode()) for img in images]
+    results = {}
+
+    results["decode"] = measure(lambda i: _cycle(images, i).decode(), args.iterations, args.warmup)
+    results["route"] = measure(lambda i: router.route_image(*_route_args(_cycle(decoded, i))), args.iterations, args.warmup)
+
+    findings = []
+    for modality, classify in CLASSIFIERS.items():
+        subset = [d for img, d in decoded if img.modality == modality]
+        if not subset:
+            continue
+        results[f"classify.{modality}"] = measure(lambda i: classify(_cycle(subset, i)), args.iterations, args.warmup)
+        findings.append({"image_type": modality, **classify(subset[0])})
+
+    queries = [f"{f['image_type']} {f['classification']}" for f in findings] or ["screening"]
+    results["rag"] = measure(lambda i: rag.retrieve(_cycle(queries, i)), args.iterations, args.warmup)
+
+    results["explanation"] = measure(
+        lambda i: report_generator.generate_explanation(*_explain_args(_cycle(findings, i))),
+        args.llm_iterations, 1, args.concurrency,
+    )
+    session = _sample_session(findings)
+    results["report"] = measure(lambda i: report_generator.generate_report(session), args.llm_iterations, 1, args.concurrency)
+    return results
+
+
+def _cycle(items: list, i: int):
+    return items[i % len(items)]
+
+
+def _route_args(pair) -> tuple:
+    img, decoded = pair
+    return decoded, img.name
+
+
+def _explain_args(finding: dict) -> tuple:
+    return finding["image_type"], finding
+
+
+def run_endpoints(images: list, args, client) -> dict:
+    """Time the HTTP endpoints; ``client`` is a TestClient or an httpx.Client with a base URL."""
+    results = {}
+    traces = []
+
+    def analyze(i):
+        img = _cycle(images, i)
+        resp = client.post("/api/analyze", params={"trace": "true"}, files={"file": (img.name, img.data, "image/jpeg")})
+        resp.raise_for_status()
+        traces.append(resp.json().get("trace"))
+
+    results["endpoint.analyze"] = measure(analyze, args.iterations, args.warmup, args.concurrency)
+    results["endpoint.analyze"]["stages"] = _stage_summary(traces[-args.iterations:])
+
+    sid = client.post("/api/session/start").json()["id"]
+    traces = []
+
+    def session_analyze(i):
+        img = _cycle(images, i)
+        resp = client.post(f"/api/session/{sid}/analyze", params={"trace": "true"}, files={"file": (img.name, img.data, "image/jpeg")})
+        resp.raise_for_status()
+        traces.append(resp.json().get("trace"))
+
+    results["endpoint.session_analyze"] = measure(session_analyze, args.iterations, args.warmup, args.concurrency)
+    results["endpoint.session_analyze"]["stages"] = _stage_summary(traces[-args.iterations:])
+
+    # Report over a realistic session size rather than every finding accumulated above
+    sid = client.post("/api/session/start").json()["id"]
+    for img in images[:3]:
+        client.post(f"/api/session/{sid}/analyze", files={"file": (img.name, img.data, "image/jpeg")}).raise_for_status()
+
+    def report(i):
+        client.post(f"/api/session/{sid}/report").raise_for_status()
+
+    results["endpoint.session_report"] = measure(report, args.llm_iterations, 1, args.concurrency)
+    return results
+
+
+# ── Drivers ───────────────────────────────────────────────
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _meta(args) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "iterations": args.iterations,
+        "llm_iterations": args.llm_iterations,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+    }
+
+
+def worker(args) -> dict:
+    """Run inside a subprocess with MOCK_MODE already set in the environment."""
+    random.seed(args.seed)
+    stub = None
+    if args.mode == "real":
+        missing = [m for m in REAL_MODE_DEPS if importlib.util.find_spec(m) is None]
+        if missing:
+            return {"skipped": f"missing dependencies: {', '.join(missing)}"}
+        from benchmarks import stub_llm
+        stub = stub_llm.serve(ttft=args.stub_latency)
+        os.environ["NIM_ENDPOINT"] = stub_llm.endpoint(stub)
+
+    from fastapi.testclient import TestClient
+    from backend import config
+    from backend.main import app
+
+    images = corpus(args.seed, synthetic=not args.no_synthetic)
+    out = {
+        "mock_mode": config.MOCK_MODE,
+        "models": {
+            "clip": config.CLIP_MODEL, "skin": config.SKIN_MODEL, "chest": config.CHEST_MODEL,
+            "eye": config.EYE_MODEL, "embedding": config.EMBEDDING_MODEL,
+        },
+        "llm_endpoint": config.NIM_ENDPOINT if stub else None,
+        "backends": {m: importlib.util.find_spec(m) is not None for m in OPTIONAL_BACKENDS},
+        "images": [{"name": i.name, "modality": i.modality, "size": list(i.size), "bytes": len(i.data)} for i in images],
+    }
+    with TestClient(app) as client:  # runs startup model loading
+        out["services"] = run_services(images, args)
+        out["endpoints"] = run_endpoints(images, args, client)
+    if stub:
+        stub.shutdown()
+    return out
+
+
+def run_http(args) -> dict:
+    import httpx
+
+    images = corpus(args.seed, synthetic=not args.no_synthetic)
+    with httpx.Client(base_url=args.url, timeout=300) as client:
+        health = client.get("/api/health").json()
+        return {
+            "url": args.url,
+            "mock_mode": health.get("mock_mode"),
+            "endpoints": run_endpoints(images, args, client),
+        }
+
+
+def _spawn_worker(mode: str, argv: list) -> dict:
+    env = dict(os.environ, MOCK_MODE="true" if mode == "mock" else "false")
+    env.setdefault("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "medivanai_bench_uploads"))
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as fh:
+        out_path = fh.name
+    try:
+        cmd = [sys.executable, "-m", "benchmarks.run", *argv, "--mode", mode, "--worker-output", out_path]
+        proc = subprocess.run(cmd, cwd=REPO_ROOT, env=env, stdout=sys.stderr)
+        if proc.returncode != 0:
+            return {"error": f"worker exited with status {proc.returncode}"}
+        with open(out_path, encoding="utf-8") as fh:
+            return json.load(fh)
+    finally:
+        os.unlink(out_path)
+
+
+def _parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark the MediVan AI pipeline")
+    p.add_argument("--mode", choices=["mock", "real", "both"], default="both")
+    p.add_argument("--url", help="Benchmark a running server over HTTP instead of in-process")
+    p.add_argument("-n", "--iterations", type=int, default=30, help="Timed calls per case")
+    p.add_argument("--llm-iterations", type=int, default=10, help="Timed calls per LLM-backed case")
+    p.add_argument("--warmup", type=int, default=3, help="Untimed calls before each case")
+    p.add_argument("-c", "--concurrency", type=int, default=1, help="Concurrent callers for endpoint/LLM cases")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--no-synthetic", action="store_true", help="Only use the images in examples/")
+    p.add_argument("--stub-latency", type=float, default=0.05, help="Stub LLM seconds per completion (real mode)")
+    p.add_argument("-o", "--output", help="Write JSON results here (default: stdout)")
+    p.add_argument("--worker-output", help=argparse.SUPPRESS)
+    return p
+
+
+def main(argv: list | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = _parser().parse_args(argv)
+
+    if args.worker_output:
+        with open(args.worker_output, "w", encoding="utf-8") as fh:
+            json.dump(worker(args), fh)
+        return
+
+    results = {"meta": _meta(args)}
+    if args.url:
+        results["http"] = run_http(args)
+    else:
+        # Forward everything except --mode/--output to the per-mode workers
+        passthrough = []
+        skip = False
+        for a in argv:
+            if skip:
+                skip = False
+                continue
+            if a in ("--mode", "-o", "--output"):
+                skip = True
+                continue
+            if a.startswith(("--mode=", "--output=")):
+                continue
+            passthrough.append(a)
+        modes = ["mock", "real"] if args.mode == "both" else [args.mode]
+        results["modes"] = {m: _spawn_worker(m, passthrough) for m in modes}
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
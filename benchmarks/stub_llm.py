@@ -0,0 +1,240 @@
+"""OpenAI-compatible stand-in LLM server for load and latency testing.
+
+Simulates a NIM/vLLM chat completions endpoint with configurable
+time-to-first-token, generation speed, streaming, injected failures, hung
+requests and a server-side concurrency limit. No model is loaded.
+
+Usage:
+    python -m benchmarks.stub_llm --port 8080 --ttft 0.3 --tokens-per-s 40
+    python -m benchmarks.stub_llm --failure-rate 0.2 --timeout-rate 0.05 --hang-seconds 90
+    NIM_ENDPOINT=http://localhost:8080/v1 MOCK_MODE=false uvicorn backend.main:app
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_MARKER = "[stub-llm]"
+STUB_TEXT = (
+    f"{STUB_MARKER} MEDIVAN AI — PATIENT SCREENING REPORT. Findings reviewed; "
+    "screening results are consistent with the reported classifications. "
+    "Recommend clinical correlation, confirmatory testing where indicated and "
+    "specialist follow-up within the timeframes listed for each referral. "
+    "This is an AI-assisted screening output and not a diagnosis."
+)
+
+DEFAULTS = {
+    "ttft": 0.05,               # seconds before the first token
+    "tokens_per_s": 0.0,        # generation speed; 0 = all tokens at once
+    "max_output_tokens": 120,   # cap on simulated completion length
+    "failure_rate": 0.0,        # fraction of requests answered with failure_status
+    "failure_status": 503,
+    "timeout_rate": 0.0,        # fraction of requests that hang for hang_seconds
+    "hang_seconds": 120.0,
+    "max_concurrency": 0,       # requests processed at once; 0 = unlimited
+    "seed": 0,
+}
+
+
+class StubState:
+    """Shared configuration, randomness and counters for one stub server."""
+
+    def __init__(self, **config):
+        unknown = set(config) - set(DEFAULTS)
+        if unknown:
+            raise TypeError(f"Unknown stub option(s): {', '.join(sorted(unknown))}")
+        self.config = {**DEFAULTS, **config}
+        self._rng = random.Random(self.config["seed"])
+        self._lock = threading.Lock()
+        n = self.config["max_concurrency"]
+        self._slots = threading.BoundedSemaphore(n) if n > 0 else None
+        self.stats = {
+            "requests": 0, "completed": 0, "streamed": 0, "failed": 0, "hung": 0,
+            "in_flight": 0, "peak_in_flight": 0, "tokens": 0,
+        }
+
+    def roll(self) -> str:
+        """Decide the fate of a request: 'fail', 'hang' or 'ok'."""
+        with self._lock:
+            r = self._rng.random()
+        if r < self.config["failure_rate"]:
+            return "fail"
+        if r < self.config["failure_rate"] + self.config["timeout_rate"]:
+            return "hang"
+        return "ok"
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+            if key == "in_flight":
+                self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"config": dict(self.config), **self.stats}
+
+
+def _tokens(max_tokens: int) -> list:
+    words = STUB_TEXT.split(" ")
+    return [w + " " for w in (words * (max_tokens // len(words) + 1))[:max_tokens]]
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real inference server
+    state: StubState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path.endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        elif path.endswith("/stats"):
+            self._send_json(200, self.state.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b"{}"
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+
+        state = self.state
+        state.count("requests")
+        slots = state._slots
+        if slots:
+            slots.acquire()
+        state.count("in_flight")
+        try:
+            self._complete(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up (e.g. its timeout fired)
+        finally:
+            state.count("in_flight", -1)
+            if slots:
+                slots.release()
+
+    def _complete(self, body: dict):
+        state, cfg = self.state, self.state.config
+        fate = state.roll()
+        if fate == "fail":
+            state.count("failed")
+            time.sleep(cfg["ttft"])
+            self._send_json(cfg["failure_status"], {"error": {"message": "stub injected failure", "code": cfg["failure_status"]}})
+            return
+        if fate == "hang":
+            state.count("hung")
+            time.sleep(cfg["hang_seconds"])
+
+        n_tokens = min(int(body.get("max_tokens") or cfg["max_output_tokens"]), cfg["max_output_tokens"])
+        tokens = _tokens(n_tokens)
+        model = body.get("model", "stub")
+        tps = cfg["tokens_per_s"]
+        time.sleep(cfg["ttft"])
+
+        if body.get("stream"):
+            state.count("streamed")
+            self._stream(tokens, model, tps)
+        else:
+            if tps > 0:
+                time.sleep(len(tokens) / tps)
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens).strip()}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+        state.count("tokens", len(tokens))
+        state.count("completed")
+
+    def _stream(self, tokens: list, model: str, tps: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta: dict, finish: str | None = None):
+            event = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+
+        chunk({"role": "assistant"})
+        for tok in tokens:
+            chunk({"content": tok})
+            if tps > 0:
+                time.sleep(1 / tps)
+        chunk({}, "stop")
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, **config) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread. Options are the keys of ``DEFAULTS``.
+
+    The returned server exposes its counters as ``server.state``; its base
+    URL is ``endpoint(server)``.
+    """
+    state = StubState(**config)
+    handler = type("Handler", (StubLLMHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def endpoint(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def add_arguments(p: argparse.ArgumentParser):
+    """Register one ``--option`` per stub setting (shared with the load harness)."""
+    for key, default in DEFAULTS.items():
+        p.add_argument(f"--{key.replace('_', '-')}", type=type(default), default=default, dest=key)
+
+
+def main(argv: list | None = None):
+    p = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    add_arguments(p)
+    args = vars(p.parse_args(argv))
+    host, port = args.pop("host"), args.pop("port")
+    server = serve(host, port, **args)
+    print(f"Stub LLM listening on {endpoint(server)} ({json.dumps(server.state.config)})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
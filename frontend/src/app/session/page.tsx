@@ -5,13 +5,58 @@ import CameraCapture from '@/components/CameraCapture';
 import ImageUpload from '@/components/ImageUpload';
 import AnalysisCard from '@/components/AnalysisCard';
 
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+const newKey = () =>
+  typeof crypto !== 'undefined' && 'randomUUID' in crypto
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
+// Retries a request on network errors and 5xx with exponential backoff; 4xx responses are returned as-is
+async function withRetry(request: () => Promise<Response>, attempts = 6): Promise<Response> {
+  for (let i = 0; ; i++) {
+    try {
+      const res = await request();
+      if (res.status < 500 || i >= attempts - 1) return res;
+    } catch (e) {
+      if (i >= attempts - 1) throw e;
+    }
+    await sleep(Math.min(500 * 2 ** i, 8000));
+  }
+}
+
+// Chunked upload that resumes from the server's offset after a dropped connection.
+// The Idempotency-Key makes a retried start or finalize return the same upload / finding.
+async function uploadResumable(sessionId: string, file: File): Promise<Response> {
+  const key = newKey();
+  const start = await withRetry(() => fetch(
+    `/api/session/${sessionId}/uploads?size=${file.size}&filename=${encodeURIComponent(file.name)}`,
+    { method: 'POST', headers: { 'Idempotency-Key': key } },
+  ));
+  if (!start.ok) return start;
+  const upload = await start.json();
+  let offset: number = upload.offset;
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + upload.chunk_size);
+    const res = await withRetry(() => fetch(`/api/uploads/${upload.upload_id}`, {
+      method: 'PATCH',
+      headers: { 'Upload-Offset': String(offset), 'Content-Type': 'application/offset+octet-stream' },
+      body: chunk,
+    }));
+    // 409: a retried chunk had already landed; either way continue from the server's offset
+    if (!res.ok && res.status !== 409) return res;
+    offset = (await res.json()).offset;
+  }
+  return withRetry(() => fetch(`/api/uploads/${upload.upload_id}/finalize`, { method: 'POST' }));
+}
+
 function SessionContent() {
   const router = useRouter();
   const searchParams = useSearchParams();
   const sessionId = searchParams.get('id') || '';
   const [findings, setFindings] = useState<any[]>([]);
   const [analyzing, setAnalyzing] = useState(false);
-  const [mode, setMode] = useState<'menu' | 'camera' | 'upload'>('menu');
+  const [mode, setMode] = useState<'menu' | 'camera' | 'upload' | 'lesions'>('menu');
 
   useEffect(() => {
     if (sessionId) {
@@ -19,15 +64,18 @@ function SessionContent() {
     }
   }, [sessionId]);
 
-  const handleImage = async (file: File) => {
+  const submit = async (send: () => Promise<Response>) => {
     setAnalyzing(true);
     setMode('menu');
     try {
-      const form = new FormData();
-      form.append('file', file);
-      const res = await fetch(`/api/session/${sessionId}/analyze`, { method: 'POST', body: form });
+      const res = await send();
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
       const data = await res.json();
-      setFindings(prev => [...prev, data]);
+      // Multi-lesion responses hold one finding per region
+      if (!Array.isArray(data.findings)) setFindings(prev => [...prev, data]);
+      else if (data.findings.length) setFindings(prev => [...prev, ...data.findings]);
+      else if (data.retake) setFindings(prev => [...prev, data.retake]);
+      else alert(data.explanation);
     } catch (e) {
       alert('Analysis failed');
     } finally {
@@ -35,6 +83,22 @@ function SessionContent() {
     }
   };
 
+  const handleImage = (file: File) => submit(() => uploadResumable(sessionId, file));
+
+  // Camera bursts: the backend scores every frame and classifies only the best one
+  const handleBurst = (files: File[]) => {
+    const form = new FormData();
+    files.forEach(f => form.append('files', f));
+    return submit(() => fetch(`/api/session/${sessionId}/analyze/burst`, { method: 'POST', body: form }));
+  };
+
+  // Wide-field skin photo: every candidate lesion is classified and added as its own finding
+  const handleLesions = (file: File) => {
+    const form = new FormData();
+    form.append('file', file);
+    return submit(() => fetch(`/api/session/${sessionId}/analyze/lesions`, { method: 'POST', body: form }));
+  };
+
   const generateReport = async () => {
     try {
       await fetch(`/api/session/${sessionId}/report`, { method: 'POST' });
@@ -56,13 +120,14 @@ function SessionContent() {
         <div className="grid grid-cols-2 gap-3 mb-6">
           <button onClick={() => setMode('camera')} className="py-4 bg-primary text-white rounded-xl font-medium text-sm min-h-[56px]">📷 Capture</button>
           <button onClick={() => setMode('upload')} className="py-4 bg-gray-100 text-gray-700 rounded-xl font-medium text-sm min-h-[56px]">📁 Upload</button>
+          <button onClick={() => setMode('lesions')} className="col-span-2 py-4 bg-gray-100 text-gray-700 rounded-xl font-medium text-sm min-h-[56px]">🔍 Multiple lesions (wide photo)</button>
         </div>
       )}
 
       {mode === 'camera' && (
         <div className="mb-6">
           <button onClick={() => setMode('menu')} className="text-sm text-gray-500 mb-2">← Back</button>
-          <CameraCapture onCapture={handleImage} />
+          <CameraCapture onCapture={handleImage} onBurst={handleBurst} />
         </div>
       )}
 
@@ -73,6 +138,13 @@ function SessionContent() {
         </div>
       )}
 
+      {mode === 'lesions' && (
+        <div className="mb-6">
+          <button onClick={() => setMode('menu')} className="text-sm text-gray-500 mb-2">← Back</button>
+          <ImageUpload onUpload={handleLesions} fullSize />
+        </div>
+      )}
+
       {analyzing && (
         <div className="bg-blue-50 border border-blue-200 rounded-xl p-4 mb-4 text-center">
           <div className="animate-spin text-2xl mb-2">⚙️</div>
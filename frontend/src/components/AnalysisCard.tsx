@@ -26,7 +26,10 @@ export default function AnalysisCard({ finding, index }: { finding: any; index:
         <span className={`px-3 py-1 rounded-full text-xs font-semibold ${TYPE_COLORS[type] || TYPE_COLORS.unknown}`}>
           {TYPE_LABELS[type] || type}
         </span>
-        <span className="text-xs text-gray-400">#{index}</span>
+        <span className="text-xs text-gray-400">
+          {/* Multi-lesion findings carry the region they were cropped from */}
+          {finding.region && `Region ${finding.region.index + 1} · `}#{index}
+        </span>
       </div>
 
       {/* Classification */}
@@ -39,6 +42,19 @@ export default function AnalysisCard({ finding, index }: { finding: any; index:
         </div>
         <span className="text-sm font-medium text-gray-600">{conf.toFixed(1)}%</span>
       </div>
+      {/* Same image already screened in another session: classified afresh, flagged for review */}
+      {finding.possible_duplicate && (
+        <p className="text-xs text-amber-700 bg-amber-50 rounded-lg px-3 py-2 mb-3">
+          Possible duplicate of an image from session {finding.possible_duplicate.session}. Check the patient before relying on both records.
+        </p>
+      )}
+
+      {/* Borderline result re-scored over augmented views */}
+      {finding.tta && (
+        <p className="text-xs text-gray-400 -mt-2 mb-3">
+          Averaged over {finding.tta.views} views (single view: {(finding.tta.base_confidence * 100).toFixed(1)}%)
+        </p>
+      )}
 
       {/* Risk */}
       <RiskGauge level={finding.risk_level || 'low'} />
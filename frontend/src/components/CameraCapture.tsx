@@ -1,10 +1,29 @@
 'use client';
 import { useRef, useState, useEffect } from 'react';
+import { encodeFrame, getCaptureProfile } from '@/lib/capture';
 
-export default function CameraCapture({ onCapture }: { onCapture: (file: File) => void }) {
+// Frames per burst and spacing; the backend classifies only the sharpest one
+const BURST_FRAMES = 5;
+const BURST_INTERVAL_MS = 150;
+// Live preview: short side of the frames sent to /api/preview, and how often one is sent
+const PREVIEW_SIDE = 256;
+const PREVIEW_INTERVAL_MS = 250;
+
+const MODALITY_LABELS: Record<string, string> = {
+  skin_lesion: 'Skin lesion',
+  chest_xray: 'Chest X-ray',
+  fundus: 'Fundus',
+  unknown: 'Not recognised',
+};
+
+type Preview = { type: string | null; confidence: number | null; usable: boolean; quality: { hint: string | null } };
+
+export default function CameraCapture({ onCapture, onBurst }: { onCapture: (file: File) => void; onBurst?: (files: File[]) => void }) {
   const videoRef = useRef<HTMLVideoElement>(null);
   const [stream, setStream] = useState<MediaStream | null>(null);
   const [error, setError] = useState('');
+  const [capturing, setCapturing] = useState(false);
+  const [preview, setPreview] = useState<Preview | null>(null);
 
   useEffect(() => {
     navigator.mediaDevices.getUserMedia({ video: { facingMode: 'environment', width: 1280, height: 960 } })
@@ -13,24 +32,74 @@ export default function CameraCapture({ onCapture }: { onCapture: (file: File) =
     return () => { stream?.getTracks().forEach(t => t.stop()); };
   }, []);
 
-  const capture = () => {
-    if (!videoRef.current) return;
+  // Prefetch the capture profile so the first capture doesn't wait on it
+  useEffect(() => { getCaptureProfile(); }, []);
+
+  // Stream small frames to the server for a live modality/quality verdict.
+  // At most one frame is in flight; the server drops frames itself when it is busy.
+  useEffect(() => {
+    if (!stream) return;
+    const ws = new WebSocket(`${location.protocol === 'https:' ? 'wss' : 'ws'}://${location.host}/api/preview`);
     const canvas = document.createElement('canvas');
-    canvas.width = videoRef.current.videoWidth;
-    canvas.height = videoRef.current.videoHeight;
-    canvas.getContext('2d')!.drawImage(videoRef.current, 0, 0);
-    canvas.toBlob(blob => {
-      if (blob) onCapture(new File([blob], 'capture.jpg', { type: 'image/jpeg' }));
-    }, 'image/jpeg', 0.9);
+    let waiting = false;
+    ws.onmessage = e => {
+      waiting = false;
+      const msg = JSON.parse(e.data);
+      if (!msg.error) setPreview(msg);
+    };
+    const timer = setInterval(() => {
+      const video = videoRef.current;
+      if (waiting || ws.readyState !== WebSocket.OPEN || !video || !video.videoWidth) return;
+      const scale = Math.min(1, PREVIEW_SIDE / Math.min(video.videoWidth, video.videoHeight));
+      canvas.width = Math.round(video.videoWidth * scale);
+      canvas.height = Math.round(video.videoHeight * scale);
+      canvas.getContext('2d')!.drawImage(video, 0, 0, canvas.width, canvas.height);
+      waiting = true;
+      canvas.toBlob(blob => { if (blob && ws.readyState === WebSocket.OPEN) ws.send(blob); else waiting = false; }, 'image/jpeg', 0.7);
+    }, PREVIEW_INTERVAL_MS);
+    return () => { clearInterval(timer); ws.close(); };
+  }, [stream]);
+
+  // Frames are scaled down to the server's capture profile before encoding
+  const grabFrame = async (name: string) => {
+    const video = videoRef.current;
+    if (!video) return null;
+    return encodeFrame(video, video.videoWidth, video.videoHeight, name);
+  };
+
+  const capture = async () => {
+    if (!onBurst) {
+      const file = await grabFrame('capture.jpg');
+      if (file) onCapture(file);
+      return;
+    }
+    setCapturing(true);
+    const files: File[] = [];
+    for (let i = 0; i < BURST_FRAMES; i++) {
+      if (i > 0) await new Promise(r => setTimeout(r, BURST_INTERVAL_MS));
+      const file = await grabFrame(`capture_${i}.jpg`);
+      if (file) files.push(file);
+    }
+    setCapturing(false);
+    if (files.length) onBurst(files);
   };
 
   if (error) return <div className="bg-red-50 p-4 rounded-xl text-red-600 text-sm">{error}</div>;
 
   return (
     <div className="space-y-3">
-      <video ref={videoRef} autoPlay playsInline className="w-full rounded-xl bg-black" />
-      <button onClick={capture} className="w-full py-4 bg-primary text-white rounded-xl font-semibold min-h-[56px]">
-        📸 Capture Image
+      <div className="relative">
+        <video ref={videoRef} autoPlay playsInline className="w-full rounded-xl bg-black" />
+        {preview?.type && (
+          <div className={`absolute top-2 left-2 right-2 px-3 py-2 rounded-lg text-xs font-medium text-white ${preview.usable ? 'bg-green-600/80' : 'bg-amber-600/80'}`}>
+            {MODALITY_LABELS[preview.type] ?? preview.type}
+            {preview.confidence != null && ` · ${Math.round(preview.confidence * 100)}%`}
+            {preview.quality.hint && <div className="font-normal mt-0.5">{preview.quality.hint}</div>}
+          </div>
+        )}
+      </div>
+      <button onClick={capture} disabled={capturing} className="w-full py-4 bg-primary text-white rounded-xl font-semibold min-h-[56px] disabled:opacity-60">
+        {capturing ? 'Hold steady…' : '📸 Capture Image'}
       </button>
     </div>
   );
@@ -1,13 +1,17 @@
 'use client';
 import { useRef, useState } from 'react';
+import { fitToProfile } from '@/lib/capture';
 
-export default function ImageUpload({ onUpload }: { onUpload: (file: File) => void }) {
+// fullSize: send the file as picked, e.g. wide-field photos whose lesions are cropped server-side
+export default function ImageUpload({ onUpload, fullSize }: { onUpload: (file: File) => void; fullSize?: boolean }) {
   const inputRef = useRef<HTMLInputElement>(null);
   const [dragOver, setDragOver] = useState(false);
 
   const handleFile = (file: File) => {
-    if (file.type.startsWith('image/')) onUpload(file);
-    else alert('Please select an image file.');
+    // Downscaled to the server's capture profile before upload
+    if (!file.type.startsWith('image/')) alert('Please select an image file.');
+    else if (fullSize) onUpload(file);
+    else fitToProfile(file).then(onUpload);
   };
 
   return (
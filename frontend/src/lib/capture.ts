@@ -0,0 +1,73 @@
+// Client-side resizing to the server's capture profile (/api/capture-profile):
+// the models only ever see 224-384 px, so full-resolution photos are wasted uplink.
+
+export type CaptureProfile = {
+  default: { short_side: number };
+  modalities: Record<string, { short_side: number }>;
+  format: string;
+  jpeg_quality: number;
+};
+
+// Re-fetched now and then so a model swap with a different input size is picked up
+const PROFILE_TTL_MS = 5 * 60 * 1000;
+let cached: { profile: CaptureProfile; at: number } | null = null;
+
+export async function getCaptureProfile(): Promise<CaptureProfile | null> {
+  if (cached && Date.now() - cached.at < PROFILE_TTL_MS) return cached.profile;
+  try {
+    const res = await fetch('/api/capture-profile');
+    if (!res.ok) return cached?.profile ?? null;
+    cached = { profile: await res.json(), at: Date.now() };
+    return cached.profile;
+  } catch {
+    return cached?.profile ?? null;
+  }
+}
+
+const toFile = (canvas: HTMLCanvasElement, name: string, profile: CaptureProfile | null) =>
+  new Promise<File | null>(resolve => {
+    const type = profile?.format ?? 'image/jpeg';
+    const jpegName = name.replace(/\.[^.]+$/, '') + '.jpg';
+    canvas.toBlob(
+      blob => resolve(blob ? new File([blob], type === 'image/jpeg' ? jpegName : name, { type }) : null),
+      type,
+      profile?.jpeg_quality ?? 0.9,
+    );
+  });
+
+// Draws a frame scaled so its short side is at most the profile's, then re-encodes it
+export async function encodeFrame(
+  source: CanvasImageSource, width: number, height: number, name: string, imageType?: string,
+): Promise<File | null> {
+  const profile = await getCaptureProfile();
+  const side = (imageType && profile?.modalities[imageType]?.short_side) || profile?.default.short_side;
+  const scale = side ? Math.min(1, side / Math.min(width, height)) : 1;
+  const canvas = document.createElement('canvas');
+  canvas.width = Math.round(width * scale);
+  canvas.height = Math.round(height * scale);
+  const ctx = canvas.getContext('2d')!;
+  ctx.imageSmoothingQuality = 'high';
+  ctx.drawImage(source, 0, 0, canvas.width, canvas.height);
+  return toFile(canvas, name, profile);
+}
+
+// Resizes a picked file to the profile; files already within it are sent untouched
+export async function fitToProfile(file: File, imageType?: string): Promise<File> {
+  const profile = await getCaptureProfile();
+  if (!profile || typeof createImageBitmap === 'undefined') return file;
+  const side = (imageType && profile.modalities[imageType]?.short_side) || profile.default.short_side;
+  let bitmap: ImageBitmap;
+  try {
+    bitmap = await createImageBitmap(file, { imageOrientation: 'from-image' });
+  } catch {
+    return file;
+  }
+  try {
+    if (Math.min(bitmap.width, bitmap.height) <= side && file.type === profile.format) return file;
+    const resized = await encodeFrame(bitmap, bitmap.width, bitmap.height, file.name, imageType);
+    // Re-encoding a small PNG can grow it; keep whichever is smaller
+    return resized && resized.size < file.size ? resized : file;
+  } finally {
+    bitmap.close();
+  }
+}